@@ -0,0 +1,120 @@
+# chat/archive.py
+
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.db import connections
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from .models import (
+    ArchivedDirectMessage, ArchivedGroupMessage, DirectChat, DirectMessage, DirectMessageReaction,
+    Group, GroupMessage, GroupMessageReaction,
+)
+from .changelog import forget_messages
+from .history_cache import bump_rooms
+from .retention import CONVERSATIONS, HISTORY_ROOMS, PurgeJob
+
+ARCHIVE_MODELS = {
+    DirectMessage: ArchivedDirectMessage,
+    GroupMessage: ArchivedGroupMessage,
+}
+
+REACTION_MODELS = {
+    DirectMessage: DirectMessageReaction,
+    GroupMessage: GroupMessageReaction,
+}
+
+# model -> (room model, room column)
+ROOMS = {
+    DirectMessage: (DirectChat, 'chat_id'),
+    GroupMessage: (Group, 'group_id'),
+}
+
+# Partitions this process has already created, as (table, year, month)
+_partitions = set()
+
+
+def month_bounds(year, month):
+    start = datetime(year, month, 1, tzinfo=dt_timezone.utc)
+    end = datetime(year + month // 12, month % 12 + 1, 1, tzinfo=dt_timezone.utc)
+    return start, end
+
+
+def ensure_partitions(archive_model, datetimes):
+    """ Create the monthly PostgreSQL partitions these timestamps fall into. """
+    connection = connections[archive_model.objects.db]
+    if connection.vendor != 'postgresql':
+        return
+    table = archive_model._meta.db_table
+    utc_values = (value.astimezone(dt_timezone.utc) for value in datetimes)
+    months = {(value.year, value.month) for value in utc_values}
+    with connection.cursor() as cursor:
+        for year, month in sorted(months):
+            if (table, year, month) in _partitions:
+                continue
+            cursor.execute(
+                f'CREATE TABLE IF NOT EXISTS {table}_p{year}{month:02d} '
+                f'PARTITION OF {table} FOR VALUES FROM (%s) TO (%s)',
+                month_bounds(year, month),
+            )
+            _partitions.add((table, year, month))
+
+
+def move_to_archive(model, ids):
+    """
+    Copy messages (with their reactions folded into a JSON list) into the
+    archive table, then delete the originals. Runs inside the batch's
+    transaction, so a message is never in both tables or in neither.
+    """
+    archive_model = ARCHIVE_MODELS[model]
+
+    reactions = defaultdict(list)
+    for message_id, user_id, reaction_type in (
+        REACTION_MODELS[model].objects.filter(message_id__in=ids)
+        .values_list('message_id', 'user_id', 'reaction_type')
+    ):
+        reactions[message_id].append({'user_id': user_id, 'reaction_type': reaction_type})
+
+    fields = [
+        field.attname for field in archive_model._meta.concrete_fields
+        if field.name not in ('reactions', 'archived_at')
+    ]
+    rows = list(model.objects.filter(pk__in=ids).values(*fields))
+    ensure_partitions(archive_model, [row['created_at'] for row in rows])
+    archive_model.objects.bulk_create(
+        [archive_model(reactions=reactions[row['id']], **row) for row in rows],
+        ignore_conflicts=True,
+    )
+
+    # Lets history reads skip the archive tables for rooms that have none
+    room_model, room_field = ROOMS[model]
+    archived_through = defaultdict(int)
+    for row in rows:
+        archived_through[row[room_field]] = max(archived_through[row[room_field]], row['seq'])
+    for room_id, seq in archived_through.items():
+        room_model.objects.filter(pk=room_id).update(archived_through_seq=Greatest('archived_through_seq', seq))
+    # The live rows go without delete signals; cached copies of these rooms must miss
+    bump_rooms([HISTORY_ROOMS[model][1](room_id) for room_id in archived_through])
+
+    delete_live_rows(model, ids)
+
+
+def delete_live_rows(model, ids):
+    """
+    Drop archived messages from the live tables. Change-log copies of the
+    messages go too: clients that are that far behind resync history from
+    the archive.
+    """
+    REACTION_MODELS[model].objects.filter(message_id__in=ids).delete()
+    forget_messages(CONVERSATIONS[model], ids)
+    model.objects.filter(pk__in=ids)._raw_delete(model.objects.db)
+
+
+def build_archive_jobs(days=None, now=None):
+    """ Jobs moving messages older than `days` (CHAT_ARCHIVE_AFTER_DAYS) out of the live tables. """
+    days = days or settings.CHAT_ARCHIVE_AFTER_DAYS
+    cutoff = (now or timezone.now()) - timedelta(days=days)
+    return [
+        PurgeJob('archive.direct', DirectMessage, DirectMessage.objects.filter(created_at__lt=cutoff), 'id', move_to_archive),
+        PurgeJob('archive.group', GroupMessage, GroupMessage.objects.filter(created_at__lt=cutoff), 'id', move_to_archive),
+    ]
@@ -0,0 +1,84 @@
+# chat/blocks.py
+
+import threading
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from .conditional import bump, current_versions, version_key
+from .models import BlockedUser
+
+CACHE_TIMEOUT = 60 * 60
+
+# Per-process copies of the shared sets. Each is kept for CHAT_BLOCKS_LOCAL_TTL seconds,
+# so a block made on another worker takes effect here within that window.
+_local = {}
+_lock = threading.Lock()
+
+
+def _cache_key(user_id, version):
+    # A write moves the version, so a reader that queried the old rows can
+    # only store them under a key nobody reads any more
+    return f'blocked_ids:{user_id}:{version}'
+
+
+def _local_ttl():
+    return getattr(settings, 'CHAT_BLOCKS_LOCAL_TTL', 5)
+
+
+def load_blocked_ids(user_id):
+    """
+    frozenset of the users `user_id` has blocked or is blocked by; neither
+    side may message, mention or befriend the other. Served from this
+    process, then the shared cache, then one query.
+    """
+    now = time.monotonic()
+    entry = _local.get(user_id)
+    if entry is not None and entry[0] > now:
+        return entry[1]
+
+    shared_key = _cache_key(user_id, current_versions([version_key('blocks', user_id)])[0])
+    blocked_ids = cache.get(shared_key)
+    if blocked_ids is None:
+        blocked_ids = frozenset(
+            other_id
+            for blocker_id, blocked_id in BlockedUser.objects.filter(
+                Q(user_id=user_id) | Q(blocked_user_id=user_id)
+            ).values_list('user_id', 'blocked_user_id')
+            for other_id in (blocker_id, blocked_id) if other_id != user_id
+        )
+        cache.set(shared_key, blocked_ids, CACHE_TIMEOUT)
+
+    with _lock:
+        _local[user_id] = (now + _local_ttl(), blocked_ids)
+        # Drop expired copies now and then instead of keeping every user ever seen
+        if len(_local) > getattr(settings, 'CHAT_BLOCKS_LOCAL_MAX', 10000):
+            for key in [key for key, (expires, _) in _local.items() if expires <= now]:
+                del _local[key]
+    return blocked_ids
+
+
+def is_blocked(user_id, other_id):
+    """ True if either user has blocked the other. """
+    return other_id in load_blocked_ids(user_id)
+
+
+def without_blocked(user_id, other_ids):
+    """ `other_ids` minus anyone `user_id` has blocked or is blocked by. """
+    blocked_ids = load_blocked_ids(user_id)
+    return [other_id for other_id in other_ids if other_id not in blocked_ids]
+
+
+def invalidate_blocks(user_ids):
+    # Both after commit: the new version makes every worker's next shared
+    # read miss, and this worker's own copies go at once
+    user_ids = set(user_ids)
+    bump('blocks', user_ids)
+
+    def drop():
+        with _lock:
+            for user_id in user_ids:
+                _local.pop(user_id, None)
+
+    transaction.on_commit(drop)
@@ -0,0 +1,135 @@
+# chat/changelog.py
+
+from django.db import transaction
+from django.db.models import F
+from .models import ChangeLog, GroupMember, SyncCounter
+
+
+def record_change(user_ids, kind, payload):
+    """
+    Append one change for each of the given users in a single INSERT. The
+    entries become readable by /api/sync/ once their commit_seq is set, after
+    this transaction commits.
+    """
+    ref = message_ref(payload.get('conversation'), payload['id']) if 'conversation' in payload else ''
+    entries = ChangeLog.objects.bulk_create([
+        ChangeLog(user_id=user_id, kind=kind, payload=payload, message_ref=ref)
+        for user_id in set(user_ids)
+    ])
+    ids = [entry.id for entry in entries]
+    transaction.on_commit(lambda: assign_commit_seq(ids), robust=True)
+
+
+def assign_commit_seq(ids):
+    """
+    Give committed entries the next commit_seq. The counter row stays locked
+    until the UPDATE below commits, so no reader can see this seq before the
+    ones handed out earlier. One seq covers the batch: it holds at most one
+    entry per user.
+    """
+    with transaction.atomic():
+        if not SyncCounter.objects.filter(pk=1).update(last_seq=F('last_seq') + 1):
+            SyncCounter.objects.create(pk=1, last_seq=1)
+        seq = SyncCounter.objects.values_list('last_seq', flat=True).get(pk=1)
+        ChangeLog.objects.filter(pk__in=ids, commit_seq=None).update(commit_seq=seq)
+
+
+def assign_stranded(user_id):
+    """
+    Entries the reader can see are committed. Any still without a seq lost
+    their on_commit callback (or have not run it yet); give them one each.
+    """
+    stranded = list(ChangeLog.objects.filter(user_id=user_id, commit_seq=None).values_list('id', flat=True))
+    for pk in stranded:
+        assign_commit_seq([pk])
+
+
+def synced_through():
+    """ (last seq handed out, highest seq pruned); every entry up to the first is readable. """
+    return SyncCounter.objects.filter(pk=1).values_list('last_seq', 'pruned_through_seq').first() or (0, 0)
+
+
+def message_ref(conversation, message_id):
+    """ ChangeLog.message_ref of the entries about one message. """
+    return f'{conversation}:{message_id}'
+
+
+def forget_messages(conversation, ids):
+    """
+    Drop the change-log entries about these messages. Their payloads hold the
+    message text and media URL, which must not outlive a purge or archive.
+    """
+    ChangeLog.objects.filter(message_ref__in=[message_ref(conversation, pk) for pk in ids]).delete()
+
+
+def group_member_ids(group_id):
+    return list(GroupMember.objects.filter(group_id=group_id).values_list('user_id', flat=True))
+
+
+# --- Payloads ---
+# Compact on purpose: clients already hold users and groups, so only ids are sent.
+
+def direct_message_payload(message):
+    return {
+        'conversation': 'dm',
+        'chat': message.chat_id,
+        'id': message.id,
+        'seq': message.seq,
+        'sender_id': message.sender_id,
+        'message_text': message.message_text,
+        'message_type': message.message_type,
+        'media_url': message.media_url,
+        'created_at': message.created_at,
+        'edited_at': message.edited_at,
+    }
+
+
+def group_message_payload(message):
+    return {
+        'conversation': 'group',
+        'group': message.group_id,
+        'id': message.id,
+        'seq': message.seq,
+        'sender_id': message.sender_id,
+        'message_text': message.message_text,
+        'message_type': message.message_type,
+        'media_url': message.media_url,
+        'created_at': message.created_at,
+        'edited_at': message.edited_at,
+    }
+
+
+def deleted_message_payload(conversation, room_id, message):
+    return {
+        'conversation': conversation,
+        'chat' if conversation == 'dm' else 'group': room_id,
+        'id': message.id,
+        'seq': message.seq,
+    }
+
+
+def group_member_payload(member):
+    return {
+        'group': member.group_id,
+        'user_id': member.user_id,
+        'role': member.role,
+        'is_muted': member.is_muted,
+    }
+
+
+def group_members_payload(group_id, members):
+    """ Batch form of group_member_payload for bulk adds and removals. """
+    return {
+        'group': group_id,
+        'members': [{'user_id': member.user_id, 'role': member.role} for member in members],
+    }
+
+
+def friendship_payload(friendship):
+    return {
+        'id': friendship.id,
+        'user_one': friendship.user_one_id,
+        'user_two': friendship.user_two_id,
+        'requester': friendship.requester_id,
+        'status': friendship.status,
+    }
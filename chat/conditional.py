@@ -0,0 +1,154 @@
+# chat/conditional.py
+
+import hashlib
+import threading
+import time
+import uuid
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+from .db_routers import use_primary
+
+# Version tokens never expire on their own; an evicted token is simply
+# recreated, which changes the ETag and costs one full response.
+VERSION_PREFIX = 'resource_version:'
+
+# Scopes (see chat/signals.py for what bumps them):
+#   per user: friendships, direct_chats, groups, profile,
+#             users (a friend, chat partner or co-member changed their profile)
+#   global:   history (bulk purges)
+
+
+def version_key(scope, user_id=None):
+    if user_id is None:
+        return f'{VERSION_PREFIX}{scope}'
+    return f'{VERSION_PREFIX}{scope}:{user_id}'
+
+
+def bump(scope, user_ids=None):
+    """ Change the version of `scope` (for each of `user_ids`) once the transaction commits. """
+    if user_ids is None:
+        keys = [version_key(scope)]
+    else:
+        keys = [version_key(scope, user_id) for user_id in set(user_ids)]
+    transaction.on_commit(lambda: cache.set_many({key: uuid.uuid4().hex for key in keys}, None))
+
+
+def current_versions(keys):
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # add() keeps whichever token a concurrent request stored first
+            cache.add(key, uuid.uuid4().hex, None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def etag_for(keys):
+    digest = hashlib.sha1('|'.join(current_versions(keys)).encode()).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+
+def etag_matches(etag, header):
+    """ Weak comparison, as If-None-Match requires. """
+    if not header:
+        return False
+    candidates = parse_etags(header)
+    return '*' in candidates or etag.removeprefix('W/') in {tag.removeprefix('W/') for tag in candidates}
+
+
+class ConditionalStats:
+    """ Per-view counts of 304s and full responses, with bytes and CPU time. """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = {}
+
+    def _entry(self, view):
+        return self.views.setdefault(view, {
+            'not_modified': 0, 'not_modified_cpu': 0.0,
+            'full': 0, 'full_bytes': 0, 'full_cpu': 0.0,
+        })
+
+    def record_not_modified(self, view, cpu):
+        with self.lock:
+            entry = self._entry(view)
+            entry['not_modified'] += 1
+            entry['not_modified_cpu'] += cpu
+
+    def record_full(self, view, size, cpu):
+        with self.lock:
+            entry = self._entry(view)
+            entry['full'] += 1
+            entry['full_bytes'] += size
+            entry['full_cpu'] += cpu
+
+    def stats(self):
+        with self.lock:
+            report = {}
+            for view, entry in self.views.items():
+                full = entry['full'] or 1
+                not_modified = entry['not_modified'] or 1
+                avg_bytes = entry['full_bytes'] / full
+                avg_full_cpu = entry['full_cpu'] / full
+                avg_304_cpu = entry['not_modified_cpu'] / not_modified
+                report[view] = {
+                    **entry,
+                    'avg_full_bytes': round(avg_bytes),
+                    'avg_full_cpu_ms': round(avg_full_cpu * 1000, 3),
+                    'avg_not_modified_cpu_ms': round(avg_304_cpu * 1000, 3),
+                    # What the 304s would have cost as full responses
+                    'saved_bytes': round(entry['not_modified'] * avg_bytes),
+                    'saved_cpu_ms': round(entry['not_modified'] * max(avg_full_cpu - avg_304_cpu, 0) * 1000, 1),
+                }
+            return report
+
+
+conditional_stats = ConditionalStats()
+
+
+class ConditionalGetMixin:
+    """
+    ETag on GET responses, built from cached version tokens rather than from
+    the response body. A matching If-None-Match gets a 304 before any query
+    or serializer runs. `etag_scopes` lists per-user scopes (formatted with
+    the user id) and `global_etag_scopes` scopes shared by everyone.
+    """
+    etag_scopes = ()
+    global_etag_scopes = ()
+
+    def get_etag_keys(self):
+        user_id = self.request.user.id
+        return (
+            [version_key(scope, user_id) for scope in self.etag_scopes]
+            + [version_key(scope) for scope in self.global_etag_scopes]
+        )
+
+    def get(self, request, *args, **kwargs):
+        started = time.thread_time()
+        view = type(self).__name__
+        # Taken before the body is built, so a concurrent change can only
+        # make the body newer than its tag, never older
+        etag = etag_for(self.get_etag_keys())
+
+        if etag_matches(etag, request.headers.get('If-None-Match')):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+            response['ETag'] = etag
+            patch_cache_control(response, private=True, no_cache=True)
+            conditional_stats.record_not_modified(view, time.thread_time() - started)
+            return response
+
+        # A lagging replica could pair this tag with an older body
+        use_primary()
+        response = super().get(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            response['ETag'] = etag
+            patch_cache_control(response, private=True, no_cache=True)
+            response.add_post_render_callback(
+                lambda rendered: conditional_stats.record_full(
+                    view, len(rendered.content), time.thread_time() - started
+                )
+            )
+        return response
@@ -1,97 +1,311 @@
+import asyncio
 import json
+import logging
+from urllib.parse import parse_qs
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Q
 from django.utils import timezone
 from datetime import timedelta
 from .models import DirectMessage, GroupMessage, DirectChat, Group
+from .replay import get_event_buffer, missed_events
+from .history_cache import history_cache, dm_room, group_room
+from .serializers import DirectMessageSerializer, GroupMessageSerializer
+from .membership import load_memberships
+from .blocks import is_blocked
+from .db_routers import pin_to_primary
+from .tasks import bump_last_message_at
+from .notifications import user_group
+from .receipts import mark_read, receipts_group
+from . import log, metrics
+from .profiling import MODES as PROFILE_MODES, ProfilerBusy, ProfileSession, capture_session_queries
+
+logger = logging.getLogger(__name__)
+
+ROOM_TYPES = ('group', 'dm')
 
 class ChatConsumer(AsyncWebsocketConsumer):
+    profile_session = None
+    profile_timer = None
+    receipts_group_name = None
+
     async def connect(self):
         self.room_name = self.scope['url_route']['kwargs']['room_name']
         self.room_group_name = f'chat_{self.room_name}'
         self.user = self.scope['user']
+        self.room_type = 'unknown'
+        self.counted = False
+        # Stays bound for the rest of this consumer's task
+        self.correlation_id = log.new_correlation_id('ws-')
+        log.bind(self.correlation_id)
 
         if not self.user.is_authenticated:
             await self.close()
             return
 
+        query_params = parse_qs(self.scope.get('query_string', b'').decode('utf-8'))
+        requested_type = query_params.get('type', [None])[0]
+        room_type = await self.resolve_room(requested_type if requested_type in ROOM_TYPES else None)
+        if room_type is None:
+            await self.close()
+            return
+        self.room_type = room_type
+        # Groups and direct chats number their ids independently
+        self.room_group_name = f'chat_{room_type}_{self.room_name}'
+
         await self.channel_layer.group_add(
             self.room_group_name,
             self.channel_name
         )
+        # Cross-room pushes (friend requests, new chats, membership changes)
+        await self.channel_layer.group_add(user_group(self.user.id), self.channel_name)
+        if self.room_type == 'group':
+            # Batched read watermarks of the other members
+            self.receipts_group_name = receipts_group(self.room_id())
+            await self.channel_layer.group_add(self.receipts_group_name, self.channel_name)
 
         await self.accept()
-        print(f"WebSocket connected for user {self.user.username} to room {self.room_group_name}")
+        metrics.ws_connections.inc(room_type=self.room_type)
+        self.counted = True
+        logger.info(
+            "WebSocket connected",
+            extra={'user_id': self.user.id, 'room': self.room_group_name, 'room_type': self.room_type},
+        )
+
+        # Reconnecting clients pass the last event id they saw
+        last_event_id = query_params.get('last_event_id', [None])[0]
+        if last_event_id:
+            await self.replay_missed_events(last_event_id)
+
+    @database_sync_to_async
+    def resolve_room(self, requested_type):
+        """
+        'group' or 'dm': the room this socket may join, checked whether or
+        not the client passed ?type. None without access.
+        """
+        room_id = self.room_id()
+        if room_id is None:
+            return None
+        self.memberships = load_memberships(self.user.id)
+        if requested_type in ('group', None) and room_id in self.memberships:
+            return 'group'
+        if requested_type in ('dm', None) and DirectChat.objects.filter(
+            Q(user_one_id=self.user.id) | Q(user_two_id=self.user.id), pk=room_id
+        ).exists():
+            return 'dm'
+        return None
+
+    def room_id(self):
+        try:
+            return int(self.room_name)
+        except ValueError:
+            return None
+
+    async def replay_missed_events(self, last_event_id):
+        # Events may also arrive live right after the group_add above;
+        # clients de-duplicate on event_id.
+        events, complete = await missed_events(self.room_group_name, last_event_id)
+        if not complete:
+            # The gap is older than the buffer: fall back to a REST reload
+            await self.send(text_data=json.dumps({
+                'type': 'replay_gap',
+                'last_event_id': last_event_id,
+            }))
+            return
+
+        for event_id, message in events:
+            await self.send(text_data=json.dumps({
+                'message': message,
+                'event_id': event_id,
+                'replayed': True,
+            }))
 
     async def disconnect(self, close_code):
+        await self.stop_profile(notify=False)
+        if self.counted:
+            metrics.ws_connections.dec(room_type=self.room_type)
+            self.counted = False
         await self.channel_layer.group_discard(
             self.room_group_name,
             self.channel_name
         )
-        print(f"WebSocket disconnected for user {self.user.username} from room {self.room_group_name}")
+        await self.channel_layer.group_discard(user_group(self.user.id), self.channel_name)
+        if self.receipts_group_name:
+            await self.channel_layer.group_discard(self.receipts_group_name, self.channel_name)
+        logger.info(
+            "WebSocket disconnected",
+            extra={'user_id': self.user.id, 'room': self.room_group_name, 'close_code': close_code},
+        )
+
+    async def send(self, text_data=None, bytes_data=None, close=False):
+        if text_data is not None or bytes_data is not None:
+            metrics.ws_frames.inc(direction='out', room_type=self.room_type)
+        await super().send(text_data=text_data, bytes_data=bytes_data, close=close)
 
     async def receive(self, text_data):
+        metrics.ws_frames.inc(direction='in', room_type=self.room_type)
         text_data_json = json.loads(text_data)
         message_text = text_data_json.get('message')
-        room_type = text_data_json.get('type', 'group')
+        room_type = text_data_json.get('type', self.room_type)
         
         # Check if this is just a 'broadcast' request (message already saved via API)
         # The frontend should send { "type": "broadcast", "message_id": 123 }
         # OR standard message { "message": "hello" }
         msg_type = text_data_json.get('msg_type', 'new_message')
 
+        if msg_type == 'profile':
+            await self.start_profile(text_data_json.get('mode', 'cprofile'), text_data_json.get('seconds', 30))
+            return
+        if msg_type == 'profile_stop':
+            await self.stop_profile()
+            return
+        if msg_type == 'read':
+            await self.save_read_marker(text_data_json.get('seq'))
+            return
+
         if not message_text and msg_type == 'new_message':
             return
 
         # Scenario 1: Message already saved via REST API, just broadcasting
         if msg_type == 'broadcast' and 'message_data' in text_data_json:
             message_data = text_data_json['message_data']
-            print(f"Broadcasting existing message: {message_data['id']}")
-            
+            logger.debug("Broadcasting existing message", extra={'message_id': message_data.get('id')})
+            await self.broadcast(message_data)
+            return
+
+        # Scenario 2: Message sent via WebSocket directly (needs saving)
+        if room_type != self.room_type:
+            # The broadcast would reach the other kind of room with this id
+            logger.info("Ignored frame for another room type", extra={'user_id': self.user.id, 'room': self.room_group_name})
+            return
+        with metrics.timed(metrics.ws_save_message, room_type=room_type):
+            message_data = await self.save_message(message_text, room_type)
+        
+        if not message_data:
+            return
+
+        # The sender's next REST history read must include this message
+        await database_sync_to_async(pin_to_primary)(self.user.id)
+
+        # Send message to room group
+        await self.broadcast(message_data)
+
+    async def broadcast(self, message_data):
+        # Buffer first so the event id can travel with the live broadcast
+        event_id = await get_event_buffer().append(self.room_group_name, message_data)
+        with metrics.timed(metrics.group_send_latency, kind='room'):
             await self.channel_layer.group_send(
                 self.room_group_name,
                 {
                     'type': 'chat_message',
-                    'message': message_data
+                    'message': message_data,
+                    'event_id': event_id,
                 }
             )
-            return
 
-        # Scenario 2: Message sent via WebSocket directly (needs saving)
-        message_data = await self.save_message(message_text, room_type)
-        
-        if not message_data:
+    async def start_profile(self, mode, seconds):
+        """
+        Staff only: profile this worker's event loop (all of its sockets,
+        not just this one) and log this socket's queries for `seconds`.
+        """
+        error = None
+        if not self.user.is_staff:
+            error = 'forbidden'
+        elif self.profile_session is not None:
+            error = 'already_running'
+        elif mode not in PROFILE_MODES:
+            error = 'unknown_mode'
+        if error is None:
+            try:
+                seconds = min(float(seconds), settings.CHAT_PROFILING['MAX_SOCKET_SECONDS'])
+                session = ProfileSession(mode, 'ws', f'ws {self.room_group_name}', self.user).start()
+            except (TypeError, ValueError):
+                error = 'bad_seconds'
+            except ProfilerBusy:
+                error = 'busy'
+        if error:
+            await self.send(text_data=json.dumps({'type': 'profile_error', 'error': error}))
             return
 
-        # Send message to room group
-        await self.channel_layer.group_send(
-            self.room_group_name,
-            {
-                'type': 'chat_message',
-                'message': message_data
-            }
+        self.profile_session = session
+        self.profile_timer = asyncio.get_running_loop().call_later(
+            seconds, lambda: asyncio.ensure_future(self.stop_profile())
         )
+        await self.send(text_data=json.dumps({'type': 'profile_started', 'id': session.id, 'seconds': seconds}))
+
+    async def stop_profile(self, notify=True):
+        session, self.profile_session = self.profile_session, None
+        if session is None:
+            return
+        self.profile_timer.cancel()
+        session.stop()
+        meta = await sync_to_async(session.save)(correlation_id=self.correlation_id)
+        logger.info("Socket profile saved", extra={'profile_id': meta['id']})
+        if notify:
+            await self.send(text_data=json.dumps({'type': 'profile_saved', 'id': meta['id']}))
 
     async def chat_message(self, event):
         message = event['message']
         await self.send(text_data=json.dumps({
-            'message': message
+            'message': message,
+            'event_id': event.get('event_id'),
         }))
 
+    async def read_receipts(self, event):
+        await self.send(text_data=json.dumps({
+            'type': 'read_receipts',
+            'group': event['group'],
+            'watermarks': event['watermarks'],
+        }))
+
+    async def user_notify(self, event):
+        await self.send(text_data=json.dumps({
+            'type': 'notification',
+            'kind': event['kind'],
+            'payload': event['payload'],
+        }))
+
+    @database_sync_to_async
+    @capture_session_queries
+    def save_read_marker(self, seq):
+        """ { "msg_type": "read", "seq": N } on a group socket; others hear it in the next batch. """
+        room_id = self.room_id()
+        if self.room_type != 'group' or room_id not in load_memberships(self.user.id):
+            return
+        try:
+            mark_read(self.user.id, room_id, int(seq))
+        except (TypeError, ValueError):
+            logger.info("Ignored read marker without a seq", extra={'user_id': self.user.id, 'room': self.room_group_name})
+
     @database_sync_to_async
+    @capture_session_queries
     def save_message(self, message_text, room_type):
         try:
             room_id = int(self.room_name)
             
             if room_type == 'group':
+                # Re-read through the shared cache so removals take effect mid-connection
+                self.memberships = load_memberships(self.user.id)
+                if room_id not in self.memberships:
+                    logger.warning(
+                        "Rejected group message from non-member",
+                        extra={'user_id': self.user.id, 'room': self.room_group_name},
+                    )
+                    return None
                 group = Group.objects.get(id=room_id)
                 message = GroupMessage.objects.create(
                     group=group,
                     sender=self.user,
                     message_text=message_text
                 )
+                if history_cache.contains(group_room(group.id)):
+                    history_cache.append(group_room(group.id), GroupMessageSerializer(message).data)
                 return {
                     'id': message.id,
+                    'group': group.id,
+                    'seq': message.seq,
                     'sender': {
                         'id': self.user.id,
                         'username': self.user.username,
@@ -102,13 +316,25 @@ class ChatConsumer(AsyncWebsocketConsumer):
                 
             elif room_type == 'dm':
                 chat = DirectChat.objects.get(id=room_id)
+                other_id = chat.user_two_id if self.user.id == chat.user_one_id else chat.user_one_id
+                if is_blocked(self.user.id, other_id):
+                    logger.info(
+                        "Rejected direct message across a block",
+                        extra={'user_id': self.user.id, 'room': self.room_group_name},
+                    )
+                    return None
                 message = DirectMessage.objects.create(
                     chat=chat,
                     sender=self.user,
                     message_text=message_text
                 )
+                if history_cache.contains(dm_room(chat.id)):
+                    history_cache.append(dm_room(chat.id), DirectMessageSerializer(message).data)
+                bump_last_message_at(chat.id, message.created_at)
                 return {
                     'id': message.id,
+                    'chat': chat.id,
+                    'seq': message.seq,
                     'sender': {
                         'id': self.user.id,
                         'username': self.user.username,
@@ -118,6 +344,6 @@ class ChatConsumer(AsyncWebsocketConsumer):
                 }
                 
         except (Group.DoesNotExist, DirectChat.DoesNotExist, ValueError) as e:
-            print(f"Error saving message: {e}")
+            logger.warning("Could not save message: %s", e, extra={'user_id': self.user.id, 'room': self.room_group_name})
             return None
         return None
@@ -0,0 +1,74 @@
+# chat/contacts.py
+
+import hashlib
+from django.db.models import Q
+from .blocks import load_blocked_ids
+from .models import Profile, Friendship
+
+CHUNK_SIZE = 500
+
+
+def normalize_email(email):
+    return (email or '').strip().lower()
+
+
+def normalize_username(username):
+    return (username or '').strip().lower()
+
+
+def contact_hash(value):
+    """ Clients that send hashed contacts must use the same normalization + SHA-256. """
+    return hashlib.sha256(value.encode('utf-8')).hexdigest()
+
+
+def chunked(values, size=CHUNK_SIZE):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def match_contacts(user, emails=(), usernames=(), hashed=False):
+    """
+    Find registered users for a batch of contacts.
+
+    Every identifier is reduced to a hash and looked up against the indexed
+    Profile hash columns in IN batches of CHUNK_SIZE. Returns
+    (identifier, profile) pairs (profile.user is loaded), one per user.
+    Users blocked in either direction are never matched.
+    """
+    blocked_ids = load_blocked_ids(user.id)
+    lookups = {}
+    for field, values, normalize in (
+        ('email_hash', emails, normalize_email),
+        ('username_hash', usernames, normalize_username),
+    ):
+        for identifier in values:
+            digest = identifier.strip().lower() if hashed else contact_hash(normalize(identifier))
+            if digest:
+                lookups.setdefault(field, {}).setdefault(digest, identifier)
+
+    matches = {}
+    for field, identifiers in lookups.items():
+        for chunk in chunked(identifiers):
+            profiles = (
+                Profile.objects.filter(**{f'{field}__in': chunk})
+                .exclude(user=user)
+                .select_related('user')
+            )
+            for profile in profiles:
+                if profile.user_id in blocked_ids:
+                    continue
+                matches.setdefault(profile.user_id, (identifiers[getattr(profile, field)], profile))
+    return list(matches.values())
+
+
+def friendships_with(user, user_ids):
+    """ {other user id: Friendship} for the given users, in IN batches. """
+    friendships = {}
+    for chunk in chunked(user_ids):
+        for friendship in Friendship.objects.filter(
+            Q(user_one=user, user_two_id__in=chunk) | Q(user_two=user, user_one_id__in=chunk)
+        ):
+            other_id = friendship.user_two_id if friendship.user_one_id == user.id else friendship.user_one_id
+            friendships[other_id] = friendship
+    return friendships
@@ -0,0 +1,95 @@
+# chat/db_routers.py
+
+import contextvars
+import random
+from django.conf import settings
+from django.core.cache import cache
+
+# Per-request routing state, set by chat.middleware.DatabaseRoutingMiddleware
+_routing = contextvars.ContextVar('db_routing', default=None)
+
+
+class RoutingState:
+    def __init__(self, request):
+        self.request = request
+        self.replica_reads = False
+        self.wrote = False
+        # Chosen on the first replica read and kept for the rest of the
+        # request, so one response never mixes replicas at different lag
+        self.replica = None
+
+
+def begin_request(request):
+    return _routing.set(RoutingState(request))
+
+
+def end_request(token):
+    _routing.reset(token)
+
+
+def _pin_key(user_id):
+    return f'db_primary_pin:{user_id}'
+
+
+def pin_to_primary(user_id):
+    """ Keep `user_id`'s reads on the primary for READ_YOUR_WRITES_SECONDS. """
+    cache.set(_pin_key(user_id), True, settings.READ_YOUR_WRITES_SECONDS)
+
+
+def is_pinned(user_id):
+    return bool(cache.get(_pin_key(user_id)))
+
+
+def allow_replica_reads(user):
+    """
+    Let the rest of this request read from a replica, unless the user wrote
+    recently and must still see their own changes.
+    """
+    state = _routing.get()
+    if state is None or not settings.REPLICA_DATABASES:
+        return
+    if user.is_authenticated and is_pinned(user.id):
+        return
+    state.replica_reads = True
+
+
+def use_primary():
+    """ Read the rest of this request from the primary again. """
+    state = _routing.get()
+    if state is not None:
+        state.replica_reads = False
+
+
+class ReplicaRouter:
+    """
+    Reads go to a replica (picked at random, one per request) only inside
+    requests that opted in through allow_replica_reads(); everything else,
+    and every write, uses the primary. The first write of a request pins its
+    user to the primary.
+    """
+    def db_for_read(self, model, **hints):
+        state = _routing.get()
+        if state is None or not state.replica_reads or state.wrote:
+            return None
+        if state.replica is None:
+            state.replica = random.choice(settings.REPLICA_DATABASES)
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = _routing.get()
+        if state is not None and not state.wrote:
+            state.wrote = True
+            user = getattr(state.request, 'user', None)
+            if user is not None and user.is_authenticated:
+                pin_to_primary(user.id)
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema from the primary through replication
+        if db in settings.REPLICA_DATABASES:
+            return False
+        return None
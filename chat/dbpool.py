@@ -0,0 +1,17 @@
+# chat/dbpool.py
+
+from django.conf import settings
+from django.db import connections
+
+
+def pool_stats():
+    """
+    psycopg_pool counters (pool_size, pool_available, requests_waiting,
+    connections_num, requests_wait_ms, ...) for every pooled database alias.
+    """
+    stats = {}
+    for alias in settings.DATABASES:
+        pool = getattr(connections[alias], 'pool', None)
+        if pool is not None:
+            stats[alias] = pool.get_stats()
+    return stats
@@ -0,0 +1,143 @@
+# chat/export.py
+
+import json
+import zlib
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.utils import timezone
+from .models import (
+    ArchivedDirectMessage, ArchivedGroupMessage, DirectChat, DirectMessage, Friendship,
+    GroupMember, GroupMessage,
+)
+
+BATCH_SIZE = 2000
+
+MESSAGE_FIELDS = [
+    'id', 'seq', 'sender_id', 'sender__username', 'message_text', 'message_type',
+    'media_url', 'created_at', 'edited_at',
+]
+
+
+def ndjson_line(record):
+    return (json.dumps(record, cls=DjangoJSONEncoder, separators=(',', ':')) + '\n').encode()
+
+
+def iter_by_seq(queryset, batch_size=BATCH_SIZE):
+    """
+    Walk a message queryset in seq order, one keyset batch (seq > last seen)
+    at a time, so no query ever has to skip over rows already exported.
+    """
+    last_seq = 0
+    while True:
+        batch = queryset.filter(seq__gt=last_seq).order_by('seq')[:batch_size]
+        count = 0
+        for row in batch.iterator(chunk_size=batch_size):
+            count += 1
+            last_seq = row['seq']
+            yield row
+        if count < batch_size:
+            return
+
+
+def visible_direct_messages(user, chat, model=DirectMessage):
+    """ The chat's messages minus those this user deleted for themselves. """
+    return model.objects.filter(chat=chat).exclude(
+        Q(sender=user, is_deleted_for_sender=True) | (~Q(sender=user) & Q(is_deleted_for_receiver=True))
+    ).values(*MESSAGE_FIELDS)
+
+
+def export_direct_chat(user, chat):
+    other = chat.user_two if chat.user_one_id == user.id else chat.user_one
+    yield ndjson_line({
+        'type': 'conversation', 'conversation': 'dm', 'chat': chat.id,
+        'with': other.username, 'created_at': chat.created_at,
+    })
+    # Archived messages are the oldest ones, so they come first
+    for model in (ArchivedDirectMessage, DirectMessage):
+        for row in iter_by_seq(visible_direct_messages(user, chat, model)):
+            yield ndjson_line({'type': 'message', 'chat': chat.id, **row})
+
+
+def export_group(group):
+    yield ndjson_line({
+        'type': 'conversation', 'conversation': 'group', 'group': group.id,
+        'name': group.group_name, 'created_at': group.created_at,
+    })
+    for model in (ArchivedGroupMessage, GroupMessage):
+        messages = model.objects.filter(group=group, is_deleted=False).values(*MESSAGE_FIELDS)
+        for row in iter_by_seq(messages):
+            yield ndjson_line({'type': 'message', 'group': group.id, **row})
+
+
+def export_user_data(user, chat=None, group=None):
+    """
+    NDJSON lines (bytes) for one conversation, or for everything the user can
+    see when neither `chat` nor `group` is given. One header record comes
+    first; every other line is a friendship, conversation or message record.
+    """
+    yield ndjson_line({
+        'type': 'export', 'version': 1, 'user': user.username, 'exported_at': timezone.now(),
+    })
+
+    if chat is not None:
+        yield from export_direct_chat(user, chat)
+        return
+    if group is not None:
+        yield from export_group(group)
+        return
+
+    friendships = Friendship.objects.filter(Q(user_one=user) | Q(user_two=user)).select_related('user_one', 'user_two')
+    for friendship in friendships.iterator(chunk_size=BATCH_SIZE):
+        other = friendship.user_two if friendship.user_one_id == user.id else friendship.user_one
+        yield ndjson_line({
+            'type': 'friendship', 'with': other.username,
+            'status': friendship.status, 'created_at': friendship.created_at,
+        })
+
+    chats = DirectChat.objects.filter(Q(user_one=user) | Q(user_two=user)).select_related('user_one', 'user_two')
+    for chat in chats.order_by('id').iterator(chunk_size=BATCH_SIZE):
+        yield from export_direct_chat(user, chat)
+
+    memberships = GroupMember.objects.filter(user=user).select_related('group')
+    for membership in memberships.order_by('group_id').iterator(chunk_size=BATCH_SIZE):
+        yield from export_group(membership.group)
+
+
+def gzip_stream(chunks, level=6):
+    """ Compress an iterable of bytes into a gzip stream, chunk by chunk. """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def coalesce(chunks, size=64 * 1024):
+    """ Join small chunks into writes of about `size` bytes. """
+    buffer = []
+    buffered = 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        buffered += len(chunk)
+        if buffered >= size:
+            yield b''.join(buffer)
+            buffer, buffered = [], 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+async def iterate_in_thread(chunks):
+    """
+    Serve a blocking iterator to an ASGI server one chunk at a time. Django
+    would otherwise read a sync iterator fully into memory before sending it.
+    """
+    iterator = iter(chunks)
+    # Always the same thread, so DB cursors opened by the iterator stay valid
+    next_chunk = sync_to_async(next, thread_sensitive=True)
+    while True:
+        chunk = await next_chunk(iterator, None)
+        if chunk is None:
+            return
+        yield chunk
@@ -0,0 +1,133 @@
+# chat/history_cache.py
+
+import threading
+from collections import OrderedDict, deque
+from django.conf import settings
+from .conditional import bump, current_versions, version_key
+
+
+class RecentMessageCache:
+    """
+    Per-process LRU of the latest serialized messages of the busiest rooms.
+
+    Each entry remembers the newest seq it holds and the room's shared
+    version token when it was filled. Readers pass the room's current
+    last_seq (read from the chat/group row they load anyway) and version, so
+    a message written, edited or deleted by another worker, or removed by a
+    purge or archive run, turns into a miss instead of stale data.
+    """
+    def __init__(self, max_rooms=1000, messages_per_room=50):
+        self.max_rooms = max_rooms
+        self.messages_per_room = messages_per_room
+        self.rooms = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, room, last_seq, limit, version=None):
+        """ The newest `limit` messages of `room`, or None on a miss. """
+        with self.lock:
+            entry = self.rooms.get(room)
+            usable = (
+                entry is not None
+                and entry['last_seq'] == last_seq
+                and entry['version'] == version
+                and (len(entry['messages']) >= limit or entry['complete'])
+            )
+            if not usable:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.rooms.move_to_end(room)
+            messages = list(entry['messages'])
+        return messages[-limit:]
+
+    def populate(self, room, last_seq, messages, version=None):
+        """
+        Store the newest messages of a room, oldest first. `version` must be
+        read before the messages were loaded.
+        """
+        messages = messages[-self.messages_per_room:]
+        with self.lock:
+            self.rooms[room] = {
+                'last_seq': messages[-1]['seq'] if messages else last_seq,
+                'version': version,
+                'messages': deque(messages, maxlen=self.messages_per_room),
+                'complete': len(messages) < self.messages_per_room,
+            }
+            self.rooms.move_to_end(room)
+            while len(self.rooms) > self.max_rooms:
+                self.rooms.popitem(last=False)
+                self.evictions += 1
+
+    def contains(self, room):
+        return room in self.rooms
+
+    def append(self, room, message):
+        """ Add a freshly written message to a cached room in place. """
+        with self.lock:
+            entry = self.rooms.get(room)
+            if entry is None or message['seq'] <= entry['last_seq']:
+                return
+            if message['seq'] != entry['last_seq'] + 1:
+                # Something was written that we did not see; start over
+                del self.rooms[room]
+                self.invalidations += 1
+                return
+            if len(entry['messages']) == self.messages_per_room:
+                entry['complete'] = False
+            entry['messages'].append(message)
+            entry['last_seq'] = message['seq']
+
+    def invalidate(self, room):
+        with self.lock:
+            if self.rooms.pop(room, None) is not None:
+                self.invalidations += 1
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'rooms': len(self.rooms),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
+
+
+def dm_room(chat_id):
+    return ('dm', chat_id)
+
+
+def group_room(group_id):
+    return ('group', group_id)
+
+
+def _room_version_key(room):
+    kind, room_id = room
+    return version_key(f'history_{kind}', room_id)
+
+
+def room_version(room):
+    """ The room's shared version token, changed by bump_rooms(). """
+    return current_versions([_room_version_key(room)])[0]
+
+
+def bump_rooms(rooms):
+    """ Make every worker's cached copy of these rooms stale once the transaction commits. """
+    by_kind = {}
+    for kind, room_id in rooms:
+        by_kind.setdefault(kind, []).append(room_id)
+    for kind, room_ids in by_kind.items():
+        bump(f'history_{kind}', room_ids)
+
+
+_config = getattr(settings, 'CHAT_HISTORY_CACHE', {})
+history_cache = RecentMessageCache(
+    max_rooms=_config.get('MAX_ROOMS', 1000),
+    messages_per_room=_config.get('MESSAGES_PER_ROOM', 50),
+)
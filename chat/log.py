@@ -0,0 +1,115 @@
+# chat/log.py
+
+import atexit
+import contextvars
+import json
+import logging
+import queue
+import random
+import uuid
+import zlib
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from . import metrics
+
+# Wired up by settings.LOGGING. Records are formatted on the calling thread
+# and written to stderr by a listener thread, so a slow stdout/log collector
+# never stalls a request or the event loop.
+
+_correlation_id = contextvars.ContextVar('correlation_id', default=None)
+
+# Attributes every LogRecord has; anything else came in through `extra`
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'correlation_id'}
+
+
+def new_correlation_id(prefix=''):
+    return prefix + uuid.uuid4().hex[:16]
+
+
+def bind(correlation_id):
+    """ Tag log records from this context with `correlation_id`; returns a token for unbind(). """
+    return _correlation_id.set(correlation_id)
+
+
+def unbind(token):
+    _correlation_id.reset(token)
+
+
+def current_correlation_id():
+    return _correlation_id.get()
+
+
+class CorrelationFilter(logging.Filter):
+    def filter(self, record):
+        # django.request logs after the middleware has unbound the id
+        request = getattr(record, 'request', None)
+        record.correlation_id = _correlation_id.get() or getattr(request, 'correlation_id', None)
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep only a fraction of the sub-WARNING records of the given loggers
+    (longest name prefix wins). Records sharing a correlation id are kept or
+    dropped together, so a sampled connection is logged from start to end.
+    """
+    def __init__(self, rates=None):
+        super().__init__()
+        self.rates = sorted((rates or {}).items(), key=lambda item: len(item[0]), reverse=True)
+
+    def rate_for(self, name):
+        for prefix, rate in self.rates:
+            if name == prefix or name.startswith(prefix + '.'):
+                return rate
+        return 1.0
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.rate_for(record.name)
+        if rate >= 1:
+            return True
+        correlation_id = getattr(record, 'correlation_id', None) or _correlation_id.get()
+        if correlation_id:
+            return zlib.crc32(correlation_id.encode()) % 10000 < rate * 10000
+        return random.random() < rate
+
+
+class JsonFormatter(logging.Formatter):
+    """ One JSON object per line; `extra` fields are included as-is. """
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        correlation_id = getattr(record, 'correlation_id', None)
+        if correlation_id:
+            entry['correlation_id'] = correlation_id
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class NonBlockingHandler(QueueHandler):
+    """
+    QueueHandler feeding a QueueListener that owns the real stream handler.
+    When the queue is full, records are dropped and counted rather than
+    making the caller wait.
+    """
+    def __init__(self, maxsize=10000, stream=None):
+        super().__init__(queue.Queue(maxsize))
+        # Records arrive already formatted (see QueueHandler.prepare)
+        self.listener = QueueListener(self.queue, logging.StreamHandler(stream))
+        self.listener.start()
+        atexit.register(self.listener.stop)
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            metrics.log_records_dropped.inc()
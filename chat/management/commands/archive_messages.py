@@ -0,0 +1,18 @@
+from chat.archive import build_archive_jobs
+from .purge_messages import Command as PurgeCommand
+
+
+class Command(PurgeCommand):
+    verb = 'Archived'
+    help = (
+        "Move messages older than CHAT_ARCHIVE_AFTER_DAYS from the live message "
+        "tables into the archive tables, in the same throttled, resumable "
+        "batches as purge_messages."
+    )
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--older-than-days', type=int, help="Override CHAT_ARCHIVE_AFTER_DAYS.")
+
+    def get_jobs(self, options):
+        return build_archive_jobs(options['older_than_days'])
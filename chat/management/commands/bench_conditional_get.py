@@ -0,0 +1,44 @@
+import time
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.test import APIClient
+
+ENDPOINTS = ['/api/direct-chats/', '/api/friendships/', '/api/groups/', '/api/profile/', '/api/auth/me/']
+
+
+class Command(BaseCommand):
+    help = (
+        "Poll the list endpoints as one user, first unconditionally and then "
+        "with If-None-Match, and report the bytes and CPU time per request."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('--requests', type=int, default=200, help="Requests per endpoint and mode.")
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['username']!r} not found.")
+        client = APIClient()
+        client.force_authenticate(user)
+        count = options['requests']
+
+        self.stdout.write(f"{'endpoint':<22}{'full B':>9}{'full ms':>9}{'304 ms':>9}{'saved B/req':>13}{'speedup':>9}")
+        for endpoint in ENDPOINTS:
+            etag = client.get(endpoint)['ETag']
+            full_bytes, full_cpu = self.measure(client, endpoint, count)
+            _, conditional_cpu = self.measure(client, endpoint, count, HTTP_IF_NONE_MATCH=etag)
+            self.stdout.write(
+                f"{endpoint:<22}{full_bytes:>9.0f}{full_cpu * 1000:>9.3f}{conditional_cpu * 1000:>9.3f}"
+                f"{full_bytes:>13.0f}{full_cpu / conditional_cpu if conditional_cpu else 0:>8.1f}x"
+            )
+
+    def measure(self, client, endpoint, count, **headers):
+        size = 0
+        started = time.process_time()
+        for _ in range(count):
+            response = client.get(endpoint, **headers)
+            size += len(response.content)
+        return size / count, (time.process_time() - started) / count
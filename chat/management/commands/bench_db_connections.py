@@ -0,0 +1,81 @@
+import statistics
+import threading
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connection
+from chat.dbpool import pool_stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure connection churn and per-request query latency against the "
+        "configured PostgreSQL database. Run once with DB_POOL=0 and once with "
+        "DB_POOL=1 to compare persistent connections with the pool."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16, help="Concurrent worker threads per round.")
+        parser.add_argument('--requests', type=int, default=50, help="Simulated requests per thread.")
+        parser.add_argument('--rounds', type=int, default=5, help="Rounds of freshly started threads.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError("This benchmark needs a PostgreSQL DATABASE_URL.")
+
+        latencies = []
+        first_query = []
+        backend_pids = set()
+        lock = threading.Lock()
+
+        def simulated_request(is_first):
+            started = time.perf_counter()
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_backend_pid()')
+                pid = cursor.fetchone()[0]
+            # What Django does when a request (or sync_to_async call) ends
+            close_old_connections()
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                backend_pids.add(pid)
+                if is_first:
+                    first_query.append(elapsed)
+
+        def worker():
+            for index in range(options['requests']):
+                simulated_request(index == 0)
+
+        peak_connections = 0
+        started = time.perf_counter()
+        for _ in range(options['rounds']):
+            # New threads each round, like a worker's thread pool being recycled
+            threads = [threading.Thread(target=worker) for _ in range(options['threads'])]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            peak_connections = max(peak_connections, self.server_connections())
+        total = time.perf_counter() - started
+
+        latencies.sort()
+        pooled = bool(pool_stats())
+        self.stdout.write(f"mode:                  {'pool' if pooled else 'persistent connections'}")
+        self.stdout.write(f"requests:              {len(latencies)} in {total:.2f}s ({len(latencies) / total:.0f}/s)")
+        self.stdout.write(f"physical connections:  {len(backend_pids)} distinct backend pids")
+        self.stdout.write(f"peak server conns:     {peak_connections}")
+        self.stdout.write(f"latency p50/p95/p99:   {self.ms(latencies, 0.50)} / {self.ms(latencies, 0.95)} / {self.ms(latencies, 0.99)} ms")
+        self.stdout.write(f"first query per thread: {statistics.mean(first_query) * 1000:.2f} ms mean")
+        if pooled:
+            self.stdout.write(f"pool stats:            {pool_stats()}")
+
+    def server_connections(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT count(*) FROM pg_stat_activity WHERE datname = current_database()')
+            count = cursor.fetchone()[0]
+        close_old_connections()
+        return count
+
+    @staticmethod
+    def ms(sorted_values, quantile):
+        index = min(int(len(sorted_values) * quantile), len(sorted_values) - 1)
+        return f"{sorted_values[index] * 1000:.2f}"
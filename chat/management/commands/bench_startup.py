@@ -0,0 +1,95 @@
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Runs in a fresh interpreter under `python -X importtime`
+CHILD = """
+import json, time
+started = time.perf_counter()
+import talkative.asgi
+loaded = time.perf_counter() - started
+
+from django.test import Client
+started = time.perf_counter()
+status = Client().get({path!r}, HTTP_HOST='localhost').status_code
+first_request = time.perf_counter() - started
+
+from chat import warmup
+print(json.dumps({{
+    'load_seconds': loaded,
+    'first_request_seconds': first_request,
+    'first_request_status': status,
+    'warmup': warmup.report,
+}}))
+"""
+
+
+def parse_importtime(stderr):
+    """ [(module, self_us, cumulative_us)] from `-X importtime` output. """
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # the header line
+        modules.append((fields[2].strip(), int(fields[0]), int(fields[1])))
+    return modules
+
+
+class Command(BaseCommand):
+    help = (
+        "Start the ASGI application in a fresh interpreter and report where "
+        "the time goes: import time per module (from python -X importtime), "
+        "total load time, the first request, and each warm-up step. Compare "
+        "runs with and without --warmup."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--warmup', action='store_true', help="Enable CHAT_WARMUP in the child process.")
+        parser.add_argument('--top', type=int, default=25, help="Modules to list.")
+        parser.add_argument('--sort', choices=['self', 'cumulative'], default='cumulative')
+        parser.add_argument('--path', default='/api/auth/me/', help="URL of the first request.")
+
+    def handle(self, *args, **options):
+        env = {
+            **os.environ,
+            'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'talkative.settings'),
+            'PYTHONPATH': os.pathsep.join(filter(None, sys.path)),
+            'CHAT_WARMUP': '1' if options['warmup'] else '0',
+        }
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', CHILD.format(path=options['path'])],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        if result.returncode != 0:
+            raise CommandError(f"Startup failed:\n{result.stderr[-4000:]}")
+        timings = json.loads(result.stdout.strip().splitlines()[-1])
+        modules = parse_importtime(result.stderr)
+
+        column = 1 if options['sort'] == 'self' else 2
+        self.stdout.write(f"{'self ms':>9} {'cumul ms':>9}  module")
+        for name, self_us, cumulative_us in sorted(modules, key=lambda row: row[column], reverse=True)[:options['top']]:
+            self.stdout.write(f"{self_us / 1000:9.1f} {cumulative_us / 1000:9.1f}  {name}")
+
+        packages = defaultdict(int)
+        for name, self_us, _ in modules:
+            packages[name.split('.')[0]] += self_us
+        self.stdout.write("\nImport time by top-level package (self):")
+        for package, total_us in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:10]:
+            self.stdout.write(f"{total_us / 1000:9.1f}  {package}")
+
+        self.stdout.write(
+            f"\n{len(modules)} modules, {sum(row[1] for row in modules) / 1000:.0f}ms importing; "
+            f"talkative.asgi loaded in {timings['load_seconds'] * 1000:.0f}ms"
+        )
+        for step, seconds, error in timings['warmup']:
+            self.stdout.write(f"  warm-up {step}: {seconds * 1000:.1f}ms" + (f" (failed: {error})" if error else ''))
+        self.stdout.write(self.style.SUCCESS(
+            f"First request to {options['path']}: {timings['first_request_seconds'] * 1000:.1f}ms "
+            f"(status {timings['first_request_status']})"
+        ))
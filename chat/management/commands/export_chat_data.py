@@ -0,0 +1,55 @@
+import sys
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+from chat.export import coalesce, export_user_data, gzip_stream
+from chat.models import DirectChat, Group
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream a user's conversations (or a single chat/group) as NDJSON. "
+        "Memory use stays flat however long the history is."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('--chat', type=int, help="Export only this direct chat.")
+        parser.add_argument('--group', type=int, help="Export only this group.")
+        parser.add_argument('--gzip', action='store_true', help="Compress the output with gzip.")
+        parser.add_argument('--output', '-o', help="File to write to (default: stdout).")
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['username']!r} not found.")
+
+        chat = group = None
+        if options['chat']:
+            chat = DirectChat.objects.filter(
+                Q(user_one=user) | Q(user_two=user), pk=options['chat'],
+            ).select_related('user_one', 'user_two').first()
+            if chat is None:
+                raise CommandError(f"{user.username} has no direct chat {options['chat']}.")
+        elif options['group']:
+            group = Group.objects.filter(pk=options['group'], groupmember__user=user).first()
+            if group is None:
+                raise CommandError(f"{user.username} is not in group {options['group']}.")
+
+        chunks = coalesce(export_user_data(user, chat=chat, group=group))
+        if options['gzip']:
+            chunks = gzip_stream(chunks)
+
+        output = open(options['output'], 'wb') if options['output'] else sys.stdout.buffer
+        try:
+            written = 0
+            for chunk in chunks:
+                output.write(chunk)
+                written += len(chunk)
+        finally:
+            if options['output']:
+                output.close()
+
+        if options['output']:
+            self.stderr.write(f"Wrote {written} bytes to {options['output']}")
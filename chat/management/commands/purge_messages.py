@@ -0,0 +1,62 @@
+import fnmatch
+import os
+import time
+from django.core.management.base import BaseCommand
+from chat.models import PurgeCheckpoint
+from chat.retention import build_jobs, run_job
+
+
+class Command(BaseCommand):
+    verb = 'Purged'
+    help = (
+        "Hard-delete soft-deleted messages and messages past their retention "
+        "period in small, throttled batches. Safe to interrupt and re-run: "
+        "every job resumes from its last checkpoint."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help="Rows deleted per transaction.")
+        parser.add_argument('--pause', type=float, default=0.1, help="Seconds to sleep between batches.")
+        parser.add_argument('--max-seconds', type=float, help="Stop (resumably) after this long.")
+        parser.add_argument('--archive-dir', help="Write purged rows to gzipped NDJSON files here first, one per batch.")
+        parser.add_argument('--job', default='*', help="Only run jobs whose name matches this glob.")
+        parser.add_argument('--dry-run', action='store_true', help="Count what would be purged and stop.")
+
+    def get_jobs(self, options):
+        return build_jobs()
+
+    def handle(self, *args, **options):
+        jobs = [job for job in self.get_jobs(options) if fnmatch.fnmatch(job.name, options['job'])]
+        if options['archive_dir']:
+            os.makedirs(options['archive_dir'], exist_ok=True)
+        deadline = time.monotonic() + options['max_seconds'] if options['max_seconds'] else None
+
+        total_rows = 0
+        total_seconds = 0.0
+        for job in jobs:
+            if options['dry_run']:
+                self.stdout.write(f"{job.name}: {job.queryset.count()} rows")
+                continue
+
+            resumed_from = PurgeCheckpoint.objects.filter(job=job.name).values_list('last_key', flat=True).first()
+            result = run_job(
+                job,
+                batch_size=options['batch_size'],
+                pause=options['pause'],
+                deadline=deadline,
+                archive_dir=options['archive_dir'],
+            )
+            total_rows += result.rows
+            total_seconds += result.seconds
+            rate = result.rows / result.seconds if result.seconds else 0
+            state = 'done' if result.finished else 'paused'
+            resumed = f", resumed after {job.key} {resumed_from}" if resumed_from else ''
+            self.stdout.write(
+                f"{job.name}: {result.rows} rows in {result.seconds:.1f}s ({rate:.0f} rows/s), {state}{resumed}"
+            )
+            if not result.finished:
+                break
+
+        if not options['dry_run']:
+            rate = total_rows / total_seconds if total_seconds else 0
+            self.stdout.write(self.style.SUCCESS(f"{self.verb} {total_rows} rows ({rate:.0f} rows/s)"))
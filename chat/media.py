@@ -0,0 +1,193 @@
+# chat/media.py
+
+import hashlib
+import os
+import re
+import shutil
+import uuid
+from django.conf import settings
+from django.core.files import File
+from django.core import signing
+from django.core.files.storage import storages
+from django.db import IntegrityError, transaction
+from .models import DirectMessage, MediaBlob, MediaUpload
+
+CHUNK_SIZE = 64 * 1024
+
+CONTENT_RANGE_RE = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class UploadConflict(Exception):
+    """ The chunk does not start where the upload currently ends. """
+
+
+def media_storage():
+    return storages['media']
+
+
+def partial_path(upload):
+    return os.path.join(settings.MEDIA_UPLOAD_TEMP_DIR, f'{upload.id}.part')
+
+
+def allowed_content_type(content_type):
+    """ `content_type` without parameters if it may be served as itself, else application/octet-stream. """
+    content_type = (content_type or '').split(';')[0].strip().lower()
+    if content_type in settings.MEDIA_CONTENT_TYPES:
+        return content_type
+    return 'application/octet-stream'
+
+
+def media_token(sha256):
+    """ Signed, expiring grant to fetch blob `sha256` without a JWT (e.g. from an <img> tag). """
+    return signing.TimestampSigner(salt='chat.media').sign(sha256)
+
+
+def check_media_token(sha256, token):
+    try:
+        value = signing.TimestampSigner(salt='chat.media').unsign(token or '', max_age=settings.MEDIA_URL_MAX_AGE)
+    except signing.BadSignature:
+        return False
+    return value == sha256
+
+
+def message_type_for(content_type):
+    """ The DirectMessage/GroupMessage type matching an uploaded file. """
+    if content_type.startswith('image/'):
+        return DirectMessage.MessageType.IMAGE
+    if content_type.startswith('audio/'):
+        return DirectMessage.MessageType.AUDIO
+    return DirectMessage.MessageType.FILE
+
+
+def parse_content_range(header):
+    """ `bytes start-end/total` -> (start, end, total) with an inclusive end, or None. """
+    match = CONTENT_RANGE_RE.match(header or '')
+    if not match:
+        return None
+    start, end, total = (int(value) for value in match.groups())
+    if start > end or end >= total:
+        return None
+    return start, end, total
+
+
+def write_chunk(upload, stream, start, length):
+    """
+    Copy `length` bytes from the request stream into the partial file at
+    `start` and advance the upload offset.
+
+    The body is first spooled to a file of its own. Only then is the offset
+    claimed, and the chunk is spliced into the partial file while the claim's
+    row lock is held, so a concurrent PUT for the same offset never touches
+    the partial file.
+    """
+    if start != upload.received:
+        raise UploadConflict()
+
+    os.makedirs(settings.MEDIA_UPLOAD_TEMP_DIR, exist_ok=True)
+    path = partial_path(upload)
+    chunk_path = f'{path}.{uuid.uuid4().hex}'
+    try:
+        written = 0
+        with open(chunk_path, 'wb') as chunk_file:
+            while written < length:
+                chunk = stream.read(min(CHUNK_SIZE, length - written))
+                if not chunk:
+                    break
+                chunk_file.write(chunk)
+                written += len(chunk)
+
+        with transaction.atomic():
+            # Only the writer that still sees the old offset may move it forward
+            updated = MediaUpload.objects.filter(pk=upload.pk, received=start).update(received=start + written)
+            if not updated:
+                raise UploadConflict()
+            mode = 'r+b' if os.path.exists(path) else 'wb'
+            with open(path, mode) as part, open(chunk_path, 'rb') as chunk_file:
+                part.seek(start)
+                shutil.copyfileobj(chunk_file, part, CHUNK_SIZE)
+                part.truncate()
+    finally:
+        if os.path.exists(chunk_path):
+            os.remove(chunk_path)
+
+    upload.received = start + written
+    return written
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as part:
+        for chunk in iter(lambda: part.read(CHUNK_SIZE * 16), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def finish_upload(upload):
+    """
+    Hash the completed partial file and move it into content-addressed
+    storage, reusing the stored copy when identical content already exists.
+    """
+    path = partial_path(upload)
+    sha256 = file_digest(path)
+
+    blob = MediaBlob.objects.filter(sha256=sha256).first()
+    if blob is None:
+        storage = media_storage()
+        name = f'{sha256[:2]}/{sha256[2:4]}/{sha256}'
+        if not storage.exists(name):
+            with open(path, 'rb') as part:
+                name = storage.save(name, File(part))
+        try:
+            with transaction.atomic():
+                blob = MediaBlob.objects.create(
+                    sha256=sha256, size=upload.size,
+                    # Never serve a client-declared type that a browser would run
+                    content_type=allowed_content_type(upload.content_type), storage_name=name,
+                )
+        except IntegrityError:
+            # Same content finished concurrently by another upload
+            blob = MediaBlob.objects.get(sha256=sha256)
+
+    os.remove(path)
+    upload.blob = blob
+    upload.status = MediaUpload.Status.COMPLETE
+    upload.save(update_fields=['blob', 'status', 'updated_at'])
+    return blob
+
+
+def parse_range(header, size):
+    """
+    A single `Range: bytes=...` header -> inclusive (start, end), None when
+    there is no usable header, or False when it cannot be satisfied.
+    """
+    match = RANGE_RE.match(header or '')
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if first == '':
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def iter_file_range(handle, start, end):
+    """ Stream bytes start..end (inclusive) of an open file, then close it. """
+    try:
+        handle.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = handle.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        handle.close()
@@ -0,0 +1,49 @@
+# chat/membership.py
+
+from collections import namedtuple
+from django.core.cache import cache
+from django.db import transaction
+from .models import GroupMember
+
+Membership = namedtuple('Membership', ['role', 'is_muted'])
+
+CACHE_TIMEOUT = 5 * 60
+
+
+def _cache_key(user_id):
+    return f'group_memberships:{user_id}'
+
+
+def load_memberships(user_id):
+    """
+    {group_id: Membership} for one user, from the shared cache or one query.
+    Entries are dropped by invalidate_memberships() whenever a GroupMember
+    row of the user changes.
+    """
+    memberships = cache.get(_cache_key(user_id))
+    if memberships is None:
+        memberships = {
+            group_id: Membership(role, is_muted)
+            for group_id, role, is_muted in GroupMember.objects.filter(user_id=user_id)
+            .values_list('group_id', 'role', 'is_muted')
+        }
+        cache.set(_cache_key(user_id), memberships, CACHE_TIMEOUT)
+    return memberships
+
+
+def get_memberships(request):
+    """ The caller's memberships, resolved at most once per request. """
+    if not hasattr(request, '_group_memberships'):
+        request._group_memberships = load_memberships(request.user.id)
+    return request._group_memberships
+
+
+def is_group_admin(memberships, group_id):
+    membership = memberships.get(int(group_id))
+    return membership is not None and membership.role == GroupMember.Role.ADMIN
+
+
+def invalidate_memberships(user_ids):
+    # After commit, so a concurrent reader cannot re-cache the old rows
+    keys = [_cache_key(user_id) for user_id in set(user_ids)]
+    transaction.on_commit(lambda: cache.delete_many(keys))
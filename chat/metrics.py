@@ -0,0 +1,272 @@
+# chat/metrics.py
+
+import bisect
+import contextvars
+import heapq
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+# Metrics are kept per process (one Daphne worker); scrape every worker.
+#
+# Prometheus text exposition without an extra dependency: just the three
+# metric types used here.
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+
+def _label_text(names, values):
+    if not names:
+        return ''
+    pairs = ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n'))
+        for name, value in zip(names, values)
+    )
+    return '{' + pairs + '}'
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.lock = threading.Lock()
+        self.values = {}
+        registry.append(self)
+
+    def _key(self, labels):
+        return tuple(labels.get(name, '') for name in self.labelnames)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        with self.lock:
+            items = sorted(self.values.items())
+        for key, value in items:
+            lines.extend(self.render_sample(key, value))
+        return lines
+
+    def render_sample(self, key, value):
+        return [f'{self.name}{_label_text(self.labelnames, key)} {value}']
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        with self.lock:
+            self.values[self._key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self.lock:
+            sample = self.values.get(key)
+            if sample is None:
+                # per-bucket counts (+Inf last), sum, count
+                sample = self.values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            sample[0][bisect.bisect_left(self.buckets, value)] += 1
+            sample[1] += value
+            sample[2] += 1
+
+    def render_sample(self, key, value):
+        counts, total, count = value
+        names = self.labelnames + ('le',)
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + ('+Inf',), counts):
+            cumulative += bucket_count
+            lines.append(f'{self.name}_bucket{_label_text(names, key + (bound,))} {cumulative}')
+        labels = _label_text(self.labelnames, key)
+        lines.append(f'{self.name}_sum{labels} {total}')
+        lines.append(f'{self.name}_count{labels} {count}')
+        return lines
+
+
+registry = []
+
+# Callables run before each render, for values sampled at scrape time
+collectors = []
+
+
+def render_metrics():
+    for collect in collectors:
+        collect()
+    lines = []
+    for metric in registry:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+# --- HTTP ---
+
+http_requests = Counter('talkative_http_requests_total', 'HTTP requests handled.', ['method', 'route', 'status'])
+http_latency = Histogram('talkative_http_request_duration_seconds', 'Time spent handling a request.', ['method', 'route'])
+http_response_size = Histogram(
+    'talkative_http_response_size_bytes', 'Size of non-streaming response bodies.', ['route'], buckets=SIZE_BUCKETS,
+)
+db_queries = Histogram(
+    'talkative_db_queries_per_request', 'Database queries run by one request.', ['route'], buckets=COUNT_BUCKETS,
+)
+db_query_time = Histogram('talkative_db_query_duration_seconds', 'Time spent in database queries per request.', ['route'])
+serializer_time = Histogram('talkative_serializer_duration_seconds', 'Time spent building serializer .data.', ['serializer'])
+request_serializer_time = Histogram(
+    'talkative_request_serializer_duration_seconds', 'Time spent in serializers per request.', ['route'],
+)
+
+
+# --- WebSockets / channel layer ---
+
+ws_connections = Gauge('talkative_ws_connections', 'Open WebSocket connections.', ['room_type'])
+ws_frames = Counter('talkative_ws_frames_total', 'WebSocket frames received and sent.', ['direction', 'room_type'])
+ws_save_message = Histogram('talkative_ws_save_message_seconds', 'Time to save a message sent over a socket.', ['room_type'])
+group_send_latency = Histogram('talkative_channel_group_send_seconds', 'Channel layer group_send latency.', ['kind'])
+channel_queue_depth = Gauge('talkative_channel_layer_queue_depth', 'Messages received by this worker but not yet consumed.')
+channel_capacity_drops = Counter(
+    'talkative_channel_layer_capacity_drops_total', 'Messages dropped because a channel was at capacity.',
+)
+
+
+@contextmanager
+def timed(histogram, **labels):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.observe(time.perf_counter() - started, **labels)
+
+
+class CapacityDropHandler(logging.Handler):
+    """
+    channels_redis only reports group_send capacity drops in a log record
+    ("%s of %s channels over capacity in group %s"); count them from there.
+    Attached to the channels_redis.core logger in settings.LOGGING.
+    """
+    def emit(self, record):
+        if 'over capacity' in str(record.msg) and record.args:
+            channel_capacity_drops.inc(record.args[0])
+
+
+def collect_channel_queue_depth():
+    from channels.layers import get_channel_layer
+
+    layer = get_channel_layer()
+    # RedisChannelLayer buffers per-socket messages locally; the in-memory
+    # layer keeps every queue in `channels`
+    queues = getattr(layer, 'receive_buffer', None)
+    if queues is None:
+        queues = getattr(layer, 'channels', {})
+    try:
+        sizes = [queue.qsize() for queue in list(queues.values())]
+    except RuntimeError:
+        # Resized by the event loop thread mid-copy; keep the last sample
+        return
+    channel_queue_depth.set(sum(sizes))
+
+
+def instrument_channel_layer():
+    """ Called once from ChatConfig.ready(). """
+    if collect_channel_queue_depth not in collectors:
+        collectors.append(collect_channel_queue_depth)
+
+
+# --- Logging ---
+
+log_records_dropped = Counter('talkative_log_records_dropped_total', 'Log records dropped because the log queue was full.')
+
+
+# --- Per-request query recording ---
+
+_current_recorder = contextvars.ContextVar('request_recorder', default=None)
+
+
+class QueryRecorder:
+    """
+    connection.execute_wrapper() hook counting the queries of one request and
+    keeping the `keep` slowest for the slow-request log. Also collects the
+    request's serializer time (see timed_serializer).
+    """
+    def __init__(self, keep=5):
+        self.count = 0
+        self.duration = 0.0
+        self.serializer_duration = 0.0
+        self.serializer_depth = 0
+        self.keep = keep
+        self.slowest = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.count += 1
+            self.duration += elapsed
+            if self.keep:
+                entry = (elapsed, self.count, sql)
+                if len(self.slowest) < self.keep:
+                    heapq.heappush(self.slowest, entry)
+                else:
+                    heapq.heappushpop(self.slowest, entry)
+
+    def top_queries(self):
+        return [(elapsed, sql) for elapsed, _, sql in sorted(self.slowest, reverse=True)]
+
+
+def start_recording(keep=5):
+    recorder = QueryRecorder(keep)
+    return recorder, _current_recorder.set(recorder)
+
+
+def stop_recording(token):
+    _current_recorder.reset(token)
+
+
+@contextmanager
+def timed_serializer(name):
+    """
+    Time building one serializer's `.data`, per serializer class and towards
+    the current request's total (see chat.serializers.TimedSerializerMixin).
+    """
+    recorder = _current_recorder.get()
+    if recorder is not None:
+        recorder.serializer_depth += 1
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        serializer_time.observe(elapsed, serializer=name)
+        if recorder is not None:
+            recorder.serializer_depth -= 1
+            # Serializers calling other serializers' .data count once
+            if not recorder.serializer_depth:
+                recorder.serializer_duration += elapsed
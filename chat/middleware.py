@@ -1,11 +1,19 @@
 # chat/middleware.py
 
+import logging
+import time
+from contextlib import ExitStack
 from channels.db import database_sync_to_async
 from channels.auth import AuthMiddlewareStack
 from django.contrib.auth.models import AnonymousUser
+from rest_framework.exceptions import AuthenticationFailed
 from rest_framework_simplejwt.tokens import AccessToken
+from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
 from django.contrib.auth import get_user_model
+from django.conf import settings
+from django.db import connections
+from . import db_routers, log, metrics, profiling
 
 User = get_user_model()
 
@@ -38,3 +46,136 @@ class TokenAuthMiddleware:
 # Helper to wrap the middleware
 def TokenAuthMiddlewareStack(inner):
     return TokenAuthMiddleware(AuthMiddlewareStack(inner))
+
+
+class DatabaseRoutingMiddleware:
+    """ Give chat.db_routers.ReplicaRouter a per-request state to work with. """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = db_routers.begin_request(request)
+        try:
+            return self.get_response(request)
+        finally:
+            db_routers.end_request(token)
+
+
+slow_request_logger = logging.getLogger('chat.slow_requests')
+
+
+class CorrelationIdMiddleware:
+    """
+    Tag every log record of a request with its id: the caller's X-Request-ID
+    if it sent a sane one, otherwise a new one. Echoed in the response.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request_id = request.headers.get('X-Request-ID', '')
+        if not (0 < len(request_id) <= 64 and request_id.replace('-', '').isalnum()):
+            request_id = log.new_correlation_id('req-')
+        request.correlation_id = request_id
+        token = log.bind(request_id)
+        try:
+            response = self.get_response(request)
+        finally:
+            log.unbind(token)
+        response['X-Request-ID'] = request_id
+        return response
+
+
+class MetricsMiddleware:
+    """
+    Per-request latency, status, query count/time, serializer time and
+    response size, labelled by URL route (not path, to keep label cardinality
+    bounded). Requests slower than CHAT_SLOW_REQUEST_MS are logged with their
+    slowest queries.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.slow_ms = getattr(settings, 'CHAT_SLOW_REQUEST_MS', None)
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        recorder, token = metrics.start_recording(keep=5 if self.slow_ms else 0)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(recorder))
+                response = self.get_response(request)
+        finally:
+            metrics.stop_recording(token)
+        elapsed = time.perf_counter() - started
+        self.record(request, response, recorder, elapsed)
+        return response
+
+    def record(self, request, response, recorder, elapsed):
+        match = getattr(request, 'resolver_match', None)
+        route = '/' + match.route if match else 'unmatched'
+        method = request.method
+
+        metrics.http_requests.inc(method=method, route=route, status=response.status_code)
+        metrics.http_latency.observe(elapsed, method=method, route=route)
+        metrics.db_queries.observe(recorder.count, route=route)
+        metrics.db_query_time.observe(recorder.duration, route=route)
+        metrics.request_serializer_time.observe(recorder.serializer_duration, route=route)
+        if not response.streaming:
+            metrics.http_response_size.observe(len(response.content), route=route)
+
+        if self.slow_ms and elapsed * 1000 >= self.slow_ms:
+            slow_request_logger.warning(
+                "Slow request %s %s: %.0fms, %d queries (%.0fms), serializers %.0fms; slowest: %s",
+                method, request.path, elapsed * 1000, recorder.count, recorder.duration * 1000,
+                recorder.serializer_duration * 1000,
+                ' | '.join(f'{seconds * 1000:.1f}ms {sql[:200]}' for seconds, sql in recorder.top_queries()),
+            )
+
+
+def _staff_user(request):
+    """ The session or JWT user behind `request`, if it is staff. """
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        try:
+            user, _ = JWTAuthentication().authenticate(request) or (None, None)
+        except AuthenticationFailed:
+            # Malformed header, bad token, deleted or inactive user
+            user = None
+    return user if user is not None and user.is_staff else None
+
+
+class ProfilingMiddleware:
+    """
+    Staff can profile a single request by sending `X-Profile: cprofile` (or
+    `sample`), or `?_profile=...`. The profile and the request's SQL log are
+    stored as an artifact named in the `X-Profile-Id` response header.
+    Requests without the flag only pay for the header lookup.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        mode = request.headers.get('X-Profile') or request.GET.get('_profile')
+        if not mode:
+            return self.get_response(request)
+
+        user = _staff_user(request)
+        if user is None or mode not in profiling.MODES:
+            return self.get_response(request)
+
+        session = profiling.ProfileSession(mode, 'http', f'{request.method} {request.get_full_path()}', user)
+        try:
+            session.start()
+        except profiling.ProfilerBusy:
+            response = self.get_response(request)
+            response['X-Profile-Skipped'] = 'busy'
+            return response
+        try:
+            with session.capture_queries():
+                response = self.get_response(request)
+        finally:
+            session.stop()
+        meta = session.save(status=response.status_code, correlation_id=log.current_correlation_id())
+        response['X-Profile-Id'] = meta['id']
+        return response
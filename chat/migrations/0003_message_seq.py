@@ -0,0 +1,80 @@
+# Generated by Django 5.2.8 on 2026-10-19 04:41
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_seq(apps, schema_editor):
+    """ Number existing messages per conversation in their historical order. """
+    for parent_name, message_name, fk in (
+        ('DirectChat', 'DirectMessage', 'chat'),
+        ('Group', 'GroupMessage', 'group'),
+    ):
+        Parent = apps.get_model('chat', parent_name)
+        Message = apps.get_model('chat', message_name)
+        for parent in Parent.objects.all().iterator():
+            messages = list(
+                Message.objects.filter(**{fk: parent}).order_by('created_at', 'id').only('id')
+            )
+            for seq, message in enumerate(messages, start=1):
+                message.seq = seq
+            Message.objects.bulk_update(messages, ['seq'], batch_size=500)
+            Parent.objects.filter(pk=parent.pk).update(last_seq=len(messages))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0002_friendship_requester'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='directmessage',
+            options={'ordering': ['seq']},
+        ),
+        migrations.AlterModelOptions(
+            name='groupmessage',
+            options={'ordering': ['seq']},
+        ),
+        migrations.AddField(
+            model_name='directchat',
+            name='last_seq',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='directmessage',
+            name='seq',
+            field=models.PositiveBigIntegerField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='group',
+            name='last_seq',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='groupmessage',
+            name='seq',
+            field=models.PositiveBigIntegerField(editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_seq, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='directmessage',
+            name='seq',
+            field=models.PositiveBigIntegerField(editable=False),
+        ),
+        migrations.AlterField(
+            model_name='groupmessage',
+            name='seq',
+            field=models.PositiveBigIntegerField(editable=False),
+        ),
+        migrations.AddConstraint(
+            model_name='directmessage',
+            constraint=models.UniqueConstraint(fields=('chat', 'seq'), name='unique_direct_message_seq'),
+        ),
+        migrations.AddConstraint(
+            model_name='groupmessage',
+            constraint=models.UniqueConstraint(fields=('group', 'seq'), name='unique_group_message_seq'),
+        ),
+    ]
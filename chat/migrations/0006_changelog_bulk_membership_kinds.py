@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 04:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0005_media'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='changelog',
+            name='kind',
+            field=models.CharField(choices=[('message.created', 'Message created'), ('message.updated', 'Message updated'), ('message.deleted', 'Message deleted'), ('member.added', 'Member added'), ('member.updated', 'Member updated'), ('member.removed', 'Member removed'), ('members.added', 'Members added'), ('members.removed', 'Members removed'), ('friendship.updated', 'Friendship updated'), ('friendship.deleted', 'Friendship deleted')], max_length=32),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.8 on 2026-10-19 04:49
+
+import hashlib
+
+from django.db import migrations, models
+
+
+def backfill_contact_hashes(apps, schema_editor):
+    Profile = apps.get_model('chat', 'Profile')
+    digest = lambda value: hashlib.sha256(value.strip().lower().encode('utf-8')).hexdigest()
+    profiles = list(Profile.objects.select_related('user'))
+    for profile in profiles:
+        profile.email_hash = digest(profile.user.email) if profile.user.email else ''
+        profile.username_hash = digest(profile.user.username)
+    Profile.objects.bulk_update(profiles, ['email_hash', 'username_hash'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0006_changelog_bulk_membership_kinds'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='email_hash',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='username_hash',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+        migrations.RunPython(backfill_contact_hashes, migrations.RunPython.noop),
+    ]
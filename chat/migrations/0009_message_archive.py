@@ -0,0 +1,86 @@
+# Generated by Django 5.2.8 on 2026-10-19 05:01
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# table -> (room column, seq index name)
+ARCHIVE_TABLES = {
+    'chat_archiveddirectmessage': ('chat_id', 'archived_dm_chat_seq'),
+    'chat_archivedgroupmessage': ('group_id', 'archived_group_msg_seq'),
+}
+
+
+def partition_archive_tables(apps, schema_editor):
+    """
+    On PostgreSQL, rebuild the (still empty) archive tables as range
+    partitioned by created_at; monthly partitions are added as rows are
+    archived. Other databases keep the plain tables.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table, (room_column, index_name) in ARCHIVE_TABLES.items():
+        schema_editor.execute(f'ALTER TABLE {table} RENAME TO {table}_template')
+        schema_editor.execute(
+            f'CREATE TABLE {table} (LIKE {table}_template INCLUDING DEFAULTS) PARTITION BY RANGE (created_at)'
+        )
+        # The partition key has to be part of the primary key
+        schema_editor.execute(f'ALTER TABLE {table} ADD PRIMARY KEY (id, created_at)')
+        schema_editor.execute(f'DROP TABLE {table}_template')
+        schema_editor.execute(f'CREATE INDEX {index_name} ON {table} ({room_column}, seq)')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0008_retention'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedDirectMessage',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('seq', models.PositiveBigIntegerField()),
+                ('message_text', models.TextField()),
+                ('message_type', models.CharField(choices=[('text', 'Text'), ('image', 'Image'), ('file', 'File'), ('audio', 'Audio')], max_length=10)),
+                ('media_url', models.URLField(blank=True, max_length=500)),
+                ('delivery_status', models.CharField(choices=[('sent', 'Sent'), ('delivered', 'Delivered'), ('seen', 'Seen')], max_length=10)),
+                ('edited_at', models.DateTimeField(blank=True, null=True)),
+                ('is_deleted_for_sender', models.BooleanField(default=False)),
+                ('is_deleted_for_receiver', models.BooleanField(default=False)),
+                ('reactions', models.JSONField(default=list)),
+                ('created_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('chat', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='archived_messages', to='chat.directchat')),
+                ('sender', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['seq'],
+                'indexes': [models.Index(fields=['chat', 'seq'], name='archived_dm_chat_seq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedGroupMessage',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('seq', models.PositiveBigIntegerField()),
+                ('message_text', models.TextField()),
+                ('message_type', models.CharField(choices=[('text', 'Text'), ('image', 'Image'), ('file', 'File'), ('audio', 'Audio')], max_length=10)),
+                ('media_url', models.URLField(blank=True, max_length=500)),
+                ('edited_at', models.DateTimeField(blank=True, null=True)),
+                ('is_deleted', models.BooleanField(default=False)),
+                ('reactions', models.JSONField(default=list)),
+                ('created_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('group', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='archived_messages', to='chat.group')),
+                ('sender', models.ForeignKey(db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['seq'],
+                'indexes': [models.Index(fields=['group', 'seq'], name='archived_group_msg_seq')],
+            },
+        ),
+        migrations.RunPython(partition_archive_tables, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.8 on 2026-10-19 05:20
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_last_read_seq(apps, schema_editor):
+    GroupMember = apps.get_model('chat', 'GroupMember')
+    GroupMessage = apps.get_model('chat', 'GroupMessage')
+    GroupMember.objects.exclude(last_read_message=None).update(
+        last_read_seq=Subquery(GroupMessage.objects.filter(pk=OuterRef('last_read_message_id')).values('seq')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0009_message_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='groupmember',
+            name='last_read_seq',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_last_read_seq, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.8 on 2026-10-19 05:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def backfill_archived_through_seq(apps, schema_editor):
+    """ Record how far rooms archived before this migration go. """
+    for parent_name, archive_name, fk in (
+        ('DirectChat', 'ArchivedDirectMessage', 'chat_id'),
+        ('Group', 'ArchivedGroupMessage', 'group_id'),
+    ):
+        Parent = apps.get_model('chat', parent_name)
+        Archive = apps.get_model('chat', archive_name)
+        for room_id, seq in Archive.objects.values_list(fk).annotate(Max('seq')).order_by():
+            Parent.objects.filter(pk=room_id).update(archived_through_seq=seq)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0010_groupmember_last_read_seq'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='directchat',
+            name='archived_through_seq',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='group',
+            name='archived_through_seq',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='groupmember',
+            name='last_read_message',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, to='chat.groupmessage'),
+        ),
+        migrations.RunPython(backfill_archived_through_seq, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.8 on 2026-10-19 05:52
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_message_ref(apps, schema_editor):
+    """ Tag existing entries about messages so purges can find them. """
+    ChangeLog = apps.get_model('chat', 'ChangeLog')
+    batch = []
+    for entry in ChangeLog.objects.filter(payload__has_key='conversation').only('id', 'payload').iterator(chunk_size=1000):
+        entry.message_ref = f"{entry.payload['conversation']}:{entry.payload['id']}"
+        batch.append(entry)
+        if len(batch) == 1000:
+            ChangeLog.objects.bulk_update(batch, ['message_ref'])
+            batch = []
+    ChangeLog.objects.bulk_update(batch, ['message_ref'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0011_archived_through_seq'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='changelog',
+            name='message_ref',
+            field=models.CharField(blank=True, default='', max_length=32),
+        ),
+        migrations.AddIndex(
+            model_name='changelog',
+            index=models.Index(condition=models.Q(('message_ref', ''), _negated=True), fields=['message_ref'], name='changelog_message_ref'),
+        ),
+        migrations.RunPython(backfill_message_ref, migrations.RunPython.noop),
+    ]
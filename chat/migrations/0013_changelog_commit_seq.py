@@ -0,0 +1,47 @@
+# Generated by Django 5.2.8 on 2026-10-19 05:53
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F, Max
+
+
+def backfill_commit_seq(apps, schema_editor):
+    """ Existing entries keep their id as seq, so cursors already handed out stay valid. """
+    ChangeLog = apps.get_model('chat', 'ChangeLog')
+    SyncCounter = apps.get_model('chat', 'SyncCounter')
+    ChangeLog.objects.update(commit_seq=F('id'))
+    last_seq = ChangeLog.objects.aggregate(Max('id'))['id__max'] or 0
+    SyncCounter.objects.create(pk=1, last_seq=last_seq)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0012_changelog_message_ref'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_seq', models.PositiveBigIntegerField(default=0)),
+                ('pruned_through_seq', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RemoveIndex(
+            model_name='changelog',
+            name='changelog_user_cursor',
+        ),
+        migrations.AddField(
+            model_name='changelog',
+            name='commit_seq',
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_commit_seq, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='changelog',
+            index=models.Index(fields=['user', 'commit_seq'], name='changelog_user_cursor'),
+        ),
+    ]
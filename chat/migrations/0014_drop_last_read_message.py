@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-19 05:57
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0013_changelog_commit_seq'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='groupmember',
+            name='last_read_message',
+        ),
+    ]
@@ -1,7 +1,9 @@
 
 
-from django.db import models
+import uuid
+from django.db import models, transaction
 from django.contrib.auth.models import User
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db.models import Q, F, CheckConstraint, UniqueConstraint
 
 # 1. Core User and Relationship Models
@@ -10,6 +12,9 @@ class Profile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True)
     profile_picture_url = models.URLField(max_length=500, blank=True)
     bio = models.TextField(blank=True)
+    # SHA-256 of the normalized email/username, for contact matching (see chat/contacts.py)
+    email_hash = models.CharField(max_length=64, blank=True, db_index=True)
+    username_hash = models.CharField(max_length=64, blank=True, db_index=True)
 
     def __str__(self):
         return self.user.username
@@ -58,11 +63,42 @@ class BlockedUser(models.Model):
 
 # 2. Direct Messaging Models
 
-class DirectChat(models.Model):
+def allocate_seq(model, pk):
+    """
+    Reserve the next message sequence number of a chat or group row.
+
+    The UPDATE locks the parent row until the surrounding transaction ends,
+    so concurrent senders in the same conversation are serialized.
+    """
+    model.objects.filter(pk=pk).update(last_seq=F('last_seq') + 1)
+    return model.objects.filter(pk=pk).values_list('last_seq', flat=True).get()
+
+
+class SequenceCounterMixin:
+    """
+    Keep ``last_seq`` and ``archived_through_seq`` out of ordinary saves so a
+    stale in-memory instance (e.g. ``chat.save()`` after a message was sent)
+    never rewinds the counters.
+    """
+    counter_fields = ('last_seq', 'archived_through_seq')
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.counter_fields
+            ]
+        super().save(*args, **kwargs)
+
+
+class DirectChat(SequenceCounterMixin, models.Model):
     user_one = models.ForeignKey(User, on_delete=models.CASCADE, related_name='direct_chats_one')
     user_two = models.ForeignKey(User, on_delete=models.CASCADE, related_name='direct_chats_two')
     created_at = models.DateTimeField(auto_now_add=True)
     last_message_at = models.DateTimeField(auto_now=True)
+    last_seq = models.PositiveBigIntegerField(default=0)
+    # Highest seq moved to the archive tables; 0 while the whole history is live
+    archived_through_seq = models.PositiveBigIntegerField(default=0)
 
     class Meta:
         constraints = [
@@ -86,6 +122,7 @@ class DirectMessage(models.Model):
         SEEN = 'seen', 'Seen'
 
     chat = models.ForeignKey(DirectChat, on_delete=models.CASCADE, related_name='messages')
+    seq = models.PositiveBigIntegerField(editable=False)
     sender = models.ForeignKey(User, on_delete=models.CASCADE, related_name='sent_direct_messages')
     message_text = models.TextField()
     message_type = models.CharField(max_length=10, choices=MessageType.choices, default=MessageType.TEXT)
@@ -97,12 +134,23 @@ class DirectMessage(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
-        ordering = ['created_at']
+        ordering = ['seq']
+        constraints = [
+            UniqueConstraint(fields=['chat', 'seq'], name='unique_direct_message_seq')
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.seq is None:
+            with transaction.atomic():
+                self.seq = allocate_seq(DirectChat, self.chat_id)
+                super().save(*args, **kwargs)
+            return
+        super().save(*args, **kwargs)
 
 
 # 3. Group Chat Models
 
-class Group(models.Model):
+class Group(SequenceCounterMixin, models.Model):
     class GroupType(models.TextChoices):
         PUBLIC = 'public', 'Public'
         PRIVATE = 'private', 'Private'
@@ -114,6 +162,10 @@ class Group(models.Model):
     group_type = models.CharField(max_length=10, choices=GroupType.choices, default=GroupType.PRIVATE)
     created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='created_groups')
     created_at = models.DateTimeField(auto_now_add=True)
+    last_seq = models.PositiveBigIntegerField(default=0)
+    archived_through_seq = models.PositiveBigIntegerField(default=0)
+    # Messages older than this are purged; empty falls back to CHAT_MESSAGE_RETENTION_DAYS
+    retention_days = models.PositiveIntegerField(null=True, blank=True)
     # --- THIS IS THE CORRECTED LINE ---
     members = models.ManyToManyField(User, through='GroupMember', through_fields=('group', 'user'), related_name='chat_groups')
 
@@ -124,6 +176,7 @@ class GroupMessage(models.Model):
     MessageType = DirectMessage.MessageType
 
     group = models.ForeignKey(Group, on_delete=models.CASCADE, related_name='messages')
+    seq = models.PositiveBigIntegerField(editable=False)
     sender = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='sent_group_messages')
     message_text = models.TextField()
     message_type = models.CharField(max_length=10, choices=MessageType.choices, default=MessageType.TEXT)
@@ -133,7 +186,18 @@ class GroupMessage(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
-        ordering = ['created_at']
+        ordering = ['seq']
+        constraints = [
+            UniqueConstraint(fields=['group', 'seq'], name='unique_group_message_seq')
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.seq is None:
+            with transaction.atomic():
+                self.seq = allocate_seq(Group, self.group_id)
+                super().save(*args, **kwargs)
+            return
+        super().save(*args, **kwargs)
 
 class GroupMember(models.Model):
     class Role(models.TextChoices):
@@ -145,7 +209,9 @@ class GroupMember(models.Model):
     role = models.CharField(max_length=10, choices=Role.choices, default=Role.MEMBER)
     added_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='added_group_members')
     is_muted = models.BooleanField(default=False)
-    last_read_message = models.ForeignKey(GroupMessage, on_delete=models.SET_NULL, null=True, blank=True)
+    # Read watermark: seq of the last message read. A seq, not a message FK, so it
+    # stays valid when that message is purged or archived
+    last_read_seq = models.PositiveBigIntegerField(default=0)
     joined_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -175,3 +241,152 @@ class GroupMessageReaction(models.Model):
     class Meta:
         unique_together = ('message', 'user', 'reaction_type')
 
+
+# 5. Sync Models
+
+class ChangeLog(models.Model):
+    """
+    Append-only, per-user feed of changes, read by the delta sync endpoint.
+    The client's sync cursor is `commit_seq`, set by SyncCounter once the
+    writing transaction has committed (null until then). Entries about a message
+    carry its `message_ref` ("dm:<id>" / "group:<id>") so they can go with it
+    when the message is purged or archived.
+    """
+    class Kind(models.TextChoices):
+        MESSAGE_CREATED = 'message.created', 'Message created'
+        MESSAGE_UPDATED = 'message.updated', 'Message updated'
+        MESSAGE_DELETED = 'message.deleted', 'Message deleted'
+        MEMBER_ADDED = 'member.added', 'Member added'
+        MEMBER_UPDATED = 'member.updated', 'Member updated'
+        MEMBER_REMOVED = 'member.removed', 'Member removed'
+        MEMBERS_ADDED = 'members.added', 'Members added'
+        MEMBERS_REMOVED = 'members.removed', 'Members removed'
+        FRIENDSHIP_UPDATED = 'friendship.updated', 'Friendship updated'
+        FRIENDSHIP_DELETED = 'friendship.deleted', 'Friendship deleted'
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='change_log', db_index=False)
+    kind = models.CharField(max_length=32, choices=Kind.choices)
+    payload = models.JSONField(encoder=DjangoJSONEncoder)
+    message_ref = models.CharField(max_length=32, blank=True, default='')
+    commit_seq = models.PositiveBigIntegerField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['user', 'commit_seq'], name='changelog_user_cursor'),
+            models.Index(fields=['message_ref'], name='changelog_message_ref', condition=~Q(message_ref='')),
+        ]
+
+
+class SyncCounter(models.Model):
+    """
+    The single row handing out ChangeLog.commit_seq. Taking a seq locks the
+    row until that transaction commits, so seqs become visible in order: a
+    reader that sees seq N also sees every seq below it.
+    """
+    last_seq = models.PositiveBigIntegerField(default=0)
+    # Highest commit_seq deleted by the change-log prune; older cursors must resync
+    pruned_through_seq = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"sync @ {self.last_seq}"
+
+
+# 6. Media Models
+
+class MediaBlob(models.Model):
+    """ An uploaded file, stored once per distinct content (keyed by SHA-256). """
+    sha256 = models.CharField(max_length=64, primary_key=True)
+    size = models.PositiveBigIntegerField()
+    content_type = models.CharField(max_length=100)
+    storage_name = models.CharField(max_length=255)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.sha256
+
+
+class MediaUpload(models.Model):
+    """ A resumable upload session; bytes are appended in order until `size` is reached. """
+    class Status(models.TextChoices):
+        UPLOADING = 'uploading', 'Uploading'
+        COMPLETE = 'complete', 'Complete'
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='media_uploads')
+    filename = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=100)
+    size = models.PositiveBigIntegerField()
+    received = models.PositiveBigIntegerField(default=0)
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.UPLOADING)
+    blob = models.ForeignKey(MediaBlob, on_delete=models.PROTECT, null=True, blank=True, related_name='uploads')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.filename} ({self.received}/{self.size})"
+
+
+# 7. Archive Models
+# Messages past CHAT_ARCHIVE_AFTER_DAYS are moved here by `manage.py
+# archive_messages`, keeping their id and seq. On PostgreSQL both tables are
+# range-partitioned by month on created_at (see migration 0009). Relations
+# carry no DB constraints, as partitioned tables are rebuilt without them.
+
+class ArchivedDirectMessage(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    chat = models.ForeignKey(DirectChat, on_delete=models.CASCADE, db_constraint=False, db_index=False, related_name='archived_messages')
+    seq = models.PositiveBigIntegerField()
+    sender = models.ForeignKey(User, on_delete=models.CASCADE, db_constraint=False, db_index=False, related_name='+')
+    message_text = models.TextField()
+    message_type = models.CharField(max_length=10, choices=DirectMessage.MessageType.choices)
+    media_url = models.URLField(max_length=500, blank=True)
+    delivery_status = models.CharField(max_length=10, choices=DirectMessage.DeliveryStatus.choices)
+    edited_at = models.DateTimeField(blank=True, null=True)
+    is_deleted_for_sender = models.BooleanField(default=False)
+    is_deleted_for_receiver = models.BooleanField(default=False)
+    # [{"user_id": ..., "reaction_type": ...}], flattened from DirectMessageReaction
+    reactions = models.JSONField(default=list)
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['seq']
+        indexes = [
+            models.Index(fields=['chat', 'seq'], name='archived_dm_chat_seq')
+        ]
+
+
+class ArchivedGroupMessage(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    group = models.ForeignKey(Group, on_delete=models.CASCADE, db_constraint=False, db_index=False, related_name='archived_messages')
+    seq = models.PositiveBigIntegerField()
+    sender = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, db_constraint=False, db_index=False, related_name='+')
+    message_text = models.TextField()
+    message_type = models.CharField(max_length=10, choices=GroupMessage.MessageType.choices)
+    media_url = models.URLField(max_length=500, blank=True)
+    edited_at = models.DateTimeField(blank=True, null=True)
+    is_deleted = models.BooleanField(default=False)
+    reactions = models.JSONField(default=list)
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['seq']
+        indexes = [
+            models.Index(fields=['group', 'seq'], name='archived_group_msg_seq')
+        ]
+
+
+# 8. Maintenance Models
+
+class PurgeCheckpoint(models.Model):
+    """ How far a retention job got, so an interrupted run resumes where it stopped. """
+    job = models.CharField(max_length=100, primary_key=True)
+    last_key = models.BigIntegerField(default=0)
+    rows_deleted = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.job} @ {self.last_key}"
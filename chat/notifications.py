@@ -0,0 +1,104 @@
+# chat/notifications.py
+
+import asyncio
+import json
+import re
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.core.serializers.json import DjangoJSONEncoder
+from .blocks import without_blocked
+from .metrics import group_send_latency, timed
+from .models import GroupMember
+from .tasks import enqueue, task
+
+
+def user_group(user_id):
+    """ Channel-layer group joined by every socket of `user_id`, whatever room it shows. """
+    return f'user_{user_id}'
+
+
+def notify(user_ids, kind, payload):
+    """
+    Push a compact `{kind, payload}` event to every connected device of the
+    given users once the current transaction commits. Delivery runs on the
+    task queue, so a slow channel layer never holds up the request.
+    """
+    user_ids = sorted(set(user_ids))
+    if not user_ids:
+        return
+    # Channel layers and the Redis task backend both need plain JSON types
+    payload = json.loads(json.dumps(payload, cls=DjangoJSONEncoder))
+    enqueue('user.notify', user_ids, str(kind), payload)
+
+
+@task('user.notify')
+def deliver(user_ids, kind, payload):
+    # One event loop, and so one channels_redis connection pool, for the whole fan-out
+    async_to_sync(send_to_users)(user_ids, {'type': 'user_notify', 'kind': kind, 'payload': payload})
+
+
+async def send_to_users(user_ids, event):
+    channel_layer = get_channel_layer()
+
+    async def send(user_id):
+        with timed(group_send_latency, kind='user'):
+            await channel_layer.group_send(user_group(user_id), dict(event))
+
+    results = await asyncio.gather(*(send(user_id) for user_id in user_ids), return_exceptions=True)
+    errors = [result for result in results if isinstance(result, Exception)]
+    if errors:
+        # Every other user has been sent to; the task queue retries the lot
+        raise errors[0]
+
+
+# `@username`, not inside an email address; Django usernames may contain . + -
+MENTION_RE = re.compile(r'(?<![\w@])@([\w.+-]+)')
+
+
+def mentioned_user_ids(message):
+    """ Members of the message's group named with @username in its text, minus the sender. """
+    names = {name.rstrip('.') for name in MENTION_RE.findall(message.message_text or '')}
+    if not names:
+        return []
+    return list(
+        GroupMember.objects.filter(group_id=message.group_id, user__username__in=names)
+        .exclude(user_id=message.sender_id)
+        .values_list('user_id', flat=True)
+    )
+
+
+def notify_mentions(message):
+    """ Tell mentioned members, except those on either side of a block with the sender. """
+    user_ids = without_blocked(message.sender_id, mentioned_user_ids(message))
+    notify(user_ids, 'group.mention', group_mention_payload(message))
+
+
+# --- Payloads ---
+# Enough for a client to update its lists; full data comes from the sync API.
+
+def direct_chat_payload(chat):
+    return {
+        'chat': chat.id,
+        'user_one': chat.user_one_id,
+        'user_two': chat.user_two_id,
+    }
+
+
+def direct_message_payload(message):
+    return {
+        'chat': message.chat_id,
+        'id': message.id,
+        'seq': message.seq,
+        'sender_id': message.sender_id,
+        'created_at': message.created_at,
+    }
+
+
+def group_mention_payload(message):
+    return {
+        'group': message.group_id,
+        'id': message.id,
+        'seq': message.seq,
+        'sender_id': message.sender_id,
+        'created_at': message.created_at,
+    }
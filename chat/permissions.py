@@ -1,15 +1,32 @@
 # chat/permissions.py
 
+import hmac
+from django.conf import settings
 from rest_framework import permissions
-from .models import GroupMember
+from .media import check_media_token
+from .membership import get_memberships, is_group_admin
 
 class IsGroupAdmin(permissions.BasePermission):
     """
     Allows access only to admin members of a group.
     """
     def has_object_permission(self, request, view, obj):
-        try:
-            member = GroupMember.objects.get(group=obj, user=request.user)
-            return member.role == GroupMember.Role.ADMIN
-        except GroupMember.DoesNotExist:
-            return False
+        return is_group_admin(get_memberships(request), obj.pk)
+
+
+class HasMetricsToken(permissions.BasePermission):
+    """
+    Allows access to requests carrying CHAT_METRICS_TOKEN in `X-Metrics-Token`.
+    """
+    def has_permission(self, request, view):
+        expected = getattr(settings, 'CHAT_METRICS_TOKEN', None)
+        supplied = request.headers.get('X-Metrics-Token')
+        return bool(expected and supplied) and hmac.compare_digest(expected.encode(), supplied.encode())
+
+
+class HasMediaToken(permissions.BasePermission):
+    """
+    Allows access to a media blob with a valid signed `?token=` for it.
+    """
+    def has_permission(self, request, view):
+        return check_media_token(view.kwargs.get('sha256'), request.query_params.get('token'))
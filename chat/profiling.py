@@ -0,0 +1,236 @@
+# chat/profiling.py
+
+import cProfile
+import functools
+import io
+import json
+import marshal
+import pstats
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import storages
+from django.db import connections
+from django.utils import timezone
+
+MODES = ('cprofile', 'sample')
+
+ARTIFACT_ID_RE = re.compile(r'^\d{8}T\d{6}-[0-9a-f]{8}$')
+
+# cProfile can only run one profiler at a time, and a second capture would
+# mostly measure the first one: one session per process.
+_session_lock = threading.Lock()
+
+
+class ProfilerBusy(Exception):
+    """ Another profile session is already running in this process. """
+
+
+def profile_storage():
+    return storages['profiles']
+
+
+def _config(name, default):
+    return getattr(settings, 'CHAT_PROFILING', {}).get(name, default)
+
+
+class StackSampler:
+    """
+    Samples one thread's Python stack every `interval` seconds from a
+    background thread; the result is in "folded" format (one
+    `outer;inner;leaf count` line per stack), readable by speedscope and
+    flamegraph.pl.
+    """
+    def __init__(self, thread_id, interval=0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name='stack-sampler', daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({code.co_filename}:{frame.f_lineno})')
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def folded(self):
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+    def summary(self, limit=30):
+        """ Leaf functions by share of samples. """
+        total = sum(self.stacks.values()) or 1
+        leaves = Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(';', 1)[-1]] += count
+        return '\n'.join(f'{count / total:6.1%}  {leaf}' for leaf, count in leaves.most_common(limit))
+
+
+class ProfileSession:
+    """
+    One capture: a cProfile or stack-sampling profile of the current thread
+    plus every SQL query run under capture_queries(). save() writes the
+    profile and a JSON summary to the "profiles" storage.
+    """
+    def __init__(self, mode, kind, label, user):
+        if mode not in MODES:
+            raise ValueError(f'Unknown profile mode {mode!r}')
+        self.mode = mode
+        self.kind = kind
+        self.label = label
+        self.user = user
+        self.id = f"{timezone.now():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+        self.queries = []
+        self.max_queries = _config('MAX_QUERIES', 1000)
+        self.profiler = None
+        self.started = None
+        self.duration = None
+
+    def start(self):
+        if not _session_lock.acquire(blocking=False):
+            raise ProfilerBusy()
+        self.started = time.perf_counter()
+        if self.mode == 'cprofile':
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        else:
+            self.profiler = StackSampler(threading.get_ident(), _config('SAMPLE_INTERVAL', 0.005))
+            self.profiler.start()
+        return self
+
+    def stop(self):
+        if self.duration is not None:
+            return
+        try:
+            if self.mode == 'cprofile':
+                self.profiler.disable()
+            else:
+                self.profiler.stop()
+        finally:
+            self.duration = time.perf_counter() - self.started
+            _session_lock.release()
+
+    def record_query(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            if len(self.queries) < self.max_queries:
+                # Parameters are left out: they are user data
+                self.queries.append({
+                    'sql': sql,
+                    'many': many,
+                    'alias': context['connection'].alias,
+                    'ms': round((time.perf_counter() - started) * 1000, 3),
+                })
+
+    @contextmanager
+    def capture_queries(self):
+        """ Log the queries this thread runs inside the block. """
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(self.record_query))
+            yield
+
+    def profile_data(self):
+        """ (file contents, file extension, text summary) """
+        if self.mode == 'cprofile':
+            summary = io.StringIO()
+            stats = pstats.Stats(self.profiler, stream=summary)
+            stats.sort_stats('cumulative').print_stats(30)
+            # Same bytes as Stats.dump_stats(), which only writes to a path
+            return marshal.dumps(stats.stats), 'prof', summary.getvalue()
+        return self.profiler.folded().encode(), 'folded', self.profiler.summary()
+
+    def save(self, **extra):
+        """ Store the artifact; returns its metadata. """
+        data, extension, summary = self.profile_data()
+        storage = profile_storage()
+        profile_name = storage.save(f'{self.id}.{extension}', ContentFile(data))
+        slowest = sorted(self.queries, key=lambda query: query['ms'], reverse=True)
+        meta = {
+            'id': self.id,
+            'mode': self.mode,
+            'kind': self.kind,
+            'label': self.label,
+            'user': self.user.username,
+            'created_at': timezone.now().isoformat(),
+            'duration_ms': round(self.duration * 1000, 1),
+            'profile_file': profile_name,
+            'query_count': len(self.queries),
+            'query_ms': round(sum(query['ms'] for query in self.queries), 3),
+            'slowest_queries': slowest[:10],
+            'queries': self.queries,
+            'summary': summary,
+            **extra,
+        }
+        storage.save(f'{self.id}.json', ContentFile(json.dumps(meta, indent=1).encode()))
+        return meta
+
+
+def capture_session_queries(method):
+    """
+    For consumer methods run through database_sync_to_async: log their
+    queries into the consumer's running profile session, if any.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        session = getattr(self, 'profile_session', None)
+        if session is None:
+            return method(self, *args, **kwargs)
+        with session.capture_queries():
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+# --- Stored artifacts ---
+
+def list_artifacts(limit=100):
+    storage = profile_storage()
+    try:
+        _, files = storage.listdir('')
+    except FileNotFoundError:
+        return []
+    names = sorted((name for name in files if name.endswith('.json')), reverse=True)[:limit]
+    artifacts = []
+    for name in names:
+        meta = load_artifact(name.removesuffix('.json'))
+        if meta:
+            meta.pop('queries', None)
+            artifacts.append(meta)
+    return artifacts
+
+
+def load_artifact(artifact_id):
+    if not ARTIFACT_ID_RE.match(artifact_id):
+        return None
+    storage = profile_storage()
+    name = f'{artifact_id}.json'
+    if not storage.exists(name):
+        return None
+    with storage.open(name) as handle:
+        return json.load(handle)
+
+
+def delete_artifact(meta):
+    storage = profile_storage()
+    storage.delete(meta['profile_file'])
+    storage.delete(f"{meta['id']}.json")
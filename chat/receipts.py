@@ -0,0 +1,122 @@
+# chat/receipts.py
+
+import logging
+import threading
+from bisect import bisect_left
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import transaction
+from .metrics import group_send_latency, timed
+from .models import GroupMember
+
+logger = logging.getLogger(__name__)
+
+
+def receipts_group(group_id):
+    """ Channel-layer group joined by the sockets showing group `group_id`. """
+    return f'group_receipts_{group_id}'
+
+
+def _config(name, default):
+    return getattr(settings, 'CHAT_READ_RECEIPTS', {}).get(name, default)
+
+
+# --- Watermarks ---
+
+def mark_read(user_id, group_id, seq):
+    """
+    Move the member's read watermark forward (never back) to `seq`, capped
+    at the group's last message. Returns the watermark now stored.
+    """
+    members = GroupMember.objects.filter(group_id=group_id, user_id=user_id)
+    updated = members.filter(last_read_seq__lt=seq, group__last_seq__gte=seq).update(last_read_seq=seq)
+    if not updated:
+        return members.values_list('last_read_seq', flat=True).first() or 0
+    transaction.on_commit(lambda: coalescer.add(group_id, user_id, seq))
+    return seq
+
+
+class Watermarks:
+    """
+    Every member's watermark of one group, sorted ascending, from one query.
+    The members who have seen message `seq` are the suffix of the array from
+    bisect_left(seq), so a page of messages costs one bisect per message
+    instead of a GroupMember join per message.
+    """
+    def __init__(self, group_id):
+        rows = GroupMember.objects.filter(group_id=group_id).order_by('last_read_seq', 'user_id').values_list(
+            'last_read_seq', 'user_id'
+        )
+        self.seqs = []
+        self.user_ids = []
+        for seq, user_id in rows:
+            self.seqs.append(seq)
+            self.user_ids.append(user_id)
+        self.positions = {user_id: index for index, user_id in enumerate(self.user_ids)}
+
+    def seen_by(self, seq, sender_id=None, limit=None):
+        """ (count, up to `limit` user ids) of the members who have read `seq`, not counting its sender. """
+        start = bisect_left(self.seqs, seq)
+        count = len(self.seqs) - start
+        if self.positions.get(sender_id, -1) >= start:
+            count -= 1
+        # Furthest-read members first; one extra in case the sender is among them
+        readers = self.user_ids[start if limit is None else max(start, len(self.user_ids) - limit - 1):]
+        user_ids = [user_id for user_id in reversed(readers) if user_id != sender_id][:limit]
+        return count, user_ids
+
+    def page(self, messages, limit=None):
+        """ Seen-by for a page of (seq, sender_id) pairs. """
+        results = []
+        for seq, sender_id in messages:
+            count, user_ids = self.seen_by(seq, sender_id, limit)
+            results.append({'seq': seq, 'seen_count': count, 'seen_by': user_ids})
+        return results
+
+
+# --- Socket events ---
+
+class ReceiptCoalescer:
+    """
+    Collects watermark moves per group and sends each group's batch as one
+    `read_receipts` event to its sockets every FLUSH_INTERVAL seconds, so a
+    room of members scrolling through a burst of messages costs one
+    channel-layer message per interval instead of one per read. Batches are
+    per process; clients keep the highest seq they have seen per member.
+    """
+    def __init__(self):
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.timer = None
+
+    def add(self, group_id, user_id, seq):
+        with self.lock:
+            batch = self.pending.setdefault(group_id, {})
+            batch[user_id] = max(seq, batch.get(user_id, 0))
+            # Only armed while something is waiting
+            if self.timer is None:
+                self.timer = threading.Timer(_config('FLUSH_INTERVAL', 2.0), self.flush)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def flush(self):
+        with self.lock:
+            pending, self.pending = self.pending, {}
+            self.timer = None
+        if not pending:
+            return
+        send = async_to_sync(get_channel_layer().group_send)
+        for group_id, batch in pending.items():
+            try:
+                with timed(group_send_latency, kind='receipts'):
+                    send(receipts_group(group_id), {
+                        'type': 'read_receipts',
+                        'group': group_id,
+                        'watermarks': {str(user_id): seq for user_id, seq in batch.items()},
+                    })
+            except Exception:
+                logger.exception("Could not send read receipts", extra={'group_id': group_id})
+
+
+coalescer = ReceiptCoalescer()
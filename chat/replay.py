@@ -0,0 +1,124 @@
+# chat/replay.py
+
+import json
+import logging
+import re
+import threading
+import time
+from collections import deque
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+EVENT_ID_RE = re.compile(r'^\d+-\d+$')
+
+
+class InMemoryEventBuffer:
+    """
+    Process-local stand-in for RedisStreamEventBuffer, for tests and
+    single-worker development. Ids follow the Redis stream format.
+    """
+    def __init__(self, maxlen=500, **kwargs):
+        self.maxlen = maxlen
+        self.rooms = {}
+        self.last_id = (0, 0)
+        self.lock = threading.Lock()
+
+    def _next_id(self):
+        ms = int(time.time() * 1000)
+        last_ms, last_seq = self.last_id
+        self.last_id = (ms, 0) if ms > last_ms else (last_ms, last_seq + 1)
+        return '%d-%d' % self.last_id
+
+    async def append(self, room, event):
+        with self.lock:
+            event_id = self._next_id()
+            events = self.rooms.setdefault(room, deque(maxlen=self.maxlen))
+            events.append((event_id, event))
+        return event_id
+
+    async def since(self, room, last_id):
+        with self.lock:
+            events = list(self.rooms.get(room, ()))
+        ids = [event_id for event_id, _ in events]
+        if last_id not in ids:
+            return [], False
+        return events[ids.index(last_id) + 1:], True
+
+
+class RedisStreamEventBuffer:
+    """
+    Keeps the latest `maxlen` events of each room in a capped Redis Stream
+    (XADD MAXLEN ~), expiring idle rooms after `ttl` seconds.
+    """
+    def __init__(self, url=None, maxlen=500, ttl=24 * 60 * 60, prefix='room_events:', **kwargs):
+        import redis.asyncio as redis
+
+        self.maxlen = maxlen
+        self.ttl = ttl
+        self.prefix = prefix
+        self.redis = redis.from_url(url or settings.REDIS_URL, decode_responses=True)
+
+    async def append(self, room, event):
+        key = self.prefix + room
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.xadd(key, {'event': json.dumps(event)}, maxlen=self.maxlen, approximate=True)
+                pipe.expire(key, self.ttl)
+                event_id, _ = await pipe.execute()
+        except Exception:
+            # Losing replay must never stop the live broadcast
+            logger.exception("Could not buffer event for %s", room)
+            return None
+        return event_id
+
+    async def since(self, room, last_id):
+        """
+        Pages through the stream, which approximate trimming can leave a
+        little longer than `maxlen`. Past `max_replay` events the list is
+        reported incomplete, so the client reloads over REST instead.
+        """
+        key = self.prefix + room
+        max_replay = 2 * self.maxlen
+        events = []
+        try:
+            # Inclusive range: the first entry proves last_id is still buffered
+            entries = await self.redis.xrange(key, min=last_id, count=self.maxlen + 1)
+            if not entries or entries[0][0] != last_id:
+                return [], False
+            entries = entries[1:]
+            while entries:
+                events.extend((event_id, json.loads(fields['event'])) for event_id, fields in entries)
+                if len(events) > max_replay:
+                    return [], False
+                # Exclusive from here on
+                entries = await self.redis.xrange(key, min=f'({events[-1][0]}', count=self.maxlen)
+        except Exception:
+            logger.exception("Could not read buffered events for %s", room)
+            return [], False
+        return events, True
+
+
+_buffer = None
+
+
+def get_event_buffer():
+    """ Build the buffer configured in settings.CHAT_EVENT_BUFFER once per process. """
+    global _buffer
+    if _buffer is None:
+        config = getattr(settings, 'CHAT_EVENT_BUFFER', {})
+        backend = import_string(config.get('BACKEND', 'chat.replay.InMemoryEventBuffer'))
+        _buffer = backend(**config.get('CONFIG', {}))
+    return _buffer
+
+
+async def missed_events(room, last_id):
+    """
+    Events broadcast to `room` after `last_id`, and whether that list is
+    complete. Incomplete means the gap is older than the buffer (or the id is
+    unknown) and the client has to reload history over REST.
+    """
+    if not last_id or not EVENT_ID_RE.match(last_id):
+        return [], False
+    return await get_event_buffer().since(room, last_id)
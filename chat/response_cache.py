@@ -0,0 +1,162 @@
+# chat/response_cache.py
+
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import cache
+from .conditional import bump, current_versions, version_key
+
+
+class SerializedResponseCache:
+    """
+    Serializer output per object, keyed by the object's current version token
+    (chat.conditional). Signals bump the token when the object changes, so a
+    stale entry is never served: it simply stops matching.
+
+    Lookups try this process's LRU first, then (with `shared`) the Django
+    cache. Misses are built under a short lock in the shared cache; other
+    readers of the same object wait briefly for that result instead of all
+    rebuilding it at once.
+    """
+    def __init__(self, name, max_entries=5000, shared=True, timeout=60 * 60,
+                 lock_timeout=5, wait_timeout=0.2, poll_interval=0.02):
+        self.name = name
+        self.max_entries = max_entries
+        self.shared = shared
+        self.timeout = timeout
+        self.lock_timeout = lock_timeout
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.counters = dict.fromkeys(['local_hits', 'shared_hits', 'misses', 'waits', 'wait_timeouts'], 0)
+
+    def scope(self):
+        return f'{self.name}_data'
+
+    def invalidate(self, pks):
+        bump(self.scope(), pks)
+
+    def _count(self, counter, amount=1):
+        if amount:
+            with self.lock:
+                self.counters[counter] += amount
+
+    def _shared_key(self, pk, version):
+        return f'serialized:{self.name}:{pk}:{version}'
+
+    def _local_get(self, pk, version):
+        with self.lock:
+            entry = self.entries.get(pk)
+            if entry is None or entry[0] != version:
+                return None
+            self.entries.move_to_end(pk)
+            return entry[1]
+
+    def _local_set(self, pk, version, data):
+        with self.lock:
+            self.entries[pk] = (version, data)
+            self.entries.move_to_end(pk)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def _lookup(self, versions):
+        """ {pk: data} for whatever either tier holds at these versions. """
+        found = {}
+        for pk, version in versions.items():
+            data = self._local_get(pk, version)
+            if data is not None:
+                found[pk] = data
+        self._count('local_hits', len(found))
+
+        remaining = {pk: version for pk, version in versions.items() if pk not in found}
+        if self.shared and remaining:
+            keys = {self._shared_key(pk, version): pk for pk, version in remaining.items()}
+            for key, data in cache.get_many(list(keys)).items():
+                pk = keys[key]
+                found[pk] = data
+                self._local_set(pk, remaining[pk], data)
+                self._count('shared_hits')
+        return found
+
+    def get_many(self, pks, build):
+        """
+        Serialized data for each pk. `build(pks)` returns {pk: data} for the
+        misses, and is only called with pks this caller holds the lock for
+        (or whose builder did not finish within `wait_timeout`).
+        """
+        pks = list(dict.fromkeys(pks))
+        if not pks:
+            return {}
+        versions = dict(zip(pks, current_versions([version_key(self.scope(), pk) for pk in pks])))
+        found = self._lookup(versions)
+
+        missing = [pk for pk in pks if pk not in found]
+        if not missing:
+            return found
+        self._count('misses', len(missing))
+
+        lock_keys = {pk: f'serialized_lock:{self.name}:{pk}:{versions[pk]}' for pk in missing}
+        mine = [pk for pk in missing if cache.add(lock_keys[pk], 1, self.lock_timeout)]
+        theirs = [pk for pk in missing if pk not in mine]
+
+        try:
+            if mine:
+                self._store(build(mine), versions, found)
+        finally:
+            cache.delete_many([lock_keys[pk] for pk in mine])
+
+        if theirs:
+            self._count('waits', len(theirs))
+            deadline = time.monotonic() + self.wait_timeout
+            while theirs and time.monotonic() < deadline:
+                time.sleep(self.poll_interval)
+                found.update(self._lookup({pk: versions[pk] for pk in theirs}))
+                theirs = [pk for pk in theirs if pk not in found]
+            if theirs:
+                self._count('wait_timeouts', len(theirs))
+                self._store(build(theirs), versions, found)
+        return found
+
+    def get(self, pk, build):
+        """ Single-object form of get_many; `build()` takes no arguments. """
+        return self.get_many([pk], lambda pks: {pk: build()})[pk]
+
+    def _store(self, built, versions, found):
+        for pk, data in built.items():
+            self._local_set(pk, versions[pk], data)
+            found[pk] = data
+        if self.shared and built:
+            cache.set_many({self._shared_key(pk, versions[pk]): data for pk, data in built.items()}, self.timeout)
+
+    def stats(self):
+        with self.lock:
+            lookups = self.counters['local_hits'] + self.counters['shared_hits'] + self.counters['misses']
+            hits = self.counters['local_hits'] + self.counters['shared_hits']
+            return {
+                **self.counters,
+                'entries': len(self.entries),
+                'hit_rate': round(hits / lookups, 3) if lookups else None,
+            }
+
+
+_config = getattr(settings, 'CHAT_RESPONSE_CACHE', {})
+
+
+def _build_cache(name):
+    return SerializedResponseCache(
+        name,
+        max_entries=_config.get('MAX_ENTRIES', 5000),
+        shared=_config.get('SHARED', True),
+        timeout=_config.get('TIMEOUT', 60 * 60),
+    )
+
+
+group_cache = _build_cache('group')
+user_cache = _build_cache('user')
+profile_cache = _build_cache('profile')
+
+
+def response_cache_stats():
+    return {response_cache.name: response_cache.stats() for response_cache in (group_cache, user_cache, profile_cache)}
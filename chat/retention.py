@@ -0,0 +1,190 @@
+# chat/retention.py
+
+import gzip
+import os
+import time
+from collections import namedtuple
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from .changelog import forget_messages
+from .conditional import bump
+from .export import MESSAGE_FIELDS, ndjson_line
+from .history_cache import bump_rooms, dm_room, group_room
+from .models import (
+    ArchivedDirectMessage, ArchivedGroupMessage, ChangeLog, DirectMessage, DirectMessageReaction,
+    Group, GroupMessage, GroupMessageReaction, PurgeCheckpoint, SyncCounter,
+)
+
+# `handler(model, ids)` runs inside each batch's transaction; delete_messages by default.
+# `archive=False` jobs never write their rows to --archive-dir.
+PurgeJob = namedtuple('PurgeJob', ['name', 'model', 'queryset', 'key', 'handler', 'archive'], defaults=[None, True])
+PurgeResult = namedtuple('PurgeResult', ['job', 'rows', 'seconds', 'finished'])
+
+# Live message model -> (room column, hot-room history cache key)
+HISTORY_ROOMS = {
+    DirectMessage: ('chat_id', dm_room),
+    GroupMessage: ('group_id', group_room),
+}
+
+# Message model -> ChangeLog.message_ref prefix
+CONVERSATIONS = {
+    DirectMessage: 'dm',
+    ArchivedDirectMessage: 'dm',
+    GroupMessage: 'group',
+    ArchivedGroupMessage: 'group',
+}
+
+
+def global_retention_days():
+    return getattr(settings, 'CHAT_MESSAGE_RETENTION_DAYS', None)
+
+
+def build_jobs(now=None):
+    """
+    The purge jobs implied by the current policies: soft-deleted messages
+    nobody can see any more, plus messages older than their retention period
+    (Group.retention_days, else CHAT_MESSAGE_RETENTION_DAYS for groups and DMs).
+    Archived messages (chat.archive) follow the same policies. Change-log
+    entries go once they fall out of the sync window (CHAT_SYNC_RETENTION_DAYS).
+    """
+    now = now or timezone.now()
+    default_days = global_retention_days()
+    groups = list(
+        (Group.objects.all() if default_days else Group.objects.filter(retention_days__isnull=False))
+        .order_by('id').values_list('id', 'retention_days')
+    )
+
+    jobs = []
+    for prefix, direct_model, group_model in (
+        ('', DirectMessage, GroupMessage),
+        ('archived.', ArchivedDirectMessage, ArchivedGroupMessage),
+    ):
+        jobs.append(PurgeJob(
+            f'{prefix}direct.soft_deleted', direct_model,
+            direct_model.objects.filter(is_deleted_for_sender=True, is_deleted_for_receiver=True), 'id',
+        ))
+        jobs.append(PurgeJob(
+            f'{prefix}group.soft_deleted', group_model, group_model.objects.filter(is_deleted=True), 'id',
+        ))
+
+        if default_days:
+            jobs.append(PurgeJob(
+                f'{prefix}direct.expired', direct_model,
+                direct_model.objects.filter(created_at__lt=now - timedelta(days=default_days)), 'id',
+            ))
+
+        for group_id, days in groups:
+            days = days or default_days
+            # Walked by seq so each batch is a range scan of the (group, seq) index
+            jobs.append(PurgeJob(
+                f'{prefix}group.expired:{group_id}', group_model,
+                group_model.objects.filter(group_id=group_id, created_at__lt=now - timedelta(days=days)), 'seq',
+            ))
+
+    jobs.append(PurgeJob(
+        'changelog.expired', ChangeLog,
+        ChangeLog.objects.filter(created_at__lt=now - timedelta(days=settings.CHAT_SYNC_RETENTION_DAYS)), 'id',
+        delete_changes, archive=False,
+    ))
+    return jobs
+
+
+def delete_messages(model, ids):
+    """
+    Delete message rows by id together with what points at them, without
+    loading them as objects or firing per-row delete signals. Purged rows
+    produce no change-log entries (clients drop expired history themselves),
+    and the entries still holding their text go with them.
+    """
+    if model in HISTORY_ROOMS:
+        # No post_delete either: make every worker's cached copy of these rooms stale
+        room_field, room = HISTORY_ROOMS[model]
+        room_ids = model.objects.filter(pk__in=ids).values_list(room_field, flat=True).distinct()
+        bump_rooms([room(room_id) for room_id in room_ids])
+    if model is DirectMessage:
+        DirectMessageReaction.objects.filter(message_id__in=ids).delete()
+    elif model is GroupMessage:
+        GroupMessageReaction.objects.filter(message_id__in=ids).delete()
+    forget_messages(CONVERSATIONS[model], ids)
+    model.objects.filter(pk__in=ids)._raw_delete(model.objects.db)
+
+
+def delete_changes(model, ids):
+    """
+    Drop change-log entries older than the sync window, recording the
+    highest seq dropped: /api/sync/ sends older cursors back for a reload.
+    """
+    pruned_through = model.objects.filter(pk__in=ids).aggregate(Max('commit_seq'))['commit_seq__max']
+    if pruned_through:
+        SyncCounter.objects.filter(pk=1).update(pruned_through_seq=Greatest('pruned_through_seq', pruned_through))
+    model.objects.filter(pk__in=ids)._raw_delete(model.objects.db)
+
+
+def archive_path(archive_dir, job, checkpoint):
+    """
+    One file per batch, named by how many rows the job had deleted before it.
+    A batch whose transaction failed is retried under the same count, so the
+    retry replaces its file instead of archiving the rows twice.
+    """
+    name = job.name.replace(':', '-')
+    return os.path.join(archive_dir, f'{name}-{checkpoint.rows_deleted:012d}.ndjson.gz')
+
+
+def write_archive(path, rows):
+    """ Write the batch to a temporary file and move it into place in one step. """
+    partial = f'{path}.partial'
+    with gzip.open(partial, 'wb') as archive:
+        archive.writelines(ndjson_line(row) for row in rows)
+    os.replace(partial, path)
+
+
+def run_job(job, batch_size=500, pause=0.1, deadline=None, archive_dir=None):
+    """
+    Delete the job's rows in batches of `batch_size`, keyset-ordered by
+    `job.key` and sleeping `pause` seconds between batches. Progress is saved
+    after every batch; a run stopped by `deadline` (or killed) picks up from
+    there next time. Once a pass finds nothing left it starts over from zero.
+
+    With `archive_dir`, each batch of an archiving job is written to its own
+    gzipped NDJSON file before it is deleted.
+    """
+    checkpoint, _ = PurgeCheckpoint.objects.get_or_create(job=job.name)
+    archive_dir = archive_dir if job.archive else None
+    room_field = 'chat_id' if hasattr(job.model, 'chat') else 'group_id'
+    fields = ['id', job.key] + ([room_field] + MESSAGE_FIELDS if archive_dir else [])
+
+    started = time.monotonic()
+    rows_deleted = 0
+    finished = False
+    while deadline is None or time.monotonic() < deadline:
+        batch = list(
+            job.queryset.filter(**{f'{job.key}__gt': checkpoint.last_key})
+            .order_by(job.key).values(*fields)[:batch_size]
+        )
+        if batch:
+            if archive_dir:
+                write_archive(archive_path(archive_dir, job, checkpoint), batch)
+            with transaction.atomic():
+                (job.handler or delete_messages)(job.model, [row['id'] for row in batch])
+                checkpoint.last_key = batch[-1][job.key]
+                checkpoint.rows_deleted += len(batch)
+                checkpoint.save(update_fields=['last_key', 'rows_deleted', 'updated_at'])
+            rows_deleted += len(batch)
+
+        if len(batch) < batch_size:
+            finished = True
+            break
+        # Leave the database room for live traffic between batches
+        time.sleep(pause)
+
+    if rows_deleted and job.model in CONVERSATIONS:
+        # Raw deletes send no signals; chat lists nest messages
+        bump('history')
+    if finished and checkpoint.last_key:
+        checkpoint.last_key = 0
+        checkpoint.save(update_fields=['last_key', 'updated_at'])
+    return PurgeResult(job.name, rows_deleted, time.monotonic() - started, finished)
@@ -1,22 +1,52 @@
 from rest_framework import serializers
+from django.conf import settings
 from django.contrib.auth.models import User
+from django.urls import reverse
 from .models import (
     Profile, UserPresence, Friendship, BlockedUser,
     DirectChat, DirectMessage, Group, GroupMember, GroupMessage,
-    DirectMessageReaction, GroupMessageReaction
+    DirectMessageReaction, GroupMessageReaction, ChangeLog, MediaUpload
 )
+from .media import allowed_content_type, media_token, message_type_for
+from .metrics import timed_serializer
+
+
+# --- Timing ---
+
+
+class TimedSerializerMixin:
+    """ Reports the time spent building `.data` to chat.metrics; many=True gets a TimedListSerializer. """
+    @property
+    def data(self):
+        with timed_serializer(type(self).__name__):
+            return super().data
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_serializer = super().many_init(*args, **kwargs)
+        # Keeps DRF's argument handling; a Meta.list_serializer_class is left alone
+        if type(list_serializer) is serializers.ListSerializer:
+            list_serializer.__class__ = TimedListSerializer
+        return list_serializer
+
+
+class TimedListSerializer(serializers.ListSerializer):
+    @property
+    def data(self):
+        with timed_serializer(type(self.child).__name__ + '[]'):
+            return super().data
 
 
 # --- User & Profile Serializers ---
 
 
-class ProfileSerializer(serializers.ModelSerializer):
+class ProfileSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Profile
         fields = ['profile_picture_url', 'bio']
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     profile = ProfileSerializer(read_only=True)
 
     class Meta:
@@ -24,7 +54,7 @@ class UserSerializer(serializers.ModelSerializer):
         fields = ['id', 'username', 'email', 'profile']
 
 
-class RegisterSerializer(serializers.ModelSerializer):
+class RegisterSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['username', 'email', 'password']
@@ -41,14 +71,38 @@ class RegisterSerializer(serializers.ModelSerializer):
         return user
 
 
+class ContactMatchSerializer(TimedSerializerMixin, serializers.Serializer):
+    emails = serializers.ListField(child=serializers.CharField(max_length=254), required=False, default=list)
+    usernames = serializers.ListField(child=serializers.CharField(max_length=150), required=False, default=list)
+    hashed = serializers.BooleanField(default=False)
+    max_contacts = 500
+
+    def validate(self, attrs):
+        total = len(attrs['emails']) + len(attrs['usernames'])
+        if not total:
+            raise serializers.ValidationError("Send at least one email or username.")
+        if total > self.max_contacts:
+            raise serializers.ValidationError(f"At most {self.max_contacts} contacts can be matched per request.")
+        return attrs
+
+
+class ContactUserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    """ Just enough to show a match; the email is exactly what a contact upload must not reveal. """
+    profile_picture_url = serializers.CharField(source='profile.profile_picture_url', read_only=True)
+
+    class Meta:
+        model = User
+        fields = ['id', 'username', 'profile_picture_url']
+
+
 # --- Friendship & Blocking Serializers ---
 
 
-class CreateFriendshipSerializer(serializers.Serializer):
+class CreateFriendshipSerializer(TimedSerializerMixin, serializers.Serializer):
     user_id = serializers.IntegerField()
 
 
-class FriendshipSerializer(serializers.ModelSerializer):
+class FriendshipSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     user_one = UserSerializer(read_only=True)
     user_two = UserSerializer(read_only=True)
     requester = UserSerializer(read_only=True)
@@ -61,20 +115,20 @@ class FriendshipSerializer(serializers.ModelSerializer):
 # --- Direct Messaging Serializers ---
 
 
-class DirectMessageSerializer(serializers.ModelSerializer):
+class DirectMessageSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     sender = UserSerializer(read_only=True)
 
     class Meta:
         model = DirectMessage
         fields = [
-            'id', 'chat', 'sender', 'message_text', 'message_type',
+            'id', 'chat', 'seq', 'sender', 'message_text', 'message_type',
             'media_url', 'delivery_status', 'created_at', 'edited_at'
         ]
-        read_only_fields = ['id', 'chat', 'sender', 'created_at', 'edited_at', 'delivery_status']
+        read_only_fields = ['id', 'chat', 'seq', 'sender', 'created_at', 'edited_at', 'delivery_status']
 
 
 
-class CreateMessageSerializer(serializers.Serializer):
+class CreateMessageSerializer(TimedSerializerMixin, serializers.Serializer):
     message_text = serializers.CharField()
     message_type = serializers.ChoiceField(
         choices=DirectMessage.MessageType.choices, 
@@ -83,20 +137,27 @@ class CreateMessageSerializer(serializers.Serializer):
     media_url = serializers.URLField(required=False, allow_blank=True)
 
 
-class DirectChatSerializer(serializers.ModelSerializer):
+class DirectChatSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     user_one = UserSerializer(read_only=True)
     user_two = UserSerializer(read_only=True)
-    messages = DirectMessageSerializer(many=True, read_only=True)
+    messages = serializers.SerializerMethodField()
 
     class Meta:
         model = DirectChat
         fields = ['id', 'user_one', 'user_two', 'last_message_at', 'messages']
 
+    def get_messages(self, chat):
+        messages = list(chat.messages.all())
+        if chat.archived_through_seq:
+            # Archived messages are the oldest; only rooms that have some pay for the query
+            messages = list(chat.archived_messages.select_related('sender__profile').order_by('seq')) + messages
+        return DirectMessageSerializer(messages, many=True, context=self.context).data
+
 
 # --- Group Chat Serializers ---
 
 
-class GroupMemberSerializer(serializers.ModelSerializer):
+class GroupMemberSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
 
     class Meta:
@@ -104,19 +165,102 @@ class GroupMemberSerializer(serializers.ModelSerializer):
         fields = ['user', 'role', 'joined_at']
 
 
-class GroupSerializer(serializers.ModelSerializer):
+class GroupMessageSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    sender = UserSerializer(read_only=True)
+
+    class Meta:
+        model = GroupMessage
+        fields = [
+            'id', 'group', 'seq', 'sender', 'message_text', 'message_type',
+            'media_url', 'created_at', 'edited_at'
+        ]
+        read_only_fields = ['id', 'group', 'seq', 'sender', 'created_at', 'edited_at']
+
+
+class GroupSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    """
+    Group with its member count and the first few members only; the full
+    list is paginated at /groups/<pk>/members/. Expects a queryset built by
+    chat.views.with_member_summary, and falls back to querying otherwise.
+    """
+    PREVIEW_SIZE = 5
+
     created_by = UserSerializer(read_only=True)
-    members = GroupMemberSerializer(many=True, read_only=True, source='groupmember_set')
+    member_count = serializers.SerializerMethodField()
+    members_preview = serializers.SerializerMethodField()
 
     class Meta:
         model = Group
         fields = [
             'id', 'group_name', 'group_description', 'group_avatar_url',
-            'group_type', 'created_by', 'created_at', 'members'
+            'group_type', 'retention_days', 'created_by', 'created_at', 'member_count', 'members_preview'
         ]
-        read_only_fields = ['created_by', 'created_at', 'members']
+        read_only_fields = ['created_by', 'created_at', 'member_count', 'members_preview']
+
+    def get_member_count(self, obj):
+        if hasattr(obj, 'member_count'):
+            return obj.member_count
+        return obj.groupmember_set.count()
+
+    def get_members_preview(self, obj):
+        if hasattr(obj, 'member_preview'):
+            members = obj.member_preview
+        else:
+            members = obj.groupmember_set.select_related('user__profile').order_by('id')[:self.PREVIEW_SIZE]
+        return GroupMemberSerializer(members, many=True).data
 
 
-class AddGroupMemberSerializer(serializers.Serializer):
+class AddGroupMemberSerializer(TimedSerializerMixin, serializers.Serializer):
     user_id = serializers.IntegerField()
     role = serializers.ChoiceField(choices=GroupMember.Role.choices, default=GroupMember.Role.MEMBER)
+
+
+class BulkAddGroupMemberSerializer(TimedSerializerMixin, serializers.Serializer):
+    members = AddGroupMemberSerializer(many=True, allow_empty=False, max_length=1000)
+
+
+class BulkRemoveGroupMemberSerializer(TimedSerializerMixin, serializers.Serializer):
+    user_ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False, max_length=1000)
+
+
+# --- Sync Serializers ---
+
+
+class ChangeLogSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    class Meta:
+        model = ChangeLog
+        fields = ['id', 'kind', 'payload', 'created_at']
+
+
+# --- Media Serializers ---
+
+
+class MediaUploadSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    offset = serializers.IntegerField(source='received', read_only=True)
+    message_type = serializers.SerializerMethodField()
+    media_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = MediaUpload
+        fields = ['id', 'filename', 'content_type', 'size', 'offset', 'status', 'message_type', 'media_url']
+        read_only_fields = ['id', 'offset', 'status']
+
+    def validate_size(self, value):
+        if value < 1 or value > settings.MEDIA_UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError(f"Size must be between 1 and {settings.MEDIA_UPLOAD_MAX_SIZE} bytes.")
+        return value
+
+    def validate_content_type(self, value):
+        # Other types are still accepted, as plain files
+        return allowed_content_type(value)
+
+    def get_message_type(self, obj):
+        return message_type_for(obj.content_type)
+
+    def get_media_url(self, obj):
+        if obj.blob_id is None:
+            return None
+        # The token lets <img>/<audio> tags load it; API clients can send their JWT instead
+        url = f"{reverse('media-blob', args=[obj.blob_id])}?token={media_token(obj.blob_id)}"
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
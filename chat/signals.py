@@ -0,0 +1,339 @@
+# chat/signals.py
+
+from django.contrib.auth.models import User
+from django.db.models import Q, QuerySet
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+from .models import (
+    BlockedUser, DirectChat, DirectMessage, Group, GroupMessage, GroupMember, Friendship, ChangeLog, Profile,
+)
+from . import changelog, conditional, notifications
+from .contacts import contact_hash, normalize_email, normalize_username
+from .history_cache import bump_rooms, history_cache, dm_room, group_room
+from .blocks import invalidate_blocks
+from .membership import invalidate_memberships
+from .response_cache import group_cache, profile_cache, user_cache
+
+
+def _is_direct_delete(origin, model):
+    """
+    True when the row itself was deleted, not cascaded from a chat, group or
+    user deletion (those users or rooms are gone and need no change entry).
+    """
+    origin_model = getattr(origin, 'model', type(origin))
+    return origin_model is model
+
+
+def _is_bulk_delete(origin, model):
+    """ True for a queryset delete of `model` rows, whose caller handles the batch in one go. """
+    return isinstance(origin, QuerySet) and origin.model is model
+
+
+# --- Direct Messages ---
+
+@receiver(post_save, sender=DirectMessage)
+def log_direct_message_saved(sender, instance, created, **kwargs):
+    chat = instance.chat
+    if created:
+        changelog.record_change(
+            [chat.user_one_id, chat.user_two_id],
+            ChangeLog.Kind.MESSAGE_CREATED,
+            changelog.direct_message_payload(instance),
+        )
+        # Reaches the recipient even when that chat is not open
+        notifications.notify(
+            [chat.user_one_id, chat.user_two_id],
+            ChangeLog.Kind.MESSAGE_CREATED,
+            notifications.direct_message_payload(instance),
+        )
+        return
+
+    # Soft deletes are per participant
+    for user_id in (chat.user_one_id, chat.user_two_id):
+        deleted = instance.is_deleted_for_sender if user_id == instance.sender_id else instance.is_deleted_for_receiver
+        if deleted:
+            changelog.record_change(
+                [user_id], ChangeLog.Kind.MESSAGE_DELETED,
+                changelog.deleted_message_payload('dm', instance.chat_id, instance),
+            )
+        else:
+            changelog.record_change(
+                [user_id], ChangeLog.Kind.MESSAGE_UPDATED,
+                changelog.direct_message_payload(instance),
+            )
+
+
+@receiver(post_delete, sender=DirectMessage)
+def log_direct_message_deleted(sender, instance, origin=None, **kwargs):
+    if not _is_direct_delete(origin, DirectMessage):
+        return
+    chat = instance.chat
+    changelog.record_change(
+        [chat.user_one_id, chat.user_two_id],
+        ChangeLog.Kind.MESSAGE_DELETED,
+        changelog.deleted_message_payload('dm', instance.chat_id, instance),
+    )
+
+
+# --- Group Messages ---
+
+@receiver(post_save, sender=GroupMessage)
+def log_group_message_saved(sender, instance, created, **kwargs):
+    if created:
+        kind, payload = ChangeLog.Kind.MESSAGE_CREATED, changelog.group_message_payload(instance)
+    elif instance.is_deleted:
+        kind, payload = ChangeLog.Kind.MESSAGE_DELETED, changelog.deleted_message_payload('group', instance.group_id, instance)
+    else:
+        kind, payload = ChangeLog.Kind.MESSAGE_UPDATED, changelog.group_message_payload(instance)
+    changelog.record_change(changelog.group_member_ids(instance.group_id), kind, payload)
+
+
+@receiver(post_delete, sender=GroupMessage)
+def log_group_message_deleted(sender, instance, origin=None, **kwargs):
+    if not _is_direct_delete(origin, GroupMessage):
+        return
+    changelog.record_change(
+        changelog.group_member_ids(instance.group_id),
+        ChangeLog.Kind.MESSAGE_DELETED,
+        changelog.deleted_message_payload('group', instance.group_id, instance),
+    )
+
+
+# --- Mentions ---
+
+@receiver(post_save, sender=GroupMessage)
+def notify_group_mentions(sender, instance, created, **kwargs):
+    if created:
+        notifications.notify_mentions(instance)
+
+
+# --- Group Membership ---
+
+@receiver(post_save, sender=GroupMember)
+def log_group_member_saved(sender, instance, created, **kwargs):
+    kind = ChangeLog.Kind.MEMBER_ADDED if created else ChangeLog.Kind.MEMBER_UPDATED
+    member_ids = changelog.group_member_ids(instance.group_id)
+    payload = changelog.group_member_payload(instance)
+    changelog.record_change(member_ids, kind, payload)
+    notifications.notify(member_ids, kind, payload)
+
+
+@receiver(post_delete, sender=GroupMember)
+def log_group_member_deleted(sender, instance, origin=None, **kwargs):
+    # Queryset deletes (bulk removals) record one MEMBERS_REMOVED entry themselves
+    if not isinstance(origin, GroupMember):
+        return
+    # The removed user is told as well, so their client can drop the group
+    user_ids = changelog.group_member_ids(instance.group_id) + [instance.user_id]
+    payload = changelog.group_member_payload(instance)
+    changelog.record_change(user_ids, ChangeLog.Kind.MEMBER_REMOVED, payload)
+    notifications.notify(user_ids, ChangeLog.Kind.MEMBER_REMOVED, payload)
+
+
+@receiver(post_save, sender=GroupMember)
+@receiver(post_delete, sender=GroupMember)
+def invalidate_member_cache(sender, instance, origin=None, **kwargs):
+    if _is_bulk_delete(origin, GroupMember):
+        return
+    invalidate_memberships([instance.user_id])
+
+
+# --- Friendships ---
+
+@receiver(post_save, sender=Friendship)
+def log_friendship_saved(sender, instance, **kwargs):
+    user_ids = [instance.user_one_id, instance.user_two_id]
+    payload = changelog.friendship_payload(instance)
+    changelog.record_change(user_ids, ChangeLog.Kind.FRIENDSHIP_UPDATED, payload)
+    notifications.notify(user_ids, ChangeLog.Kind.FRIENDSHIP_UPDATED, payload)
+
+
+@receiver(post_delete, sender=Friendship)
+def log_friendship_deleted(sender, instance, origin=None, **kwargs):
+    if not _is_direct_delete(origin, Friendship):
+        return
+    user_ids = [instance.user_one_id, instance.user_two_id]
+    payload = changelog.friendship_payload(instance)
+    changelog.record_change(user_ids, ChangeLog.Kind.FRIENDSHIP_DELETED, payload)
+    notifications.notify(user_ids, ChangeLog.Kind.FRIENDSHIP_DELETED, payload)
+
+
+# --- Block List ---
+
+@receiver(post_save, sender=BlockedUser)
+@receiver(post_delete, sender=BlockedUser)
+def invalidate_block_cache(sender, instance, **kwargs):
+    invalidate_blocks([instance.user_id, instance.blocked_user_id])
+
+
+# --- Direct Chats ---
+
+@receiver(post_save, sender=DirectChat)
+def notify_direct_chat_created(sender, instance, created, **kwargs):
+    if created:
+        notifications.notify(
+            [instance.user_one_id, instance.user_two_id],
+            'direct_chat.created',
+            notifications.direct_chat_payload(instance),
+        )
+
+
+# --- Hot-Room History Cache ---
+# New messages are appended by the write paths themselves; anything else that
+# touches a stored message drops the room here and bumps its shared version,
+# which makes the other workers' copies miss.
+
+def _invalidate_history(room):
+    history_cache.invalidate(room)
+    bump_rooms([room])
+
+
+@receiver(post_save, sender=DirectMessage)
+def invalidate_direct_history(sender, instance, created, **kwargs):
+    if not created:
+        _invalidate_history(dm_room(instance.chat_id))
+
+
+@receiver(post_delete, sender=DirectMessage)
+def invalidate_direct_history_on_delete(sender, instance, **kwargs):
+    _invalidate_history(dm_room(instance.chat_id))
+
+
+@receiver(post_save, sender=GroupMessage)
+def invalidate_group_history(sender, instance, created, **kwargs):
+    if not created:
+        _invalidate_history(group_room(instance.group_id))
+
+
+@receiver(post_delete, sender=GroupMessage)
+def invalidate_group_history_on_delete(sender, instance, **kwargs):
+    _invalidate_history(group_room(instance.group_id))
+
+
+# --- Contact Hashes ---
+
+def _contact_hashes(user):
+    email = normalize_email(user.email)
+    return {
+        'email_hash': contact_hash(email) if email else '',
+        'username_hash': contact_hash(normalize_username(user.username)),
+    }
+
+
+@receiver(pre_save, sender=Profile)
+def set_profile_contact_hashes(sender, instance, **kwargs):
+    for field, value in _contact_hashes(instance.user).items():
+        setattr(instance, field, value)
+
+
+@receiver(post_save, sender=User)
+def refresh_profile_contact_hashes(sender, instance, created, **kwargs):
+    if not created:
+        Profile.objects.filter(user=instance).update(**_contact_hashes(instance))
+
+
+# --- Response Versions (ETags) ---
+# Each bump changes the ETag of the list endpoints built from that data
+# (chat.conditional.ConditionalGetMixin).
+
+@receiver(post_save, sender=Friendship)
+@receiver(post_delete, sender=Friendship)
+def bump_friendship_versions(sender, instance, **kwargs):
+    conditional.bump('friendships', [instance.user_one_id, instance.user_two_id])
+
+
+@receiver(post_save, sender=DirectChat)
+@receiver(post_delete, sender=DirectChat)
+def bump_direct_chat_versions(sender, instance, **kwargs):
+    conditional.bump('direct_chats', [instance.user_one_id, instance.user_two_id])
+
+
+@receiver(post_save, sender=DirectMessage)
+@receiver(post_delete, sender=DirectMessage)
+def bump_direct_message_versions(sender, instance, signal, origin=None, **kwargs):
+    # The chat list nests messages; a cascade from the chat is covered above
+    if signal is post_delete and not _is_direct_delete(origin, DirectMessage):
+        return
+    chat = instance.chat
+    conditional.bump('direct_chats', [chat.user_one_id, chat.user_two_id])
+
+
+@receiver(post_save, sender=Group)
+def bump_group_versions(sender, instance, created, **kwargs):
+    if not created:
+        conditional.bump('groups', changelog.group_member_ids(instance.id))
+
+
+@receiver(pre_delete, sender=Group)
+def bump_group_versions_on_delete(sender, instance, **kwargs):
+    # Members are read before the cascade removes them
+    conditional.bump('groups', changelog.group_member_ids(instance.id))
+
+
+@receiver(post_save, sender=GroupMember)
+@receiver(post_delete, sender=GroupMember)
+def bump_group_member_versions(sender, instance, signal, origin=None, **kwargs):
+    # Cascades are covered by the group's own bump; bulk removals bump once themselves
+    if signal is post_delete and not isinstance(origin, GroupMember):
+        return
+    # Member counts and previews change for everyone in the group
+    conditional.bump('groups', changelog.group_member_ids(instance.group_id) + [instance.user_id])
+
+
+def _related_user_ids(user_id):
+    """ The user plus everyone whose friendship, chat or group lists nest them. """
+    user_ids = {user_id}
+    for model in (Friendship, DirectChat):
+        for pair in model.objects.filter(Q(user_one_id=user_id) | Q(user_two_id=user_id)).values_list('user_one_id', 'user_two_id'):
+            user_ids.update(pair)
+    my_groups = GroupMember.objects.filter(user_id=user_id).values('group_id')
+    user_ids.update(GroupMember.objects.filter(
+        Q(group_id__in=my_groups) | Q(group__created_by_id=user_id)
+    ).values_list('user_id', flat=True))
+    return user_ids
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+@receiver(post_save, sender=Profile)
+def bump_user_versions(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    user_id = instance.pk if sender is User else instance.user_id
+    conditional.bump('profile', [user_id])
+    # Usernames and avatars are nested in the lists of everyone who can see this user
+    conditional.bump('users', _related_user_ids(user_id))
+
+
+# --- Serialized Response Cache ---
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_cached_group(sender, instance, **kwargs):
+    group_cache.invalidate([instance.pk])
+
+
+@receiver(post_save, sender=GroupMember)
+@receiver(post_delete, sender=GroupMember)
+def invalidate_cached_group_members(sender, instance, origin=None, **kwargs):
+    if _is_bulk_delete(origin, GroupMember):
+        return
+    # Member count and preview are part of the group's data
+    group_cache.invalidate([instance.group_id])
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+@receiver(post_save, sender=Profile)
+def invalidate_cached_user(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    user_id = instance.pk if sender is User else instance.user_id
+    user_cache.invalidate([user_id])
+    profile_cache.invalidate([user_id])
+    # The user may appear in the member previews of their groups
+    group_ids = list(GroupMember.objects.filter(user_id=user_id).values_list('group_id', flat=True))
+    group_cache.invalidate(group_ids)
+    # Cached history nests each sender's username and avatar
+    chat_ids = DirectChat.objects.filter(Q(user_one_id=user_id) | Q(user_two_id=user_id)).values_list('id', flat=True)
+    bump_rooms([dm_room(chat_id) for chat_id in chat_ids] + [group_room(group_id) for group_id in group_ids])
@@ -0,0 +1,277 @@
+# chat/tasks.py
+
+import itertools
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils.dateparse import parse_datetime
+from django.utils.module_loading import import_string
+from .conditional import bump
+from .models import DirectChat
+
+logger = logging.getLogger(__name__)
+
+# name -> function, filled by the @task decorator
+registry = {}
+
+_unique = itertools.count()
+
+# Keys given to submit() without one; they never collapse, so never wait
+UNIQUE_KEY_PREFIX = '_:'
+
+
+def task(name):
+    """ Register a function that can be queued with enqueue(name, ...). """
+    def decorator(func):
+        registry[name] = func
+        return func
+    return decorator
+
+
+class TaskStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = dict.fromkeys(
+            ['enqueued', 'collapsed', 'executed', 'retried', 'failed', 'ran_inline'], 0
+        )
+
+    def incr(self, counter, amount=1):
+        with self.lock:
+            self.counters[counter] += amount
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.counters)
+
+
+class BaseTaskQueue:
+    """
+    Runs queued side effects on background worker threads.
+
+    Tasks sharing a `key` collapse: while one is still waiting, a newer
+    submission replaces its arguments instead of queueing a second run, and
+    a keyed task is held back `batch_delay` seconds after it was first
+    queued so a burst has the time to collapse. Unkeyed tasks run as soon
+    as a worker is free. When
+    the queue is full the task runs inline, so backpressure slows the caller
+    down rather than losing work. Failures are retried `max_retries` times.
+    """
+    def __init__(self, workers=1, maxsize=1000, max_retries=3, retry_delay=0.5, batch_delay=0.05, **kwargs):
+        self.workers = workers
+        self.maxsize = maxsize
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.batch_delay = batch_delay
+        self.stats = TaskStats()
+        self.threads = []
+        self.start_lock = threading.Lock()
+
+    def submit(self, name, args, key=None, attempt=0):
+        self.ensure_workers()
+        item = {'name': name, 'args': list(args), 'attempt': attempt}
+        if key is None:
+            key = f'{UNIQUE_KEY_PREFIX}{next(_unique)}'
+        elif self.batch_delay:
+            item['due'] = time.time() + self.batch_delay
+        # A retry must not overwrite a newer submission that is already waiting
+        queued = self.push(key, item, replace=not attempt)
+        if queued is None:
+            self.stats.incr('ran_inline')
+            self.run(name, args, attempt, key)
+        elif queued:
+            self.stats.incr('enqueued')
+        else:
+            self.stats.incr('collapsed')
+
+    def run(self, name, args, attempt, key):
+        try:
+            registry[name](*args)
+        except Exception:
+            if attempt < self.max_retries:
+                self.stats.incr('retried')
+                timer = threading.Timer(
+                    self.retry_delay * 2 ** attempt, self.submit, (name, args, key, attempt + 1)
+                )
+                timer.daemon = True
+                timer.start()
+            else:
+                self.stats.incr('failed')
+                logger.exception("Task %s failed after %d attempts", name, attempt + 1)
+        else:
+            self.stats.incr('executed')
+
+    def ensure_workers(self):
+        if self.threads:
+            return
+        with self.start_lock:
+            if self.threads:
+                return
+            for index in range(self.workers):
+                thread = threading.Thread(target=self.work, name=f'chat-tasks-{index}', daemon=True)
+                thread.start()
+                self.threads.append(thread)
+
+    def work(self):
+        while True:
+            key, item = self.pop()
+            try:
+                self.run(item['name'], item['args'], item['attempt'], key)
+            finally:
+                # Worker threads hold their own DB connections
+                close_old_connections()
+
+    def metrics(self):
+        return {**self.stats.snapshot(), 'depth': self.depth(), 'maxsize': self.maxsize}
+
+    # Backend interface
+    def push(self, key, item, replace=True):
+        """ Queue `item` under `key`: True if new, False if one was already waiting, None if full. """
+        raise NotImplementedError
+
+    def pop(self):
+        """ Block until a task is due and return (key, item). """
+        raise NotImplementedError
+
+    def depth(self):
+        raise NotImplementedError
+
+
+class InProcessTaskQueue(BaseTaskQueue):
+    """ Pending tasks live in this process; they are lost if it exits. """
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.pending = OrderedDict()
+        self.condition = threading.Condition()
+
+    def push(self, key, item, replace=True):
+        with self.condition:
+            if key in self.pending:
+                if replace:
+                    # Keeps its place and due time, so steady updates cannot starve it
+                    item['due'] = self.pending[key].get('due', 0)
+                    self.pending[key] = item
+                return False
+            if len(self.pending) >= self.maxsize:
+                return None
+            self.pending[key] = item
+            self.condition.notify()
+            return True
+
+    def pop(self):
+        with self.condition:
+            while True:
+                while not self.pending:
+                    self.condition.wait()
+                delay = next(iter(self.pending.values())).get('due', 0) - time.time()
+                if delay <= 0:
+                    return self.pending.popitem(last=False)
+                # Leave the newest submissions a moment to collapse into this one
+                self.condition.wait(delay)
+
+    def depth(self):
+        with self.condition:
+            return len(self.pending)
+
+
+class RedisTaskQueue(BaseTaskQueue):
+    """
+    Pending tasks live in Redis, shared by every worker process: a list of
+    keys in arrival order plus a hash of key -> latest payload, so collapsing
+    works across processes and queued work survives a restart.
+    """
+    # One script, so a crash can never leave a payload without its queue
+    # entry. Returns 1 if queued, 0 if collapsed, -1 if the queue is full.
+    PUSH_SCRIPT = """
+    if redis.call('HEXISTS', KEYS[2], ARGV[1]) == 1 then
+        if ARGV[3] == '1' then
+            redis.call('HSET', KEYS[2], ARGV[1], ARGV[2])
+        end
+        return 0
+    end
+    if redis.call('LLEN', KEYS[1]) >= tonumber(ARGV[4]) then
+        return -1
+    end
+    redis.call('HSET', KEYS[2], ARGV[1], ARGV[2])
+    redis.call('RPUSH', KEYS[1], ARGV[1])
+    return 1
+    """
+
+    def __init__(self, url=None, prefix='chat_tasks:', **kwargs):
+        import redis
+
+        super().__init__(**kwargs)
+        self.redis = redis.from_url(url or settings.REDIS_URL, decode_responses=True)
+        self.queue_key = prefix + 'queue'
+        self.payload_key = prefix + 'payloads'
+        self.push_script = self.redis.register_script(self.PUSH_SCRIPT)
+
+    def push(self, key, item, replace=True):
+        queued = self.push_script(
+            keys=[self.queue_key, self.payload_key],
+            args=[key, json.dumps(item), '1' if replace else '0', self.maxsize],
+        )
+        return None if queued < 0 else bool(queued)
+
+    def pop(self):
+        while True:
+            _, key = self.redis.blpop([self.queue_key])
+            if not key.startswith(UNIQUE_KEY_PREFIX):
+                payload = self.redis.hget(self.payload_key, key)
+                delay = json.loads(payload).get('due', 0) - time.time() if payload else 0
+                if delay > 0:
+                    # Leave the newest submissions a moment to collapse into this one
+                    time.sleep(delay)
+            with self.redis.pipeline() as pipe:
+                pipe.hget(self.payload_key, key)
+                pipe.hdel(self.payload_key, key)
+                payload, _ = pipe.execute()
+            if payload:
+                return key, json.loads(payload)
+
+    def depth(self):
+        return self.redis.llen(self.queue_key)
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_task_queue():
+    """ Build the queue configured in settings.CHAT_TASK_QUEUE once per process. """
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                config = getattr(settings, 'CHAT_TASK_QUEUE', {})
+                backend = import_string(config.get('BACKEND', 'chat.tasks.InProcessTaskQueue'))
+                _queue = backend(**config.get('CONFIG', {}))
+    return _queue
+
+
+def enqueue(name, *args, key=None):
+    """
+    Queue task `name` once the current transaction commits (immediately
+    outside one). Arguments must be JSON-serializable for the Redis backend.
+    """
+    transaction.on_commit(lambda: get_task_queue().submit(name, args, key=key))
+
+
+# --- Tasks ---
+
+@task('direct_chat.touch')
+def touch_direct_chat(chat_id, sent_at):
+    """ Move a chat's last_message_at forward (never back) to `sent_at`. """
+    sent_at = parse_datetime(sent_at)
+    chats = DirectChat.objects.filter(pk=chat_id)
+    if chats.filter(last_message_at__lt=sent_at).update(last_message_at=sent_at):
+        # update() sends no post_save, so the chat lists' ETags move here
+        bump('direct_chats', chats.values_list('user_one_id', 'user_two_id').first() or [])
+
+
+def bump_last_message_at(chat_id, sent_at):
+    """ Queue a last_message_at bump; a burst of messages ends up as one UPDATE. """
+    enqueue('direct_chat.touch', chat_id, sent_at.isoformat(), key=f'direct_chat.touch:{chat_id}')
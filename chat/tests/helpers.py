@@ -0,0 +1,39 @@
+# chat/tests/helpers.py
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+from ..models import Group, GroupMember
+
+
+class ChatTestCase(TestCase):
+    """
+    Starts from an empty cache: version tokens and cached memberships would
+    otherwise outlive the rolled-back rows they describe, whose ids SQLite
+    hands out again.
+    """
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+
+def make_user(username, **kwargs):
+    return User.objects.create_user(username, email=kwargs.pop('email', f'{username}@example.com'), **kwargs)
+
+
+def make_group(*users, admin=None):
+    """ A group of `users`; `admin` (default: the first user) created it and administers it. """
+    admin = admin or users[0]
+    group = Group.objects.create(group_name='Test group', created_by=admin)
+    for user in users:
+        role = GroupMember.Role.ADMIN if user == admin else GroupMember.Role.MEMBER
+        GroupMember.objects.create(group=group, user=user, role=role)
+    return group
+
+
+def api_client(user=None):
+    client = APIClient()
+    if user is not None:
+        client.force_authenticate(user)
+    return client
@@ -0,0 +1,55 @@
+# chat/tests/test_archive.py
+
+from ..archive import move_to_archive
+from ..models import Group, GroupMember, GroupMessage
+from ..receipts import mark_read
+from .helpers import ChatTestCase, api_client, make_group, make_user
+
+
+class ArchivedHistoryPagingTests(ChatTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = make_user('alice')
+        self.group = make_group(self.user)
+        self.messages = [
+            GroupMessage.objects.create(group=self.group, sender=self.user, message_text=str(index))
+            for index in range(10)
+        ]
+        # Seqs 1-6 are archived, 7-10 stay live
+        move_to_archive(GroupMessage, [message.id for message in self.messages[:6]])
+        self.client = api_client(self.user)
+
+    def seqs(self, query):
+        response = self.client.get(f'/api/groups/{self.group.pk}/messages/?{query}')
+        self.assertEqual(response.status_code, 200)
+        return [message['seq'] for message in response.json()]
+
+    def test_archive_bookkeeping(self):
+        self.assertEqual(Group.objects.get(pk=self.group.pk).archived_through_seq, 6)
+        self.assertEqual(GroupMessage.objects.filter(group=self.group).count(), 4)
+
+    def test_full_history(self):
+        self.assertEqual(self.seqs(''), list(range(1, 11)))
+
+    def test_latest_page_continues_into_archive(self):
+        self.assertEqual(self.seqs('limit=3'), [8, 9, 10])
+        self.assertEqual(self.seqs('limit=6'), [5, 6, 7, 8, 9, 10])
+
+    def test_before_seq_pages(self):
+        self.assertEqual(self.seqs('before_seq=9&limit=4'), [5, 6, 7, 8])
+        self.assertEqual(self.seqs('before_seq=5&limit=4'), [1, 2, 3, 4])
+        self.assertEqual(self.seqs('before_seq=1&limit=4'), [])
+
+    def test_after_seq_pages(self):
+        self.assertEqual(self.seqs('after_seq=0&limit=4'), [1, 2, 3, 4])
+        self.assertEqual(self.seqs('after_seq=4&limit=4'), [5, 6, 7, 8])
+        self.assertEqual(self.seqs('after_seq=8&limit=4'), [9, 10])
+
+    def test_read_watermark_survives_archiving(self):
+        reader = make_user('bob')
+        GroupMember.objects.create(group=self.group, user=reader)
+        mark_read(reader.id, self.group.pk, 8)
+        move_to_archive(GroupMessage, [message.id for message in self.messages[6:8]])
+
+        self.assertEqual(GroupMember.objects.get(group=self.group, user=reader).last_read_seq, 8)
+        self.assertEqual(mark_read(reader.id, self.group.pk, 7), 8)
@@ -0,0 +1,61 @@
+# chat/tests/test_conditional.py
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from ..models import Friendship, GroupMember
+from .helpers import ChatTestCase, api_client, make_group, make_user
+
+
+class ConditionalGetTests(ChatTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice = make_user('alice')
+        self.bob = make_user('bob')
+        self.carol = make_user('carol')
+        self.group = make_group(self.alice, self.bob)
+
+    def get(self, user, url, etag=None):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return api_client(user).get(url, **headers)
+
+    def test_unchanged_list_is_not_modified(self):
+        response = self.get(self.alice, '/api/groups/')
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        response = self.get(self.alice, '/api/groups/', etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_membership_change_moves_the_members_etags(self):
+        etags = {user: self.get(user, '/api/groups/')['ETag'] for user in (self.alice, self.carol)}
+        with self.captureOnCommitCallbacks(execute=True):
+            GroupMember.objects.create(group=self.group, user=self.carol)
+        self.assertEqual(self.get(self.alice, '/api/groups/', etags[self.alice]).status_code, 200)
+        self.assertEqual(self.get(self.carol, '/api/groups/', etags[self.carol]).status_code, 200)
+
+    def test_profile_change_moves_only_related_users_etags(self):
+        Friendship.objects.create(user_one=self.alice, user_two=self.bob, requester=self.alice)
+        etags = {user: self.get(user, '/api/friendships/')['ETag'] for user in (self.alice, self.carol)}
+        with self.captureOnCommitCallbacks(execute=True):
+            self.bob.username = 'robert'
+            self.bob.save()
+        self.assertEqual(self.get(self.alice, '/api/friendships/', etags[self.alice]).status_code, 200)
+        self.assertEqual(self.get(self.carol, '/api/friendships/', etags[self.carol]).status_code, 304)
+
+
+class BulkRemovalQueryTests(ChatTestCase):
+    """ Member signals skip queryset deletes, so a bulk removal costs the same for any batch size. """
+
+    def removal_queries(self, count):
+        admin = make_user(f'admin{count}')
+        users = [make_user(f'user{count}_{index}') for index in range(count)]
+        group = make_group(admin, *users)
+        client = api_client(admin)
+        url = f'/api/groups/{group.pk}/members/bulk/'
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+            response = client.delete(url, {'user_ids': [user.id for user in users]}, format='json')
+        self.assertEqual(len(response.json()['removed']), count)
+        return len(queries)
+
+    def test_query_count_does_not_grow_with_batch(self):
+        self.assertEqual(self.removal_queries(5), self.removal_queries(50))
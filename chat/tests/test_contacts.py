@@ -0,0 +1,53 @@
+# chat/tests/test_contacts.py
+
+from unittest import mock
+from rest_framework.throttling import ScopedRateThrottle
+from ..models import BlockedUser, Profile
+from .helpers import ChatTestCase, api_client, make_user
+
+
+class ContactMatchTests(ChatTestCase):
+    url = '/api/users/match/'
+
+    def setUp(self):
+        super().setUp()
+        self.alice = make_user('alice')
+        self.bob = make_user('bob')
+        self.carol = make_user('carol')
+        self.dave = make_user('dave')
+        for user in (self.alice, self.bob, self.carol, self.dave):
+            Profile.objects.create(user=user)
+        self.client = api_client(self.alice)
+
+    def match(self, emails):
+        return self.client.post(self.url, {'emails': emails}, format='json')
+
+    def matched_ids(self, response):
+        self.assertEqual(response.status_code, 200)
+        return {match['user']['id'] for match in response.json()['matches']}
+
+    def test_match_shows_no_email(self):
+        response = self.match(['BOB@example.com', 'nobody@example.com'])
+        self.assertEqual(response.json()['matches'], [{
+            'identifier': 'BOB@example.com',
+            'user': {'id': self.bob.id, 'username': 'bob', 'profile_picture_url': ''},
+            'friendship': None,
+        }])
+
+    def test_blocked_users_are_not_matched(self):
+        BlockedUser.objects.create(user=self.alice, blocked_user=self.bob)
+        BlockedUser.objects.create(user=self.carol, blocked_user=self.alice)
+
+        response = self.match(['bob@example.com', 'carol@example.com', 'dave@example.com'])
+        self.assertEqual(self.matched_ids(response), {self.dave.id})
+
+    def test_request_size_is_capped(self):
+        response = self.match([f'user{index}@example.com' for index in range(501)])
+        self.assertEqual(response.status_code, 400)
+
+    def test_throttled_per_user(self):
+        with mock.patch.object(ScopedRateThrottle, 'THROTTLE_RATES', {'contact_match': '2/hour'}):
+            statuses = [self.match(['bob@example.com']).status_code for _ in range(3)]
+            other_user = api_client(self.bob).post(self.url, {'emails': ['dave@example.com']}, format='json')
+        self.assertEqual(statuses, [200, 200, 429])
+        self.assertEqual(other_user.status_code, 200)
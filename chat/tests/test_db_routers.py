@@ -0,0 +1,42 @@
+# chat/tests/test_db_routers.py
+
+from django.contrib.auth.models import User
+from django.test import RequestFactory, override_settings
+from .. import db_routers
+from .helpers import ChatTestCase, make_user
+
+
+@override_settings(REPLICA_DATABASES=['replica_0', 'replica_1', 'replica_2'], READ_YOUR_WRITES_SECONDS=5)
+class ReplicaRouterTests(ChatTestCase):
+    def setUp(self):
+        super().setUp()
+        self.router = db_routers.ReplicaRouter()
+        self.user = make_user('alice')
+        request = RequestFactory().get('/')
+        request.user = self.user
+        token = db_routers.begin_request(request)
+        self.addCleanup(db_routers.end_request, token)
+
+    def test_reads_stay_on_primary_without_opt_in(self):
+        self.assertIsNone(self.router.db_for_read(User))
+
+    def test_one_replica_per_request(self):
+        db_routers.allow_replica_reads(self.user)
+        chosen = {self.router.db_for_read(User) for _ in range(50)}
+        self.assertEqual(len(chosen), 1)
+        self.assertIn(chosen.pop(), ['replica_0', 'replica_1', 'replica_2'])
+
+    def test_write_returns_reads_to_primary_and_pins_user(self):
+        db_routers.allow_replica_reads(self.user)
+        self.assertEqual(self.router.db_for_write(User), 'default')
+        self.assertIsNone(self.router.db_for_read(User))
+        self.assertTrue(db_routers.is_pinned(self.user.id))
+
+    def test_pinned_user_reads_from_primary(self):
+        db_routers.pin_to_primary(self.user.id)
+        db_routers.allow_replica_reads(self.user)
+        self.assertIsNone(self.router.db_for_read(User))
+
+    def test_replicas_are_never_migrated(self):
+        self.assertIs(self.router.allow_migrate('replica_1', 'chat'), False)
+        self.assertIsNone(self.router.allow_migrate('default', 'chat'))
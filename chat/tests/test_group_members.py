@@ -0,0 +1,78 @@
+# chat/tests/test_group_members.py
+
+from unittest import mock
+from ..models import ChangeLog, GroupMember
+from .helpers import ChatTestCase, api_client, make_group, make_user
+
+
+class BulkMemberTests(ChatTestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = make_user('admin')
+        self.alice = make_user('alice')
+        self.others = [make_user(f'user{index}') for index in range(5)]
+        self.group = make_group(self.admin, self.alice)
+        self.url = f'/api/groups/{self.group.pk}/members/bulk/'
+        self.client = api_client(self.admin)
+
+    def member_ids(self):
+        return set(self.group.groupmember_set.values_list('user_id', flat=True))
+
+    def add(self, user_ids):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(self.url, {'members': [{'user_id': user_id} for user_id in user_ids]}, format='json')
+
+    def remove(self, user_ids):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.delete(self.url, {'user_ids': user_ids}, format='json')
+
+    def test_add_reports_only_new_members(self):
+        new_ids = [user.id for user in self.others[:3]]
+        response = self.add(new_ids + [self.alice.id])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json(), {'added': sorted(new_ids), 'skipped': [self.alice.id]})
+        self.assertEqual(self.member_ids(), {self.admin.id, self.alice.id, *new_ids})
+
+        response = self.add(new_ids)
+        self.assertEqual(response.json(), {'added': [], 'skipped': sorted(new_ids)})
+
+    def test_add_logs_one_change_for_the_batch(self):
+        new_ids = [user.id for user in self.others]
+        self.add(new_ids)
+        entries = ChangeLog.objects.filter(user=self.alice, kind=ChangeLog.Kind.MEMBERS_ADDED)
+        self.assertEqual(entries.count(), 1)
+        self.assertEqual(sorted(member['user_id'] for member in entries.get().payload['members']), sorted(new_ids))
+
+    def test_unknown_users_are_rejected(self):
+        response = self.add([self.others[0].id, 999999])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.member_ids(), {self.admin.id, self.alice.id})
+
+    def test_remove_tells_removed_and_remaining_members(self):
+        self.add([user.id for user in self.others])
+        removed = [self.alice.id, self.others[0].id]
+        response = self.remove(removed + [999999])
+        self.assertEqual(response.json(), {'removed': sorted(removed)})
+        for user in (self.admin, self.alice, self.others[1]):
+            self.assertTrue(ChangeLog.objects.filter(user=user, kind=ChangeLog.Kind.MEMBERS_REMOVED).exists())
+
+    def test_removed_members_lose_access(self):
+        alice = api_client(self.alice)
+        self.assertEqual(alice.get(f'/api/groups/{self.group.pk}/messages/').status_code, 200)
+        self.remove([self.alice.id])
+        self.assertEqual(alice.get(f'/api/groups/{self.group.pk}/receipts/').status_code, 404)
+
+    def test_removal_rolls_back_without_its_change_entry(self):
+        with mock.patch('chat.views.changelog.record_change', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError), self.assertLogs('django.request', 'ERROR'):
+                self.remove([self.alice.id])
+        self.assertIn(self.alice.id, self.member_ids())
+
+    def test_last_admin_cannot_be_removed(self):
+        self.assertEqual(self.remove([self.admin.id]).status_code, 400)
+        self.assertIn(self.admin.id, self.member_ids())
+
+    def test_only_admins(self):
+        response = api_client(self.alice).delete(self.url, {'user_ids': [self.admin.id]}, format='json')
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(GroupMember.objects.filter(group=self.group).count(), 2)
@@ -0,0 +1,47 @@
+# chat/tests/test_history_cache.py
+
+from ..models import DirectChat, DirectMessage, GroupMessage, Profile
+from .helpers import ChatTestCase, api_client, make_group, make_user
+
+
+class CachedSenderTests(ChatTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice = make_user('alice')
+        self.bob = make_user('bob')
+        self.profile = Profile.objects.create(user=self.bob)
+        self.group = make_group(self.alice, self.bob)
+        GroupMessage.objects.create(group=self.group, sender=self.bob, message_text='hi')
+        self.chat = DirectChat.objects.create(user_one=self.alice, user_two=self.bob)
+        DirectMessage.objects.create(chat=self.chat, sender=self.bob, message_text='hi')
+        self.client = api_client(self.alice)
+        self.urls = [f'/api/groups/{self.group.pk}/messages/', f'/api/chats/{self.chat.pk}/messages/']
+
+    def senders(self, url):
+        response = self.client.get(url, {'limit': 20})
+        self.assertEqual(response.status_code, 200)
+        return [message['sender'] for message in response.json()]
+
+    def test_profile_change_reaches_cached_history(self):
+        for url in self.urls:
+            self.senders(url)
+
+        self.profile.profile_picture_url = 'https://example.com/bob.png'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.profile.save()
+
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.senders(url)[0]['profile']['profile_picture_url'], 'https://example.com/bob.png')
+
+    def test_username_change_reaches_cached_history(self):
+        for url in self.urls:
+            self.senders(url)
+
+        self.bob.username = 'robert'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.bob.save()
+
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.senders(url)[0]['username'], 'robert')
@@ -0,0 +1,133 @@
+# chat/tests/test_media.py
+
+from django.test import override_settings
+from .. import media
+from ..models import MediaBlob, MediaUpload
+from .helpers import ChatTestCase, api_client, make_user
+
+
+class UploadMixin:
+    def setUp(self):
+        super().setUp()
+        self.user = make_user('alice')
+        self.client = api_client(self.user)
+        self.data = bytes(range(256)) * 4
+
+    def start_upload(self, content_type='application/octet-stream'):
+        response = self.client.post('/api/media/uploads/', {
+            'filename': 'data.bin', 'content_type': content_type, 'size': len(self.data),
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        return response.json()['id']
+
+    def put_chunk(self, upload_id, start, end, total=None):
+        return self.client.put(
+            f'/api/media/uploads/{upload_id}/', self.data[start:end + 1],
+            content_type='application/octet-stream',
+            HTTP_CONTENT_RANGE=f'bytes {start}-{end}/{total or len(self.data)}',
+        )
+
+    def upload(self, content_type='application/octet-stream'):
+        upload_id = self.start_upload(content_type)
+        self.assertEqual(self.put_chunk(upload_id, 0, 511).json()['offset'], 512)
+        return self.put_chunk(upload_id, 512, 1023).json()
+
+
+class MediaUploadTests(UploadMixin, ChatTestCase):
+    def test_chunks_are_assembled_in_order(self):
+        upload = self.upload()
+        self.assertEqual(upload['status'], MediaUpload.Status.COMPLETE)
+        response = self.client.get(upload['media_url'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.data)
+
+    def test_chunk_at_wrong_offset_conflicts(self):
+        upload_id = self.start_upload()
+        self.put_chunk(upload_id, 0, 511)
+        response = self.put_chunk(upload_id, 0, 511)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['offset'], 512)
+
+    def test_content_range_total_must_match_size(self):
+        upload_id = self.start_upload()
+        self.assertEqual(self.put_chunk(upload_id, 0, 511, total=2048).status_code, 400)
+
+    def test_range_requests(self):
+        url = self.upload()['media_url']
+
+        response = self.client.get(url, HTTP_RANGE='bytes=100-199')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 100-199/1024')
+        self.assertEqual(b''.join(response.streaming_content), self.data[100:200])
+
+        response = self.client.get(url, HTTP_RANGE='bytes=-24')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), self.data[-24:])
+
+        response = self.client.get(url, HTTP_RANGE='bytes=1024-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */1024')
+
+    def test_parse_range(self):
+        self.assertIsNone(media.parse_range(None, 10))
+        self.assertIsNone(media.parse_range('bytes=-', 10))
+        self.assertEqual(media.parse_range('bytes=5-', 10), (5, 9))
+        self.assertEqual(media.parse_range('bytes=5-50', 10), (5, 9))
+        self.assertEqual(media.parse_range('bytes=-50', 10), (0, 9))
+        self.assertIs(media.parse_range('bytes=-0', 10), False)
+        self.assertIs(media.parse_range('bytes=7-3', 10), False)
+
+
+class MediaServingTests(UploadMixin, ChatTestCase):
+    """ Blobs must never become a script-running page on the API origin. """
+
+    def test_active_content_types_are_served_as_plain_files(self):
+        for content_type in ['text/html', 'image/svg+xml', 'text/html; charset=utf-8']:
+            with self.subTest(content_type=content_type):
+                upload = self.upload(content_type)
+                self.assertEqual(upload['content_type'], 'application/octet-stream')
+                response = self.client.get(upload['media_url'])
+                self.assertEqual(response['Content-Type'], 'application/octet-stream')
+
+    def test_finish_upload_stores_only_allowed_types(self):
+        upload = MediaUpload.objects.create(user=self.user, filename='x.html', content_type='text/html', size=1024)
+        upload_id = str(upload.pk)
+        self.put_chunk(upload_id, 0, 1023)
+        self.assertEqual(MediaBlob.objects.get().content_type, 'application/octet-stream')
+
+    def test_allowed_types_are_kept(self):
+        upload = self.upload('image/png')
+        self.assertEqual(upload['message_type'], 'image')
+        self.assertEqual(self.client.get(upload['media_url'])['Content-Type'], 'image/png')
+
+    def test_legacy_blob_types_are_not_served(self):
+        url = self.upload()['media_url']
+        MediaBlob.objects.update(content_type='text/html')
+        self.assertEqual(self.client.get(url)['Content-Type'], 'application/octet-stream')
+
+    def test_safety_headers(self):
+        response = self.client.get(self.upload('image/png')['media_url'])
+        self.assertEqual(response['Content-Disposition'], 'attachment')
+        self.assertEqual(response['X-Content-Type-Options'], 'nosniff')
+        self.assertEqual(response['Content-Security-Policy'], 'sandbox')
+        self.assertNotIn('public', response['Cache-Control'])
+
+    def test_anonymous_access_needs_a_valid_token(self):
+        url = self.upload()['media_url']
+        path, token = url.split('?token=')
+        anonymous = api_client()
+        self.assertEqual(anonymous.get(url).status_code, 200)
+        self.assertIn(anonymous.get(path).status_code, (401, 403))
+        self.assertIn(anonymous.get(f'{path}?token={token}x').status_code, (401, 403))
+        # A token is only good for the blob it was issued for
+        other = media.media_token('0' * 64)
+        self.assertIn(anonymous.get(f'{path}?token={other}').status_code, (401, 403))
+
+    def test_tokens_expire(self):
+        url = self.upload()['media_url']
+        with override_settings(MEDIA_URL_MAX_AGE=-1):
+            self.assertIn(api_client().get(url).status_code, (401, 403))
+
+    def test_signed_in_users_need_no_token(self):
+        path = self.upload()['media_url'].split('?')[0]
+        self.assertEqual(self.client.get(path).status_code, 200)
@@ -0,0 +1,66 @@
+# chat/tests/test_metrics.py
+
+import logging
+from django.test import override_settings
+from rest_framework import serializers
+from .. import metrics
+from ..serializers import UserSerializer
+from .helpers import ChatTestCase, api_client, make_user
+
+
+def observations(histogram, *key):
+    sample = histogram.values.get(key)
+    return sample[2] if sample else 0
+
+
+@override_settings(CHAT_METRICS_TOKEN='scrape-token')
+class MetricsAccessTests(ChatTestCase):
+    url = '/api/internal/metrics/'
+
+    def test_staff_or_token_only(self):
+        staff = make_user('staff', is_staff=True)
+        member = make_user('member')
+        cases = [
+            (api_client(), {}, 401),
+            (api_client(member), {}, 403),
+            (api_client(), {'HTTP_X_METRICS_TOKEN': 'wrong'}, 401),
+            (api_client(staff), {}, 200),
+            (api_client(), {'HTTP_X_METRICS_TOKEN': 'scrape-token'}, 200),
+        ]
+        for client, headers, expected in cases:
+            with self.subTest(headers=headers, expected=expected):
+                self.assertEqual(client.get(self.url, **headers).status_code, expected)
+
+    @override_settings(CHAT_METRICS_TOKEN=None)
+    def test_unset_token_matches_nothing(self):
+        self.assertEqual(api_client().get(self.url, HTTP_X_METRICS_TOKEN='').status_code, 401)
+
+
+class SerializerTimingTests(ChatTestCase):
+    def test_drf_is_not_patched(self):
+        self.assertFalse(hasattr(serializers.Serializer.data.fget, 'instrumented'))
+
+    def test_chat_serializers_are_timed(self):
+        users = [make_user('alice'), make_user('bob')]
+        single = observations(metrics.serializer_time, 'UserSerializer')
+        many = observations(metrics.serializer_time, 'UserSerializer[]')
+
+        UserSerializer(users[0]).data
+        UserSerializer(users, many=True).data
+
+        self.assertEqual(observations(metrics.serializer_time, 'UserSerializer'), single + 1)
+        self.assertEqual(observations(metrics.serializer_time, 'UserSerializer[]'), many + 1)
+
+
+class CapacityDropTests(ChatTestCase):
+    def test_handler_comes_from_logging_config(self):
+        logger = logging.getLogger('channels_redis.core')
+        handlers = [handler for handler in logger.handlers if isinstance(handler, metrics.CapacityDropHandler)]
+        self.assertEqual(len(handlers), 1)
+
+        before = metrics.channel_capacity_drops.values.get((), 0)
+        record = logger.makeRecord(
+            logger.name, logging.INFO, __file__, 0, "%s of %s channels over capacity in group %s", (3, 5, 'room'), None,
+        )
+        handlers[0].handle(record)
+        self.assertEqual(metrics.channel_capacity_drops.values.get((), 0), before + 3)
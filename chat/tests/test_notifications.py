@@ -0,0 +1,99 @@
+# chat/tests/test_notifications.py
+
+import asyncio
+from unittest import mock
+from asgiref.sync import async_to_sync, sync_to_async
+from channels.layers import get_channel_layer
+from django.test import SimpleTestCase
+from ..models import BlockedUser, DirectChat, DirectMessage, GroupMessage
+from ..notifications import deliver, user_group
+from .helpers import ChatTestCase, make_group, make_user
+
+
+def subscribe(user_ids):
+    """ One channel per user, joined to their notification group, as a socket would. """
+    layer = get_channel_layer()
+    channels = {}
+    for user_id in user_ids:
+        channels[user_id] = async_to_sync(layer.new_channel)()
+        async_to_sync(layer.group_add)(user_group(user_id), channels[user_id])
+    return channels
+
+
+def received(channels):
+    """ {key: events waiting on the channel} for a {key: channel} dict. """
+    layer = get_channel_layer()
+
+    async def drain(channel):
+        events = []
+        while True:
+            try:
+                events.append(await asyncio.wait_for(layer.receive(channel), 0.05))
+            except asyncio.TimeoutError:
+                return events
+
+    async def drain_all():
+        return await asyncio.gather(*(drain(channel) for channel in channels.values()))
+
+    return dict(zip(channels, async_to_sync(drain_all)()))
+
+
+class DeliverTests(SimpleTestCase):
+    def test_fan_out_uses_one_event_loop(self):
+        user_ids = list(range(1000, 1050))
+        channels = subscribe(user_ids)
+        loops = []
+
+        def counting_async_to_sync(function):
+            run = async_to_sync(function)
+
+            def call(*args, **kwargs):
+                # Each call from a plain thread runs in an event loop of its own
+                loops.append(function)
+                return run(*args, **kwargs)
+            return call
+
+        with mock.patch('chat.notifications.async_to_sync', counting_async_to_sync):
+            deliver(user_ids, 'test.kind', {'value': 1})
+        self.assertEqual(len(loops), 1)
+        event = {'type': 'user_notify', 'kind': 'test.kind', 'payload': {'value': 1}}
+        self.assertEqual(received(channels), {user_id: [event] for user_id in user_ids})
+
+    def test_deliver_from_inside_an_event_loop_thread(self):
+        channels = subscribe([2000])
+
+        async def scenario():
+            await sync_to_async(deliver)([2000], 'test.kind', {})
+
+        async_to_sync(scenario)()
+        self.assertEqual(len(received(channels)[2000]), 1)
+
+
+class NotifyTests(ChatTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice = make_user('alice')
+        self.bob = make_user('bob')
+
+    def test_direct_message_reaches_both_participants(self):
+        user_one, user_two = sorted([self.alice, self.bob], key=lambda user: user.id)
+        chat = DirectChat.objects.create(user_one=user_one, user_two=user_two)
+        channels = subscribe([self.alice.id, self.bob.id])
+        with self.captureOnCommitCallbacks(execute=True):
+            DirectMessage.objects.create(chat=chat, sender=self.alice, message_text='hi')
+        for events in received(channels).values():
+            self.assertIn('message.created', [event['kind'] for event in events])
+
+    def test_mentions_skip_blocked_members(self):
+        carol = make_user('carol')
+        group = make_group(self.alice, self.bob, carol)
+        BlockedUser.objects.create(user=carol, blocked_user=self.alice)
+        channels = subscribe([self.bob.id, carol.id])
+        with self.captureOnCommitCallbacks(execute=True):
+            GroupMessage.objects.create(group=group, sender=self.alice, message_text='hi @bob and @carol')
+        mentions = {
+            user_id: [event for event in events if event['kind'] == 'group.mention']
+            for user_id, events in received(channels).items()
+        }
+        self.assertEqual(len(mentions[self.bob.id]), 1)
+        self.assertEqual(mentions[carol.id], [])
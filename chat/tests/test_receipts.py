@@ -0,0 +1,72 @@
+# chat/tests/test_receipts.py
+
+from ..models import GroupMember, GroupMessage
+from ..receipts import Watermarks, mark_read
+from .helpers import ChatTestCase, api_client, make_group, make_user
+
+
+class WatermarksTests(ChatTestCase):
+    def watermarks(self, last_read_seqs):
+        """ Watermarks of a group whose members have read up to `last_read_seqs`, and the members' ids. """
+        users = [make_user(f'user{index}') for index in range(len(last_read_seqs))]
+        group = make_group(*users)
+        for user, seq in zip(users, last_read_seqs):
+            GroupMember.objects.filter(group=group, user=user).update(last_read_seq=seq)
+        return Watermarks(group.pk), [user.id for user in users]
+
+    def test_members_at_or_past_seq_have_seen_it(self):
+        watermarks, ids = self.watermarks([0, 3, 5, 5, 9])
+        self.assertEqual(watermarks.seen_by(1), (4, [ids[4], ids[3], ids[2], ids[1]]))
+        self.assertEqual(watermarks.seen_by(5), (3, [ids[4], ids[3], ids[2]]))
+        self.assertEqual(watermarks.seen_by(6), (1, [ids[4]]))
+        self.assertEqual(watermarks.seen_by(10), (0, []))
+
+    def test_sender_is_not_counted(self):
+        watermarks, ids = self.watermarks([0, 3, 5, 9])
+        self.assertEqual(watermarks.seen_by(3, sender_id=ids[3]), (2, [ids[2], ids[1]]))
+        # A sender behind the message is not among its readers to begin with
+        self.assertEqual(watermarks.seen_by(3, sender_id=ids[0]), (3, [ids[3], ids[2], ids[1]]))
+
+    def test_limit_lists_furthest_read_first(self):
+        watermarks, ids = self.watermarks([2, 4, 6, 8])
+        self.assertEqual(watermarks.seen_by(1, limit=2), (4, [ids[3], ids[2]]))
+        # Skipping the sender does not shorten the list
+        self.assertEqual(watermarks.seen_by(1, sender_id=ids[3], limit=2), (3, [ids[2], ids[1]]))
+        self.assertEqual(watermarks.seen_by(7, sender_id=ids[3], limit=2), (0, []))
+
+    def test_page(self):
+        watermarks, ids = self.watermarks([1, 2])
+        self.assertEqual(watermarks.page([(1, ids[0]), (2, ids[1])]), [
+            {'seq': 1, 'seen_count': 1, 'seen_by': [ids[1]]},
+            {'seq': 2, 'seen_count': 0, 'seen_by': []},
+        ])
+
+
+class MarkReadTests(ChatTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice = make_user('alice')
+        self.bob = make_user('bob')
+        self.group = make_group(self.alice, self.bob)
+        for index in range(3):
+            GroupMessage.objects.create(group=self.group, sender=self.alice, message_text=str(index))
+
+    def test_watermark_only_moves_forward(self):
+        self.assertEqual(mark_read(self.bob.id, self.group.pk, 2), 2)
+        self.assertEqual(mark_read(self.bob.id, self.group.pk, 1), 2)
+        # Past the last message is refused
+        self.assertEqual(mark_read(self.bob.id, self.group.pk, 9), 2)
+
+    def test_receipts_endpoint(self):
+        mark_read(self.bob.id, self.group.pk, 2)
+        response = api_client(self.alice).get(f'/api/groups/{self.group.pk}/receipts/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(message['seq'], message['seen_by']) for message in response.json()['messages']],
+            [(1, [self.bob.id]), (2, [self.bob.id]), (3, [])],
+        )
+
+    def test_receipts_need_membership(self):
+        outsider = make_user('mallory')
+        response = api_client(outsider).get(f'/api/groups/{self.group.pk}/receipts/')
+        self.assertEqual(response.status_code, 404)
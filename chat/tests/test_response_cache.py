@@ -0,0 +1,83 @@
+# chat/tests/test_response_cache.py
+
+from unittest import mock
+from ..models import GroupMember, Profile
+from ..response_cache import SerializedResponseCache
+from .helpers import ChatTestCase, api_client, make_group, make_user
+
+
+class SerializedResponseCacheTests(ChatTestCase):
+    def setUp(self):
+        super().setUp()
+        self.builds = []
+
+    def response_cache(self, **kwargs):
+        return SerializedResponseCache('test', wait_timeout=0.05, poll_interval=0.01, **kwargs)
+
+    def build(self, pks):
+        self.builds.append(sorted(pks))
+        return {pk: {'id': pk, 'build': len(self.builds)} for pk in pks}
+
+    def test_builds_only_misses(self):
+        response_cache = self.response_cache()
+        self.assertEqual(response_cache.get_many([1, 2], self.build), {1: {'id': 1, 'build': 1}, 2: {'id': 2, 'build': 1}})
+        self.assertEqual(response_cache.get_many([2, 3], self.build)[2], {'id': 2, 'build': 1})
+        self.assertEqual(self.builds, [[1, 2], [3]])
+
+    def test_other_workers_share_entries(self):
+        self.response_cache().get_many([1], self.build)
+        other_worker = self.response_cache()
+        self.assertEqual(other_worker.get_many([1], self.build), {1: {'id': 1, 'build': 1}})
+        self.assertEqual(other_worker.stats()['shared_hits'], 1)
+
+    def test_invalidate_rebuilds_on_every_worker(self):
+        workers = [self.response_cache(), self.response_cache()]
+        for worker in workers:
+            worker.get_many([1], self.build)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            workers[0].invalidate([1])
+
+        self.assertEqual(workers[1].get_many([1], self.build)[1]['build'], 2)
+        self.assertEqual(workers[0].get_many([1], self.build)[1]['build'], 2)
+        self.assertEqual(len(self.builds), 2)
+
+    def test_builds_itself_when_the_lock_holder_is_slow(self):
+        response_cache = self.response_cache()
+        # Another worker holds every build lock and never stores a result
+        with mock.patch('chat.response_cache.cache.add', return_value=False):
+            self.assertEqual(response_cache.get_many([1], self.build), {1: {'id': 1, 'build': 1}})
+        self.assertEqual(response_cache.stats()['wait_timeouts'], 1)
+
+
+class CachedResponseTests(ChatTestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = make_user('admin')
+        self.bob = make_user('bob')
+        self.group = make_group(self.admin)
+        self.client = api_client(self.admin)
+
+    def test_group_changes_reach_cached_group(self):
+        self.assertEqual(self.client.get('/api/groups/').json()[0]['member_count'], 1)
+        self.assertEqual(self.client.get(f'/api/groups/{self.group.pk}/').json()['group_name'], 'Test group')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f'/api/groups/{self.group.pk}/', {'group_name': 'Renamed'}, format='json')
+        with self.captureOnCommitCallbacks(execute=True):
+            GroupMember.objects.create(group=self.group, user=self.bob)
+
+        listed = self.client.get('/api/groups/').json()[0]
+        self.assertEqual((listed['group_name'], listed['member_count']), ('Renamed', 2))
+        self.assertEqual(self.client.get(f'/api/groups/{self.group.pk}/').json()['member_count'], 2)
+
+    def test_profile_changes_reach_cached_user(self):
+        profile = Profile.objects.create(user=self.admin)
+        self.assertEqual(self.client.get('/api/auth/me/').json()['profile']['bio'], '')
+
+        profile.bio = 'hello'
+        with self.captureOnCommitCallbacks(execute=True):
+            profile.save()
+
+        self.assertEqual(self.client.get('/api/auth/me/').json()['profile']['bio'], 'hello')
+        self.assertEqual(self.client.get('/api/profile/').json()['bio'], 'hello')
@@ -0,0 +1,96 @@
+# chat/tests/test_retention.py
+
+import gzip
+import json
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import mock
+from django.db import transaction
+from django.test import override_settings
+from django.utils import timezone
+from ..archive import build_archive_jobs
+from ..models import ChangeLog, GroupMessage, PurgeCheckpoint
+from ..retention import build_jobs, run_job
+from .helpers import ChatTestCase, make_group, make_user
+
+
+def job_named(jobs, name):
+    return next(job for job in jobs if job.name == name)
+
+
+class RetentionTests(ChatTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice = make_user('alice')
+        self.bob = make_user('bob')
+        self.group = make_group(self.alice, self.bob)
+        self.messages = [
+            GroupMessage.objects.create(group=self.group, sender=self.alice, message_text=f'secret {index}')
+            for index in range(4)
+        ]
+        self.archive_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.archive_dir)
+
+    def age(self, queryset, days):
+        queryset.update(created_at=timezone.now() - timedelta(days=days))
+
+    def archived_ids(self):
+        ids = []
+        for name in sorted(os.listdir(self.archive_dir)):
+            with gzip.open(os.path.join(self.archive_dir, name), 'rt') as archive:
+                ids += [json.loads(line)['id'] for line in archive]
+        return ids
+
+    @override_settings(CHAT_SYNC_RETENTION_DAYS=30)
+    def test_changelog_pruned_outside_sync_window(self):
+        self.age(ChangeLog.objects.filter(message_ref=f'group:{self.messages[0].id}'), 31)
+        job = job_named(build_jobs(), 'changelog.expired')
+        total = ChangeLog.objects.count()
+
+        result = run_job(job, batch_size=1, pause=0, archive_dir=self.archive_dir)
+
+        self.assertEqual(result.rows, 2)
+        self.assertFalse(ChangeLog.objects.filter(message_ref=f'group:{self.messages[0].id}').exists())
+        self.assertEqual(ChangeLog.objects.count(), total - 2)
+        # Change-log entries are never written to the message archive
+        self.assertEqual(os.listdir(self.archive_dir), [])
+
+    @override_settings(CHAT_MESSAGE_RETENTION_DAYS=7)
+    def test_purge_drops_change_log_copies(self):
+        expired = self.messages[:2]
+        self.age(GroupMessage.objects.filter(pk__in=[message.id for message in expired]), 8)
+        job = job_named(build_jobs(), f'group.expired:{self.group.id}')
+
+        run_job(job, pause=0)
+
+        refs = set(ChangeLog.objects.exclude(message_ref='').values_list('message_ref', flat=True))
+        self.assertEqual(refs, {f'group:{message.id}' for message in self.messages[2:]})
+
+    def test_archive_drops_change_log_copies(self):
+        self.age(GroupMessage.objects.filter(pk=self.messages[0].id), 400)
+        job = job_named(build_archive_jobs(days=180), 'archive.group')
+        total = ChangeLog.objects.count()
+
+        run_job(job, pause=0)
+
+        self.assertFalse(ChangeLog.objects.filter(message_ref=f'group:{self.messages[0].id}').exists())
+        self.assertEqual(ChangeLog.objects.count(), total - 2)
+
+    @override_settings(CHAT_MESSAGE_RETENTION_DAYS=7)
+    def test_retried_batch_is_archived_once(self):
+        self.age(GroupMessage.objects.all(), 8)
+        job = job_named(build_jobs(), f'group.expired:{self.group.id}')
+
+        # The first attempt writes its archive file, then its transaction fails
+        with mock.patch('chat.retention.delete_messages', side_effect=RuntimeError), self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                run_job(job, batch_size=2, pause=0, archive_dir=self.archive_dir)
+        self.assertEqual(len(self.archived_ids()), 2)
+
+        result = run_job(job, batch_size=2, pause=0, archive_dir=self.archive_dir)
+
+        self.assertEqual(result.rows, 4)
+        self.assertEqual(sorted(self.archived_ids()), [message.id for message in self.messages])
+        self.assertEqual(PurgeCheckpoint.objects.get(job=job.name).rows_deleted, 4)
@@ -0,0 +1,57 @@
+# chat/tests/test_sequences.py
+
+import threading
+from django.db import connection
+from django.test import TransactionTestCase, skipUnlessDBFeature
+from ..models import Group, GroupMessage, allocate_seq
+from .helpers import ChatTestCase, make_group, make_user
+
+
+class SequenceAllocationTests(ChatTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = make_user('alice')
+        self.group = make_group(self.user)
+
+    def test_messages_get_consecutive_seqs(self):
+        seqs = [
+            GroupMessage.objects.create(group=self.group, sender=self.user, message_text=str(index)).seq
+            for index in range(5)
+        ]
+        self.assertEqual(seqs, [1, 2, 3, 4, 5])
+
+    def test_stale_save_does_not_rewind_counter(self):
+        stale = Group.objects.get(pk=self.group.pk)
+        GroupMessage.objects.create(group=self.group, sender=self.user, message_text='hi')
+        stale.group_name = 'Renamed'
+        stale.save()
+        self.assertEqual(allocate_seq(Group, self.group.pk), 2)
+
+
+class ConcurrentSequenceAllocationTests(TransactionTestCase):
+    # Relies on the counter UPDATE taking a row lock
+    @skipUnlessDBFeature('has_select_for_update')
+    def test_concurrent_senders_get_unique_seqs(self):
+        user = make_user('alice')
+        group = make_group(user)
+        errors = []
+
+        def send():
+            try:
+                for index in range(10):
+                    GroupMessage.objects.create(group=group, sender=user, message_text=str(index))
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=send) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        seqs = sorted(GroupMessage.objects.filter(group=group).values_list('seq', flat=True))
+        self.assertEqual(seqs, list(range(1, 41)))
+        self.assertEqual(Group.objects.get(pk=group.pk).last_seq, 40)
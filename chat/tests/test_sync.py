@@ -0,0 +1,85 @@
+# chat/tests/test_sync.py
+
+from datetime import timedelta
+from unittest import mock
+from django.test import override_settings
+from django.utils import timezone
+from ..changelog import record_change
+from ..models import ChangeLog
+from ..retention import build_jobs, run_job
+from .helpers import ChatTestCase, api_client, make_user
+
+
+class SyncTests(ChatTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice = make_user('alice')
+        self.bob = make_user('bob')
+        self.client = api_client(self.alice)
+
+    def change(self, user, name):
+        with self.captureOnCommitCallbacks(execute=True):
+            record_change([user.id], ChangeLog.Kind.MEMBER_UPDATED, {'name': name})
+
+    def sync(self, cursor=None, status=200, **params):
+        if cursor is not None:
+            params['cursor'] = cursor
+        response = self.client.get('/api/sync/', params)
+        self.assertEqual(response.status_code, status)
+        return response.json()
+
+    def names(self, body):
+        return [change['payload']['name'] for change in body['changes']]
+
+    def test_entry_committed_late_is_not_skipped(self):
+        cursor = self.sync()['cursor']
+        # "early" is written first but its transaction commits after "late"'s
+        with self.captureOnCommitCallbacks() as early_commit:
+            record_change([self.alice.id], ChangeLog.Kind.MEMBER_UPDATED, {'name': 'early'})
+        self.change(self.alice, 'late')
+
+        # Until then "early" is invisible to other connections
+        with mock.patch('chat.changelog.assign_stranded'):
+            body = self.sync(cursor)
+        self.assertEqual(self.names(body), ['late'])
+
+        early_commit[0]()
+        self.assertEqual(self.names(self.sync(body['cursor'])), ['early'])
+
+    def test_entries_missing_their_seq_are_delivered(self):
+        cursor = self.sync()['cursor']
+        with self.captureOnCommitCallbacks():
+            record_change([self.alice.id], ChangeLog.Kind.MEMBER_UPDATED, {'name': 'lost callback'})
+
+        self.assertEqual(self.names(self.sync(cursor)), ['lost callback'])
+
+    def test_pages_in_commit_order(self):
+        cursor = self.sync()['cursor']
+        for index in range(5):
+            self.change(self.alice, str(index))
+
+        first = self.sync(cursor, limit=3)
+        self.assertEqual((self.names(first), first['has_more']), (['0', '1', '2'], True))
+        second = self.sync(first['cursor'], limit=3)
+        self.assertEqual((self.names(second), second['has_more']), (['3', '4'], False))
+
+    def test_idle_cursor_keeps_up(self):
+        cursor = self.sync()['cursor']
+        self.change(self.bob, 'not for alice')
+
+        body = self.sync(cursor)
+        self.assertEqual(body['changes'], [])
+        self.assertEqual(body['cursor'], self.sync()['cursor'])
+        self.assertGreater(body['cursor'], cursor)
+
+    @override_settings(CHAT_SYNC_RETENTION_DAYS=30)
+    def test_cursor_older_than_prune_must_reset(self):
+        stale_cursor = self.sync()['cursor']
+        self.change(self.alice, 'old')
+        ChangeLog.objects.update(created_at=timezone.now() - timedelta(days=31))
+        self.change(self.alice, 'new')
+        run_job(next(job for job in build_jobs() if job.name == 'changelog.expired'), pause=0)
+
+        body = self.sync(stale_cursor, status=410)
+        self.assertTrue(body['reset'])
+        self.assertEqual(self.sync(body['cursor'])['changes'], [])
@@ -0,0 +1,108 @@
+# chat/tests/test_tasks.py
+
+import threading
+import time
+import unittest
+from django.conf import settings
+from django.test import SimpleTestCase
+from ..tasks import InProcessTaskQueue, RedisTaskQueue, task
+
+calls = []
+
+
+@task('tests.record')
+def record(*args):
+    calls.append(args)
+
+
+@task('tests.fail')
+def fail():
+    raise RuntimeError('task failed')
+
+
+def redis_available():
+    try:
+        import redis
+        return redis.from_url(settings.REDIS_URL).ping()
+    except Exception:
+        return False
+
+
+class InProcessTaskQueueTests(SimpleTestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_keyed_tasks_collapse_while_waiting(self):
+        queue = InProcessTaskQueue(workers=0)
+        queue.submit('tests.record', [1], key='k')
+        queue.submit('tests.record', [2], key='k')
+        self.assertEqual(queue.depth(), 1)
+        key, item = queue.pop()
+        self.assertEqual((key, item['args']), ('k', [2]))
+        self.assertEqual(queue.metrics()['collapsed'], 1)
+
+    def test_unkeyed_tasks_do_not_wait(self):
+        queue = InProcessTaskQueue(workers=0, batch_delay=1)
+        for index in range(20):
+            queue.submit('tests.record', [index])
+        started = time.monotonic()
+        popped = [queue.pop()[1]['args'] for _ in range(20)]
+        self.assertLess(time.monotonic() - started, 0.5)
+        self.assertEqual(popped, [[index] for index in range(20)])
+
+    def test_keyed_task_waits_once_for_its_batch(self):
+        queue = InProcessTaskQueue(workers=0, batch_delay=0.2)
+        queue.submit('tests.record', [1], key='k')
+        started = time.monotonic()
+        # An update arriving during the wait is collapsed into the same run
+        threading.Timer(0.05, queue.submit, ('tests.record', [2], 'k')).start()
+        _, item = queue.pop()
+        self.assertGreaterEqual(time.monotonic() - started, 0.15)
+        self.assertEqual(item['args'], [2])
+        self.assertEqual(queue.depth(), 0)
+
+    def test_steady_updates_do_not_postpone_a_keyed_task(self):
+        queue = InProcessTaskQueue(workers=0, batch_delay=0.2)
+        queue.submit('tests.record', [0], key='k')
+        time.sleep(0.15)
+        queue.submit('tests.record', [1], key='k')
+        started = time.monotonic()
+        queue.pop()
+        self.assertLess(time.monotonic() - started, 0.15)
+
+    def test_full_queue_runs_inline(self):
+        queue = InProcessTaskQueue(workers=0, maxsize=1)
+        queue.submit('tests.record', ['queued'])
+        queue.submit('tests.record', ['inline'])
+        self.assertEqual(calls, [('inline',)])
+        self.assertEqual(queue.metrics()['ran_inline'], 1)
+
+    def test_workers_run_tasks(self):
+        queue = InProcessTaskQueue(workers=2)
+        for index in range(10):
+            queue.submit('tests.record', [index])
+        deadline = time.monotonic() + 5
+        while len(calls) < 10 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(sorted(calls), [(index,) for index in range(10)])
+
+    def test_failures_are_counted_after_retries(self):
+        queue = InProcessTaskQueue(workers=0, max_retries=0)
+        with self.assertLogs('chat.tasks', 'ERROR'):
+            queue.run('tests.fail', [], 0, 'k')
+        self.assertEqual(queue.metrics()['failed'], 1)
+
+
+@unittest.skipUnless(redis_available(), 'needs a Redis server at REDIS_URL')
+class RedisTaskQueueTests(SimpleTestCase):
+    def setUp(self):
+        self.queue = RedisTaskQueue(workers=0, maxsize=2, prefix=f'chat_tasks_test:{time.time()}:')
+        self.addCleanup(self.queue.redis.delete, self.queue.queue_key, self.queue.payload_key)
+
+    def test_push_queues_collapses_and_reports_full(self):
+        self.assertIs(self.queue.push('a', {'args': [1]}), True)
+        self.assertIs(self.queue.push('a', {'args': [2]}), False)
+        self.assertIs(self.queue.push('b', {'args': []}), True)
+        self.assertIsNone(self.queue.push('c', {'args': []}))
+        self.assertEqual(self.queue.pop(), ('a', {'args': [2]}))
+        self.assertEqual(self.queue.redis.hlen(self.queue.payload_key), self.queue.depth())
@@ -0,0 +1,16 @@
+# chat/tests/test_urls.py
+
+from collections import Counter
+from django.test import SimpleTestCase
+from django.urls import reverse
+from .. import urls
+
+
+class UrlNameTests(SimpleTestCase):
+    def test_names_are_unique(self):
+        names = Counter(pattern.name for pattern in urls.urlpatterns if pattern.name)
+        self.assertEqual([name for name, count in names.items() if count > 1], [])
+
+    def test_profile_routes(self):
+        self.assertEqual(reverse('profile-detail'), '/api/profile/')
+        self.assertEqual(reverse('internal-profile-detail', args=['abc']), '/api/internal/profiles/abc/')
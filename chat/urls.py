@@ -20,6 +20,10 @@ urlpatterns = [
     path('groups/', views.GroupListView.as_view(), name='group-list'),
     path('groups/<int:pk>/', views.GroupDetailView.as_view(), name='group-detail'),
     path('groups/<int:pk>/members/', views.GroupMemberView.as_view(), name='group-members'),
+    path('groups/<int:pk>/members/bulk/', views.GroupMemberBulkView.as_view(), name='group-members-bulk'),
+    path('groups/<int:pk>/messages/', views.GroupMessageListView.as_view(), name='group-messages'),
+    path('groups/<int:pk>/read/', views.GroupReadView.as_view(), name='group-read'),
+    path('groups/<int:pk>/receipts/', views.GroupReceiptsView.as_view(), name='group-receipts'),
 
     # Direct Chats
     path('direct-chats/', views.DirectChatListView.as_view(), name='direct-chat-list'),
@@ -28,6 +32,29 @@ urlpatterns = [
     # Messages
     path('chats/<int:chat_id>/messages/', views.DirectMessageListView.as_view(), name='chat-messages'),
     
+    # Media
+    path('media/uploads/', views.MediaUploadCreateView.as_view(), name='media-upload-create'),
+    path('media/uploads/<uuid:pk>/', views.MediaUploadDetailView.as_view(), name='media-upload-detail'),
+    path('media/<str:sha256>/', views.MediaBlobView.as_view(), name='media-blob'),
+
+    # Delta Sync
+    path('sync/', views.SyncView.as_view(), name='sync'),
+
+    # Export
+    path('export/', views.ExportView.as_view(), name='export'),
+
     # Search Users
     path('users/search/', views.UserSearchView.as_view(), name='user-search'),
+    path('users/match/', views.ContactMatchView.as_view(), name='user-match'),
+
+    # Internal
+    path('internal/history-cache/', views.HistoryCacheStatsView.as_view(), name='history-cache-stats'),
+    path('internal/conditional/', views.ConditionalStatsView.as_view(), name='conditional-stats'),
+    path('internal/response-cache/', views.ResponseCacheStatsView.as_view(), name='response-cache-stats'),
+    path('internal/db-pool/', views.DatabasePoolStatsView.as_view(), name='db-pool-stats'),
+    path('internal/tasks/', views.TaskQueueStatsView.as_view(), name='task-queue-stats'),
+    path('internal/metrics/', views.MetricsView.as_view(), name='metrics'),
+    path('internal/profiles/', views.ProfileArtifactListView.as_view(), name='internal-profile-list'),
+    path('internal/profiles/<str:artifact_id>/', views.ProfileArtifactDetailView.as_view(), name='internal-profile-detail'),
+    path('internal/profiles/<str:artifact_id>/download/', views.ProfileArtifactDownloadView.as_view(), name='internal-profile-download'),
 ]
@@ -1,19 +1,55 @@
 # chat/views.py
 
-from django.db import models
+import logging
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import models, transaction
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
 from django.contrib.auth.models import User
-from rest_framework import generics, status, permissions, filters
+from rest_framework import generics, status, permissions, filters, pagination
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.exceptions import ValidationError, PermissionDenied
+from rest_framework.exceptions import NotFound, ValidationError, PermissionDenied
+from rest_framework.throttling import ScopedRateThrottle
 from rest_framework_simplejwt.tokens import RefreshToken
-from .models import Profile, Friendship, DirectChat, DirectMessage, Group, GroupMember  
+from .models import (
+    Profile, Friendship, DirectChat, DirectMessage, Group, GroupMember, GroupMessage, ChangeLog,
+    MediaBlob, MediaUpload, ArchivedDirectMessage, ArchivedGroupMessage
+)
 from .serializers import (
     RegisterSerializer, UserSerializer, ProfileSerializer, FriendshipSerializer,
     CreateFriendshipSerializer, DirectChatSerializer, DirectMessageSerializer, 
-    CreateMessageSerializer, GroupSerializer, AddGroupMemberSerializer
+    CreateMessageSerializer, GroupSerializer, AddGroupMemberSerializer, GroupMessageSerializer,
+    ChangeLogSerializer, MediaUploadSerializer, BulkAddGroupMemberSerializer,
+    BulkRemoveGroupMemberSerializer, ContactMatchSerializer, ContactUserSerializer, GroupMemberSerializer
 )
-from .permissions import IsGroupAdmin
+from .permissions import HasMediaToken, HasMetricsToken, IsGroupAdmin
+from .membership import get_memberships, is_group_admin, invalidate_memberships
+from .blocks import is_blocked
+from .history_cache import history_cache, dm_room, group_room, room_version
+from . import media
+from . import changelog, conditional, profiling
+from .contacts import match_contacts, friendships_with
+from .dbpool import pool_stats
+from .metrics import render_metrics
+from .db_routers import allow_replica_reads, use_primary
+from .response_cache import group_cache, profile_cache, response_cache_stats, user_cache
+from .conditional import ConditionalGetMixin, conditional_stats
+from .tasks import bump_last_message_at, get_task_queue
+from .notifications import notify
+from .receipts import Watermarks, mark_read
+from .export import coalesce, export_user_data, gzip_stream, iterate_in_thread
+
+logger = logging.getLogger(__name__)
+
+
+class ReplicaReadMixin:
+    """ Serve this view's GET requests from a read replica when one is configured. """
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method in permissions.SAFE_METHODS:
+            allow_replica_reads(request.user)
+
 
 # --- Authentication and Profile Views ---
 
@@ -43,15 +79,21 @@ class LoginView(APIView):
         except User.DoesNotExist:
             return Response({'error': 'Invalid credentials'}, status=status.HTTP_400_BAD_REQUEST)
 
-class CurrentUserView(generics.RetrieveAPIView):
+class CurrentUserView(ConditionalGetMixin, generics.RetrieveAPIView):
     # ... (no changes)
+    etag_scopes = ['profile']
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = UserSerializer
     def get_object(self):
         return self.request.user
 
-class ProfileDetailView(generics.RetrieveUpdateAPIView):
+    def retrieve(self, request, *args, **kwargs):
+        user = self.get_object()
+        return Response(user_cache.get(user.pk, lambda: self.get_serializer(user).data))
+
+class ProfileDetailView(ConditionalGetMixin, generics.RetrieveUpdateAPIView):
     """ View and update the profile of the currently authenticated user. """
+    etag_scopes = ['profile']
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = ProfileSerializer
     queryset = Profile.objects.all()
@@ -60,10 +102,16 @@ class ProfileDetailView(generics.RetrieveUpdateAPIView):
         # Ensures a user can only see/edit their own profile
         return self.request.user.profile
 
+    def retrieve(self, request, *args, **kwargs):
+        return Response(profile_cache.get(
+            request.user.pk, lambda: self.get_serializer(self.get_object()).data
+        ))
+
 # --- Friendship Views ---
 
-class FriendshipListView(generics.ListCreateAPIView):
+class FriendshipListView(ConditionalGetMixin, ReplicaReadMixin, generics.ListCreateAPIView):
     """ List friends or send a new friend request. """
+    etag_scopes = ['friendships', 'users']
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = FriendshipSerializer
 
@@ -87,6 +135,9 @@ class FriendshipListView(generics.ListCreateAPIView):
         except User.DoesNotExist:
             raise ValidationError("Target user not found.")
 
+        if is_blocked(user.id, target_user.id):
+            raise ValidationError("You cannot send a friend request to this user.")
+
         # Ensure IDs are ordered to prevent duplicate entries
         user1, user2 = sorted([user, target_user], key=lambda u: u.id)
 
@@ -148,12 +199,37 @@ class FriendshipDetailView(generics.RetrieveUpdateDestroyAPIView):
 
 # --- Group and Member Views ---
 
-class GroupListView(generics.ListCreateAPIView):
+def with_member_summary(groups):
+    """ Annotate member_count and prefetch a small member_preview for GroupSerializer. """
+    preview = GroupMember.objects.select_related('user__profile').order_by('id')[:GroupSerializer.PREVIEW_SIZE]
+    return (
+        groups.select_related('created_by__profile')
+        .annotate(member_count=models.Count('groupmember'))
+        .prefetch_related(models.Prefetch('groupmember_set', queryset=preview, to_attr='member_preview'))
+    )
+
+
+class GroupListView(ConditionalGetMixin, ReplicaReadMixin, generics.ListCreateAPIView):
     # ... (no changes)
+    etag_scopes = ['groups', 'users']
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = GroupSerializer
     def get_queryset(self):
-        return self.request.user.chat_groups.all()
+        # Filter by id so the member count does not reuse the membership join
+        my_groups = GroupMember.objects.filter(user=self.request.user).values('group_id')
+        return with_member_summary(Group.objects.filter(pk__in=my_groups))
+
+    def list(self, request, *args, **kwargs):
+        # Group ids come from the cached memberships, each group's data from
+        # the response cache; only groups that changed are queried
+        group_ids = sorted(get_memberships(request))
+        groups = group_cache.get_many(group_ids, self.serialize_groups)
+        return Response([groups[group_id] for group_id in group_ids if group_id in groups])
+
+    def serialize_groups(self, group_ids):
+        use_primary()
+        queryset = with_member_summary(Group.objects.filter(pk__in=group_ids))
+        return {group.pk: self.get_serializer(group).data for group in queryset}
     def perform_create(self, serializer):
         create_serializer = CreateFriendshipSerializer(data=self.request.data)
         create_serializer.is_valid(raise_exception=True)
@@ -168,6 +244,9 @@ class GroupListView(generics.ListCreateAPIView):
         except User.DoesNotExist:
             raise ValidationError("Target user not found.")
 
+        if is_blocked(user.id, target_user.id):
+            raise ValidationError("You cannot send a friend request to this user.")
+
         # Ensure IDs are ordered to prevent duplicate entries
         user1, user2 = sorted([user, target_user], key=lambda u: u.id)
 
@@ -187,18 +266,56 @@ class GroupDetailView(generics.RetrieveUpdateDestroyAPIView):
     """ View details, update, or delete a specific group. """
     permission_classes = [permissions.IsAuthenticated, IsGroupAdmin]
     serializer_class = GroupSerializer
-    queryset = Group.objects.all()
+    queryset = with_member_summary(Group.objects.all())
+
+    def retrieve(self, request, *args, **kwargs):
+        pk = self.kwargs['pk']
+        if not is_group_admin(get_memberships(request), pk):
+            # Let get_object() produce the usual 404/403
+            return super().retrieve(request, *args, **kwargs)
+        return Response(group_cache.get(int(pk), lambda: self.get_serializer(self.get_object()).data))
+
+class GroupAdminMixin:
+    def get_admin_group(self, request, pk):
+        """
+        The group `pk`, provided the caller administers it. Checked against
+        the caller's cached memberships, so an admin costs no query here.
+        """
+        if not is_group_admin(get_memberships(request), pk):
+            # Not an admin: tell a missing group apart from a forbidden one
+            generics.get_object_or_404(Group.objects.all(), pk=pk)
+            self.permission_denied(request)
+        # An admin membership proves the row exists; only the pk is needed
+        return Group(pk=pk)
+
+
+class GroupMemberPagination(pagination.CursorPagination):
+    ordering = 'id'
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
 
-class GroupMemberView(APIView):
-    """ Add or remove a member from a group. """
+class GroupMemberView(ReplicaReadMixin, GroupAdminMixin, APIView):
+    """ List, add or remove members of a group. """
     permission_classes = [permissions.IsAuthenticated, IsGroupAdmin]
 
+    def get(self, request, pk):
+        """ Cursor-paginated members, for any member of the group. """
+        if pk not in get_memberships(request):
+            generics.get_object_or_404(Group.objects.all(), pk=pk)
+            self.permission_denied(request)
+
+        paginator = GroupMemberPagination()
+        members = GroupMember.objects.filter(group_id=pk).select_related('user__profile')
+        page = paginator.paginate_queryset(members, request, view=self)
+        return paginator.get_paginated_response(GroupMemberSerializer(page, many=True).data)
+
     def post(self, request, pk):
         """ Add a member to a group. """
         serializer = AddGroupMemberSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        group = generics.get_object_or_404(Group.objects.all(), pk=pk)
-        self.check_object_permissions(request, group) # Check if user is admin
+        group = self.get_admin_group(request, pk) # Check if user is admin
 
         try:
             user_to_add = User.objects.get(id=serializer.validated_data['user_id'])
@@ -220,8 +337,7 @@ class GroupMemberView(APIView):
         """ Remove a member from a group. """
         serializer = AddGroupMemberSerializer(data=request.data) # Re-using for user_id validation
         serializer.is_valid(raise_exception=True)
-        group = generics.get_object_or_404(Group.objects.all(), pk=pk)
-        self.check_object_permissions(request, group)
+        group = self.get_admin_group(request, pk)
 
         try:
             member_to_remove = GroupMember.objects.get(
@@ -239,8 +355,87 @@ class GroupMemberView(APIView):
         return Response({'status': 'member removed'}, status=status.HTTP_204_NO_CONTENT)
 
 
+class GroupMemberBulkView(GroupAdminMixin, APIView):
+    """ Add or remove many members of a group at once. """
+    permission_classes = [permissions.IsAuthenticated, IsGroupAdmin]
+
+    def post(self, request, pk):
+        """ Add members: {"members": [{"user_id": 1, "role": "member"}, ...]} """
+        serializer = BulkAddGroupMemberSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        group = self.get_admin_group(request, pk)
+
+        roles = {member['user_id']: member['role'] for member in serializer.validated_data['members']}
+
+        found = set(User.objects.filter(id__in=roles).values_list('id', flat=True))
+        missing = sorted(set(roles) - found)
+        if missing:
+            raise ValidationError({'user_ids': f"Users not found: {missing}"})
+
+        with transaction.atomic():
+            member_ids_before = set(changelog.group_member_ids(group.id))
+            GroupMember.objects.bulk_create([
+                GroupMember(group=group, user_id=user_id, role=role, added_by=request.user)
+                for user_id, role in roles.items() if user_id not in member_ids_before
+            ], ignore_conflicts=True)
+            member_ids = changelog.group_member_ids(group.id)
+            # ignore_conflicts also skips rows a concurrent request inserted first
+            added = sorted(set(member_ids) & set(roles) - member_ids_before)
+
+            # bulk_create skips signals, so the batch is handled here as one change
+            if added:
+                new_members = [
+                    GroupMember(group=group, user_id=user_id, role=roles[user_id], added_by=request.user)
+                    for user_id in added
+                ]
+                invalidate_memberships(added)
+                conditional.bump('groups', member_ids)
+                group_cache.invalidate([group.pk])
+                payload = changelog.group_members_payload(group.id, new_members)
+                changelog.record_change(member_ids, ChangeLog.Kind.MEMBERS_ADDED, payload)
+                notify(member_ids, ChangeLog.Kind.MEMBERS_ADDED, payload)
+
+        return Response({
+            'added': added,
+            'skipped': sorted(set(roles) - set(added)),
+        }, status=status.HTTP_201_CREATED)
+
+    def delete(self, request, pk):
+        """ Remove members: {"user_ids": [1, 2, ...]} """
+        serializer = BulkRemoveGroupMemberSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        group = self.get_admin_group(request, pk)
+
+        user_ids = set(serializer.validated_data['user_ids'])
+        members = list(group.groupmember_set.filter(user_id__in=user_ids))
+
+        # Same rule as the single remove: the group must keep an admin
+        removed_admins = sum(1 for member in members if member.role == GroupMember.Role.ADMIN)
+        if removed_admins and group.groupmember_set.filter(role=GroupMember.Role.ADMIN).count() == removed_admins:
+            raise ValidationError("Cannot remove the last admin from the group.")
+
+        removed_ids = [member.user_id for member in members]
+        # A removal must never happen without its change-log entry
+        with transaction.atomic():
+            # Read before the delete, so removed users hear about it too
+            member_ids_before = changelog.group_member_ids(group.id)
+            group.groupmember_set.filter(user_id__in=removed_ids).delete()
+            # Once for the whole batch
+            if members:
+                invalidate_memberships(removed_ids)
+                conditional.bump('groups', member_ids_before)
+                group_cache.invalidate([group.pk])
+                payload = changelog.group_members_payload(group.id, members)
+                changelog.record_change(member_ids_before, ChangeLog.Kind.MEMBERS_REMOVED, payload)
+                notify(member_ids_before, ChangeLog.Kind.MEMBERS_REMOVED, payload)
+
+        return Response({'removed': sorted(member.user_id for member in members)})
+
+
 # --- Direct Chat Views ---
-class DirectChatListView(generics.ListAPIView):
+class DirectChatListView(ConditionalGetMixin, ReplicaReadMixin, generics.ListAPIView):
+    etag_scopes = ['direct_chats', 'users']
+    global_etag_scopes = ['history']
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = DirectChatSerializer
 
@@ -251,7 +446,7 @@ class DirectChatListView(generics.ListAPIView):
     
 # --- Search Users View ---
 
-class UserSearchView(generics.ListAPIView):
+class UserSearchView(ReplicaReadMixin, generics.ListAPIView):
     """Search users by username or email to send friend requests."""
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = UserSerializer
@@ -262,6 +457,41 @@ class UserSearchView(generics.ListAPIView):
     def get_queryset(self):
         # Exclude the current user from search results
         return User.objects.exclude(id=self.request.user.id)
+
+
+class ContactMatchView(APIView):
+    """
+    Find which of the user's contacts are registered, in one request.
+    Body: {"emails": [...], "usernames": [...], "hashed": false}; with
+    hashed=true the values are SHA-256 hex digests of the lowercased,
+    trimmed email/username. Throttled under the "contact_match" scope so
+    the endpoint cannot be used to enumerate who is registered.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    throttle_classes = [ScopedRateThrottle]
+    throttle_scope = 'contact_match'
+
+    def post(self, request):
+        serializer = ContactMatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        matches = match_contacts(request.user, data['emails'], data['usernames'], data['hashed'])
+        friendships = friendships_with(request.user, [profile.user_id for _, profile in matches])
+
+        results = []
+        for identifier, profile in matches:
+            friendship = friendships.get(profile.user_id)
+            results.append({
+                'identifier': identifier,
+                'user': ContactUserSerializer(profile.user).data,
+                'friendship': {
+                    'id': friendship.id,
+                    'status': friendship.status,
+                    'requester': friendship.requester_id,
+                } if friendship else None,
+            })
+        return Response({'matches': results})
     
     
 
@@ -281,6 +511,9 @@ class DirectChatDetailView(generics.RetrieveAPIView):
         except User.DoesNotExist:
             return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
         
+        if is_blocked(current_user.id, other_user.id):
+            return Response({'error': 'You cannot chat with this user'}, status=status.HTTP_403_FORBIDDEN)
+
         # Check if they are friends
         user1, user2 = sorted([current_user, other_user], key=lambda u: u.id)
         friendship = Friendship.objects.filter(
@@ -305,28 +538,141 @@ class DirectChatDetailView(generics.RetrieveAPIView):
         return Response(serializer.data)
 
 
-class DirectMessageListView(generics.ListCreateAPIView):
+class SeqRangeMixin:
+    """
+    Slice a message history by per-conversation sequence number.
+
+    ?after_seq=N returns messages newer than N (oldest first), ?before_seq=N
+    returns the newest messages older than N, and ?limit caps either page.
+    Without any of them the whole history is returned, as before. A plain
+    ?limit page (the latest messages) is served from the hot-room cache.
+
+    Pages continue into the archive tables: archived messages are the oldest
+    of a room, so they are only read when the live rows run out.
+    """
+    max_page_size = 200
+
+    def get_history(self):
+        """
+        (room key, room last_seq, message queryset, room archived_through_seq),
+        or None without access. An archived_through_seq of None means unknown.
+        """
+        raise NotImplementedError
+
+    def get_archive_queryset(self):
+        """ The room's archived messages; only called once get_history granted access. """
+        raise NotImplementedError
+
+    def get_seq_param(self, name):
+        value = self.request.query_params.get(name)
+        if value is None:
+            return None
+        try:
+            value = int(value)
+        except ValueError:
+            raise ValidationError({name: 'Must be an integer.'})
+        if value < 0:
+            raise ValidationError({name: 'Must not be negative.'})
+        return value
+
+    def get_limit(self):
+        limit = self.get_seq_param('limit')
+        if limit is None:
+            return None
+        return min(max(limit, 1), self.max_page_size)
+
+    def filter_seq_range(self, queryset, archived_through_seq=None):
+        after_seq = self.get_seq_param('after_seq')
+        before_seq = self.get_seq_param('before_seq')
+        limit = self.get_limit()
+
+        archive = self.get_archive_queryset().select_related('sender__profile')
+        if archived_through_seq is not None and (after_seq or 0) >= archived_through_seq:
+            # Nothing in range was archived: none() runs no query
+            archive = archive.none()
+
+        if after_seq is not None:
+            queryset = queryset.filter(seq__gt=after_seq)
+            archive = archive.filter(seq__gt=after_seq)
+        if before_seq is not None:
+            queryset = queryset.filter(seq__lt=before_seq)
+            archive = archive.filter(seq__lt=before_seq)
+
+        if limit is None:
+            return list(archive.order_by('seq')) + list(queryset.order_by('seq'))
+
+        if after_seq is not None:
+            page = list(queryset.order_by('seq')[:limit])
+            if not page or page[0].seq > after_seq + 1:
+                # Part of the range may have been archived
+                if page:
+                    archive = archive.filter(seq__lt=page[0].seq)
+                page = (list(archive.order_by('seq')[:limit]) + page)[:limit]
+            return page
+
+        # Newest page first, handed back in chronological order
+        page = list(queryset.order_by('-seq')[:limit])
+        if len(page) < limit:
+            if page:
+                archive = archive.filter(seq__lt=page[-1].seq)
+            page += list(archive.order_by('-seq')[:limit - len(page)])
+        return page[::-1]
+
+    def get_queryset(self):
+        history = self.get_history()
+        if history is None:
+            return self.get_serializer_class().Meta.model.objects.none()
+        return self.filter_seq_range(history[2], history[3])
+
+    def list(self, request, *args, **kwargs):
+        params = request.query_params
+        limit = self.get_limit()
+        if (limit is None or limit > history_cache.messages_per_room
+                or 'after_seq' in params or 'before_seq' in params):
+            return super().list(request, *args, **kwargs)
+
+        history = self.get_history()
+        if history is None:
+            return super().list(request, *args, **kwargs)
+
+        room, last_seq, queryset, archived_through_seq = history
+        # Read before the rows, so an edit racing this fill leaves it stale
+        version = room_version(room)
+        messages = history_cache.get(room, last_seq, limit, version)
+        if messages is None:
+            latest = list(queryset.order_by('-seq')[:history_cache.messages_per_room])[::-1]
+            if len(latest) < history_cache.messages_per_room and archived_through_seq:
+                # The rest of this page is in the archive
+                return super().list(request, *args, **kwargs)
+            messages = self.get_serializer(latest, many=True).data
+            history_cache.populate(room, last_seq, messages, version)
+            messages = messages[-limit:]
+        return Response(messages)
+
+
+class DirectMessageListView(ReplicaReadMixin, SeqRangeMixin, generics.ListCreateAPIView):
     """List messages in a chat or send a new message."""
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = DirectMessageSerializer
     
-    def get_queryset(self):
+    def get_history(self):
         chat_id = self.kwargs.get('chat_id')
         chat = DirectChat.objects.filter(id=chat_id).first()
         
         if not chat:
-            return DirectMessage.objects.none()
+            return None
         
         # Ensure user is part of the chat
-        if self.request.user not in [chat.user_one, chat.user_two]:
-            return DirectMessage.objects.none()
+        if self.request.user.id not in [chat.user_one_id, chat.user_two_id]:
+            return None
         
-        return DirectMessage.objects.filter(chat=chat).order_by('created_at')
+        messages = DirectMessage.objects.filter(chat=chat).select_related('sender__profile')
+        return dm_room(chat.id), chat.last_seq, messages, chat.archived_through_seq
+
+    def get_archive_queryset(self):
+        return ArchivedDirectMessage.objects.filter(chat_id=self.kwargs.get('chat_id'))
     
     def create(self, request, *args, **kwargs):
-        # DEBUG: Print request data
-        print(f"DEBUG: Received POST data: {request.data}")
-        
         chat_id = self.kwargs.get('chat_id')
         
         try:
@@ -337,20 +683,393 @@ class DirectMessageListView(generics.ListCreateAPIView):
         # Ensure user is part of the chat
         if request.user not in [chat.user_one, chat.user_two]:
             return Response({'error': 'You are not part of this chat'}, status=status.HTTP_403_FORBIDDEN)
+
+        other_id = chat.user_two_id if request.user.id == chat.user_one_id else chat.user_one_id
+        if is_blocked(request.user.id, other_id):
+            return Response({'error': 'You cannot message this user'}, status=status.HTTP_403_FORBIDDEN)
         
         # Create message
         serializer = self.get_serializer(data=request.data)
         if not serializer.is_valid():
-            print(f"DEBUG: Validation errors: {serializer.errors}")
+            logger.info("Rejected direct message", extra={'chat_id': chat.id, 'errors': serializer.errors})
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         
         # Save with chat and sender
         message = serializer.save(chat=chat, sender=request.user)
+        history_cache.append(dm_room(chat.id), serializer.data)
         
-        # Update last_message_at
-        chat.last_message_at = models.functions.Now()
-        chat.save()
-        
-        print(f"DEBUG: Message saved successfully: {message.id}")
+        # Bump last_message_at off the request path; bursts collapse into one UPDATE
+        bump_last_message_at(chat.id, message.created_at)
         
+        logger.debug("Direct message saved", extra={'chat_id': chat.id, 'message_id': message.id})
+
         return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
+class GroupMessageListView(ReplicaReadMixin, SeqRangeMixin, generics.ListAPIView):
+    """List messages in a group the user belongs to."""
+    permission_classes = [permissions.IsAuthenticated]
+    serializer_class = GroupMessageSerializer
+
+    def get_history(self):
+        group_id = self.kwargs.get('pk')
+
+        # Ensure user is a member of the group (and read its counters alongside)
+        seqs = GroupMember.objects.filter(
+            group_id=group_id, user=self.request.user
+        ).values_list('group__last_seq', 'group__archived_through_seq').first()
+        if seqs is None:
+            return None
+
+        messages = GroupMessage.objects.filter(group_id=group_id).select_related('sender__profile')
+        return group_room(int(group_id)), seqs[0], messages, seqs[1]
+
+    def get_archive_queryset(self):
+        return ArchivedGroupMessage.objects.filter(group_id=self.kwargs.get('pk'))
+
+
+class GroupReadView(APIView):
+    """Move the caller's read watermark in a group forward to {"seq": N}."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, pk):
+        if pk not in get_memberships(request):
+            raise NotFound()
+        try:
+            seq = int(request.data.get('seq'))
+        except (TypeError, ValueError):
+            raise ValidationError({'seq': 'Must be an integer.'})
+        return Response({'group': pk, 'last_read_seq': mark_read(request.user.id, pk, seq)})
+
+
+class GroupReceiptsView(ReplicaReadMixin, SeqRangeMixin, APIView):
+    """
+    "Seen by" for a page of group messages, paged like the message list
+    (?after_seq, ?before_seq, ?limit; the latest page by default). Each
+    message lists up to ?users member ids, furthest-read first.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_history(self):
+        group_id = self.kwargs.get('pk')
+        if group_id not in get_memberships(self.request):
+            return None
+        messages = GroupMessage.objects.filter(group_id=group_id).only('seq', 'sender_id')
+        return group_room(group_id), None, messages, None
+
+    def get_archive_queryset(self):
+        return ArchivedGroupMessage.objects.filter(group_id=self.kwargs.get('pk'))
+
+    def get_limit(self):
+        return super().get_limit() or self.max_page_size
+
+    def get(self, request, pk):
+        history = self.get_history()
+        if history is None:
+            raise NotFound()
+        users = self.get_seq_param('users')
+        if users is None:
+            users = settings.CHAT_READ_RECEIPTS['MAX_USERS_LISTED']
+        page = self.filter_seq_range(history[2], history[3])
+        watermarks = Watermarks(pk)
+        return Response({
+            'group': pk,
+            'members': len(watermarks.seqs),
+            'messages': watermarks.page([(message.seq, message.sender_id) for message in page], users),
+        })
+
+
+# --- Sync Views ---
+
+class SyncView(APIView):
+    """
+    Everything that changed for the current user since a cursor.
+
+    Without ?cursor only the current cursor is returned: take it before the
+    initial full load, then keep calling with the returned cursor until
+    has_more is false.
+
+    Cursors are commit_seqs, which are handed out in commit order (see
+    SyncCounter), so nothing can commit behind a cursor already returned.
+    A cursor older than the change-log prune (CHAT_SYNC_RETENTION_DAYS) gets
+    410 with {"reset": true}: reload everything and continue from the cursor
+    sent along.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    default_page_size = 200
+    max_page_size = 500
+
+    def get(self, request):
+        changelog.assign_stranded(request.user.id)
+        # Read first: every entry up to last_seq is visible to the query below
+        last_seq, pruned_through = changelog.synced_through()
+
+        cursor = request.query_params.get('cursor')
+        if cursor is None:
+            return Response({'changes': [], 'cursor': last_seq, 'has_more': False})
+
+        try:
+            cursor = int(cursor)
+            limit = int(request.query_params.get('limit', self.default_page_size))
+        except ValueError:
+            raise ValidationError("cursor and limit must be integers.")
+        limit = min(max(limit, 1), self.max_page_size)
+
+        if cursor < pruned_through:
+            return Response(
+                {'detail': "Cursor is older than the change log; reload.", 'reset': True, 'cursor': last_seq},
+                status=status.HTTP_410_GONE,
+            )
+
+        page = list(
+            ChangeLog.objects.filter(user=request.user, commit_seq__gt=cursor)
+            .order_by('commit_seq')[:limit + 1]
+        )
+        has_more = len(page) > limit
+        page = page[:limit]
+        if page:
+            cursor = page[-1].commit_seq
+        if not has_more:
+            # Skip the seqs other users' entries took, so idle cursors never age out
+            cursor = max(cursor, last_seq)
+
+        return Response({
+            'changes': ChangeLogSerializer(page, many=True).data,
+            'cursor': cursor,
+            'has_more': has_more,
+        })
+
+
+# --- Export Views ---
+
+class ExportView(APIView):
+    """
+    Download the current user's data as NDJSON, streamed in constant memory.
+
+    ?chat=<id> or ?group=<id> limits the export to one conversation;
+    ?compress=gzip compresses the stream.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        user = request.user
+        chat = group = None
+        try:
+            chat_id = int(request.query_params.get('chat', 0))
+            group_id = int(request.query_params.get('group', 0))
+        except ValueError:
+            raise ValidationError("chat and group must be integers.")
+
+        if chat_id:
+            chat = DirectChat.objects.filter(
+                models.Q(user_one=user) | models.Q(user_two=user), pk=chat_id,
+            ).select_related('user_one', 'user_two').first()
+            if chat is None:
+                return Response({'error': 'Chat not found'}, status=status.HTTP_404_NOT_FOUND)
+        elif group_id:
+            group = Group.objects.filter(pk=group_id, groupmember__user=user).first()
+            if group is None:
+                return Response({'error': 'Group not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        chunks = coalesce(export_user_data(user, chat=chat, group=group))
+        filename = 'talkative-export.ndjson'
+        content_type = 'application/x-ndjson'
+        if request.query_params.get('compress') == 'gzip':
+            chunks = gzip_stream(chunks)
+            filename += '.gz'
+            content_type = 'application/gzip'
+
+        if isinstance(request._request, ASGIRequest):
+            chunks = iterate_in_thread(chunks)
+        response = StreamingHttpResponse(chunks, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+
+# --- Media Views ---
+
+class MediaUploadCreateView(generics.CreateAPIView):
+    """Start a resumable upload: POST filename, content_type and size."""
+    permission_classes = [permissions.IsAuthenticated]
+    serializer_class = MediaUploadSerializer
+
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user)
+
+
+class MediaUploadDetailView(APIView):
+    """
+    GET reports how many bytes have arrived (the offset to resume from).
+    PUT appends one chunk, sent as the raw body with a
+    `Content-Range: bytes start-end/total` header starting at that offset.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    parser_classes = []  # The body is streamed to disk, never parsed
+
+    def get_upload(self, request, pk):
+        return generics.get_object_or_404(MediaUpload.objects.all(), pk=pk, user=request.user)
+
+    def get(self, request, pk):
+        upload = self.get_upload(request, pk)
+        return Response(MediaUploadSerializer(upload, context={'request': request}).data)
+
+    def put(self, request, pk):
+        upload = self.get_upload(request, pk)
+        if upload.status == MediaUpload.Status.COMPLETE:
+            return Response(MediaUploadSerializer(upload, context={'request': request}).data)
+
+        content_range = media.parse_content_range(request.headers.get('Content-Range'))
+        if content_range is None or content_range[2] != upload.size:
+            return Response({'error': 'A valid Content-Range header is required'}, status=status.HTTP_400_BAD_REQUEST)
+
+        start, end, _ = content_range
+        length = end - start + 1
+        if length > settings.MEDIA_UPLOAD_MAX_CHUNK:
+            return Response({'error': 'Chunk too large'}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+        try:
+            media.write_chunk(upload, request.stream, start, length)
+        except media.UploadConflict:
+            upload.refresh_from_db()
+            return Response(
+                {'error': 'Chunk does not start at the current offset', 'offset': upload.received},
+                status=status.HTTP_409_CONFLICT
+            )
+
+        if upload.received == upload.size:
+            media.finish_upload(upload)
+
+        return Response(MediaUploadSerializer(upload, context={'request': request}).data)
+
+
+class MediaBlobView(APIView):
+    """
+    Serve uploaded media with Range support, to signed-in users or with a
+    signed `?token=`. Blobs are content-addressed and never change, so
+    responses are cacheable forever, but only privately. They are always
+    downloads, never documents of the API origin.
+    """
+    permission_classes = [permissions.IsAuthenticated | HasMediaToken]
+
+    def get(self, request, sha256):
+        blob = generics.get_object_or_404(MediaBlob.objects.all(), sha256=sha256)
+        etag = f'"{blob.sha256}"'
+
+        if request.headers.get('If-None-Match') == etag:
+            response = HttpResponseNotModified()
+        else:
+            byte_range = media.parse_range(request.headers.get('Range'), blob.size)
+            if byte_range is False:
+                response = HttpResponse(status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+                response['Content-Range'] = f'bytes */{blob.size}'
+                return response
+
+            # Blobs stored before MEDIA_CONTENT_TYPES existed may carry any type
+            content_type = media.allowed_content_type(blob.content_type)
+            handle = media.media_storage().open(blob.storage_name, 'rb')
+            if byte_range is None:
+                response = FileResponse(handle, content_type=content_type)
+            else:
+                start, end = byte_range
+                response = StreamingHttpResponse(
+                    media.iter_file_range(handle, start, end),
+                    status=status.HTTP_206_PARTIAL_CONTENT,
+                    content_type=content_type,
+                )
+                response['Content-Range'] = f'bytes {start}-{end}/{blob.size}'
+                response['Content-Length'] = end - start + 1
+
+        response['Accept-Ranges'] = 'bytes'
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, max-age=31536000, immutable'
+        response['Content-Disposition'] = 'attachment'
+        response['X-Content-Type-Options'] = 'nosniff'
+        response['Content-Security-Policy'] = 'sandbox'
+        return response
+
+
+# --- Internal Views ---
+
+class HistoryCacheStatsView(APIView):
+    """Hit rate and size of this worker's hot-room history cache."""
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(history_cache.stats())
+
+
+class TaskQueueStatsView(APIView):
+    """Depth and counters of the background side-effect queue."""
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(get_task_queue().metrics())
+
+
+class ConditionalStatsView(APIView):
+    """304s served by this worker, with the bytes and CPU they saved."""
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(conditional_stats.stats())
+
+
+class ResponseCacheStatsView(APIView):
+    """Hit/miss counters of this worker's serialized response caches."""
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(response_cache_stats())
+
+
+class DatabasePoolStatsView(APIView):
+    """Connection pool counters of this worker (empty unless DB_POOL=1)."""
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(pool_stats())
+
+
+class MetricsView(APIView):
+    """This worker's HTTP and WebSocket metrics in Prometheus text format."""
+    permission_classes = [permissions.IsAdminUser | HasMetricsToken]
+
+    def get(self, request):
+        return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+class ProfileArtifactListView(APIView):
+    """Stored request/socket profiles, newest first."""
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(profiling.list_artifacts())
+
+
+def get_profile_artifact(artifact_id):
+    meta = profiling.load_artifact(artifact_id)
+    if meta is None:
+        raise NotFound()
+    return meta
+
+
+class ProfileArtifactDetailView(APIView):
+    """Summary and full SQL log of one profile; DELETE removes it."""
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, artifact_id):
+        return Response(get_profile_artifact(artifact_id))
+
+    def delete(self, request, artifact_id):
+        profiling.delete_artifact(get_profile_artifact(artifact_id))
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class ProfileArtifactDownloadView(APIView):
+    """The raw profile: pstats data (.prof) or folded stacks (.folded)."""
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, artifact_id):
+        meta = get_profile_artifact(artifact_id)
+        handle = profiling.profile_storage().open(meta['profile_file'], 'rb')
+        return FileResponse(handle, as_attachment=True, filename=meta['profile_file'])
@@ -0,0 +1,178 @@
+# chat/warmup.py
+
+import asyncio
+import importlib
+import logging
+import sys
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.urls import URLPattern, URLResolver, get_resolver
+
+logger = logging.getLogger(__name__)
+
+# Imported lazily by the first request otherwise
+HEAVY_MODULES = [
+    'rest_framework.views',
+    'rest_framework.generics',
+    'rest_framework.serializers',
+    'rest_framework.renderers',
+    'rest_framework.parsers',
+    'rest_framework_simplejwt.authentication',
+    'rest_framework_simplejwt.tokens',
+    'chat.views',
+    'chat.serializers',
+    'chat.consumers',
+    'chat.export',
+]
+
+# Filled in by warm_up(): [(step, seconds, error or None)]
+report = []
+
+
+def _step(name):
+    def decorator(func):
+        def run(*args, **kwargs):
+            started = time.perf_counter()
+            error = None
+            try:
+                func(*args, **kwargs)
+            except Exception as exc:
+                # A failed step only means a slower first request
+                error = repr(exc)
+                logger.warning("Warm-up step %s failed: %s", name, error)
+            report.append((name, time.perf_counter() - started, error))
+        return run
+    return decorator
+
+
+@_step('imports')
+def import_modules():
+    for module in HEAVY_MODULES:
+        importlib.import_module(module)
+
+
+def _compile_patterns(resolver):
+    for pattern in resolver.url_patterns:
+        pattern.pattern.regex
+        if isinstance(pattern, URLResolver):
+            _compile_patterns(pattern)
+        elif isinstance(pattern, URLPattern):
+            pattern.lookup_str
+
+
+@_step('urls')
+def compile_urls():
+    resolver = get_resolver()
+    _compile_patterns(resolver)
+    # Builds reverse() lookups for every namespace
+    resolver.reverse_dict
+
+
+@_step('databases')
+def connect_databases():
+    """
+    With DB_POOL=1, open the process-wide pool and wait until it holds its
+    min_size connections; requests then borrow warm ones. Without a pool,
+    each ASGI request thread opens its own connection anyway, so only the
+    driver import, DNS and credentials are checked here.
+    """
+    for alias in settings.DATABASES:
+        connection = connections[alias]
+        pool = getattr(connection, 'pool', None)
+        if pool is not None:
+            pool.open(wait=True)
+        else:
+            connection.ensure_connection()
+            connection.close()
+
+
+@_step('cache')
+def connect_cache():
+    cache.get('warmup')
+
+
+@_step('history')
+def warm_history(rooms):
+    """ Load the latest messages of the most recently active rooms into this process's history cache. """
+    try:
+        _populate_history(rooms)
+    finally:
+        # Hand the connections borrowed here back to the pool (or close them:
+        # request threads never reuse this thread's)
+        for connection in connections.all(initialized_only=True):
+            connection.close()
+
+
+def _populate_history(rooms):
+    from .history_cache import dm_room, group_room, history_cache, room_version
+    from .models import DirectChat, DirectMessage, Group, GroupMessage
+    from .serializers import DirectMessageSerializer, GroupMessageSerializer
+
+    size = history_cache.messages_per_room
+    chats = DirectChat.objects.exclude(last_message_at=None).order_by('-last_message_at')[:rooms]
+    for chat in chats:
+        version = room_version(dm_room(chat.id))
+        latest = list(DirectMessage.objects.filter(chat=chat).select_related('sender__profile').order_by('-seq')[:size])
+        # Short rooms may continue in the archive; the view handles those
+        if len(latest) < size and chat.archived_through_seq:
+            continue
+        history_cache.populate(dm_room(chat.id), chat.last_seq, DirectMessageSerializer(latest[::-1], many=True).data, version)
+
+    recent = GroupMessage.objects.order_by('-id').values_list('group_id', flat=True)[:rooms * 20]
+    group_ids = list(dict.fromkeys(recent))[:rooms]
+    for group in Group.objects.filter(pk__in=group_ids):
+        version = room_version(group_room(group.id))
+        latest = list(GroupMessage.objects.filter(group=group).select_related('sender__profile').order_by('-seq')[:size])
+        if len(latest) < size and group.archived_through_seq:
+            continue
+        history_cache.populate(group_room(group.id), group.last_seq, GroupMessageSerializer(latest[::-1], many=True).data, version)
+
+
+async def connect_channel_layer():
+    from channels.layers import get_channel_layer
+
+    started = time.perf_counter()
+    error = None
+    try:
+        layer = get_channel_layer()
+        # channels_redis keeps one pool per event loop; open it on the server's
+        if hasattr(layer, 'connection'):
+            for index in range(layer.ring_size):
+                async with layer.connection(index) as connection:
+                    await connection.ping()
+    except Exception as exc:
+        error = repr(exc)
+        logger.warning("Warm-up step channel_layer failed: %s", error)
+    report.append(('channel_layer', time.perf_counter() - started, error))
+    log_report()
+
+
+def log_report():
+    logger.info(
+        "Warm-up finished in %.0fms",
+        sum(seconds for _, seconds, _ in report) * 1000,
+        extra={'steps': {name: round(seconds * 1000, 1) for name, seconds, _ in report}},
+    )
+
+
+def warm_up():
+    """
+    Called from talkative/asgi.py while the app is imported, before the
+    server starts listening. The channel layer needs the server's event
+    loop, so under Daphne it is connected as soon as the reactor starts.
+    """
+    report.clear()
+    import_modules()
+    compile_urls()
+    connect_databases()
+    connect_cache()
+    if settings.CHAT_WARMUP['HISTORY_ROOMS']:
+        warm_history(settings.CHAT_WARMUP['HISTORY_ROOMS'])
+
+    reactor = sys.modules.get('twisted.internet.reactor')
+    if reactor is not None and hasattr(reactor, 'callWhenRunning'):
+        reactor.callWhenRunning(lambda: asyncio.ensure_future(connect_channel_layer()))
+    else:
+        log_report()
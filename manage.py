@@ -6,6 +6,9 @@ import sys
 
 def main():
     """Run administrative tasks."""
+    if sys.argv[1:2] == ['test']:
+        # Runs without Redis and without writing into the checkout
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'talkative.test_settings')
     os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'talkative.settings')
     try:
         from django.core.management import execute_from_command_line
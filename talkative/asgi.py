@@ -8,6 +8,13 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'talkative.settings')
 # This ensures the AppRegistry is populated before importing consumers/middleware
 django_asgi_app = get_asgi_application()
 
+# Optional warm-up (CHAT_WARMUP): heavy imports, URL patterns, DB/cache/
+# channel-layer connections and the hot-room history cache, before traffic
+from django.conf import settings
+if settings.CHAT_WARMUP['ENABLED']:
+    from chat.warmup import warm_up
+    warm_up()
+
 # 3. Import Channels components AFTER get_asgi_application()
 from channels.routing import ProtocolTypeRouter, URLRouter
 from chat.middleware import TokenAuthMiddlewareStack
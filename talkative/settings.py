@@ -46,6 +46,8 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # Required for static files on Render
+    'chat.middleware.CorrelationIdMiddleware',
+    'chat.middleware.MetricsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',       # Required for React frontend
     'django.middleware.common.CommonMiddleware',
@@ -53,6 +55,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'chat.middleware.DatabaseRoutingMiddleware',
+    'chat.middleware.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'talkative.urls'
@@ -84,7 +88,8 @@ DATABASES = {
         # Read DATABASE_URL from env (Supabase connection string)
         default=f'sqlite:///{BASE_DIR / "db.sqlite3"}',
         conn_max_age=200,
-        ssl_require=True,  # Supabase enforces SSL
+        # Supabase enforces SSL; the SQLite fallback takes no SSL options
+        ssl_require=os.environ.get('DATABASE_URL', '').startswith('postgres'),
     )
 }
 # DATABASES = {
@@ -94,6 +99,33 @@ DATABASES = {
 #     )
 # }
 
+# Opt-in connection pool (DB_POOL=1, PostgreSQL only). Worker threads borrow
+# from one bounded psycopg pool per process instead of each holding its own
+# persistent connection. Benchmark with `manage.py bench_db_connections`.
+if os.environ.get('DB_POOL') == '1' and DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql':
+    DATABASES['default']['CONN_MAX_AGE'] = 0  # Pooling replaces persistent connections
+    DATABASES['default']['CONN_HEALTH_CHECKS'] = True  # Pool checks a connection before lending it
+    DATABASES['default'].setdefault('OPTIONS', {})['pool'] = {
+        'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 2)),
+        'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', 10)),
+        'timeout': float(os.environ.get('DB_POOL_TIMEOUT', 10)),
+        'max_idle': float(os.environ.get('DB_POOL_MAX_IDLE', 300)),
+    }
+
+
+# Read replicas: comma-separated URLs in DATABASE_REPLICA_URLS (e.g. a second
+# local sqlite file for testing). History, search and list views read from them;
+# a user who just wrote stays on the primary for READ_YOUR_WRITES_SECONDS.
+REPLICA_DATABASES = []
+for index, url in enumerate(filter(None, os.environ.get('DATABASE_REPLICA_URLS', '').split(','))):
+    alias = f'replica_{index}'
+    DATABASES[alias] = dj_database_url.parse(url, conn_max_age=200, ssl_require=url.startswith('postgres'))
+    DATABASES[alias]['TEST'] = {'MIRROR': 'default'}
+    REPLICA_DATABASES.append(alias)
+
+DATABASE_ROUTERS = ['chat.db_routers.ReplicaRouter']
+READ_YOUR_WRITES_SECONDS = int(os.environ.get('READ_YOUR_WRITES_SECONDS', 5))
+
 
 # --- CHANNEL LAYERS (REDIS) ---
 if 'RENDER' in os.environ:
@@ -118,6 +150,180 @@ else:
     }
 
 
+# --- ROOM EVENT REPLAY ---
+# Recent room broadcasts are kept in a capped Redis Stream per room so a
+# reconnecting socket can catch up. Use chat.replay.InMemoryEventBuffer for
+# tests or single-process development without Redis.
+REDIS_URL = os.environ.get('REDIS_URL', 'redis://127.0.0.1:6379')
+
+CHAT_EVENT_BUFFER = {
+    "BACKEND": "chat.replay.RedisStreamEventBuffer",
+    "CONFIG": {
+        "url": REDIS_URL,
+        "maxlen": int(os.environ.get('CHAT_EVENT_BUFFER_MAXLEN', 500)),
+    },
+}
+
+
+# --- CACHE ---
+# Shared between workers on Render (group membership maps, etc.);
+# a per-process memory cache is enough for local development.
+if 'RENDER' in os.environ:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        },
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        },
+    }
+
+
+# --- HOT-ROOM HISTORY CACHE ---
+# Per-worker LRU of the latest messages of active rooms (see chat/history_cache.py)
+CHAT_HISTORY_CACHE = {
+    "MAX_ROOMS": int(os.environ.get('CHAT_HISTORY_CACHE_ROOMS', 1000)),
+    "MESSAGES_PER_ROOM": 50,
+}
+
+
+# --- BLOCK LIST ---
+# Blocked/blocked-by ids per user (see chat/blocks.py), shared through CACHES
+# and copied into each worker for this many seconds.
+CHAT_BLOCKS_LOCAL_TTL = int(os.environ.get('CHAT_BLOCKS_LOCAL_TTL', 5))
+
+
+# --- READ RECEIPTS ---
+# Group read watermarks (see chat/receipts.py): moves are pushed to the
+# group's sockets in one batch per group every FLUSH_INTERVAL seconds.
+CHAT_READ_RECEIPTS = {
+    "FLUSH_INTERVAL": float(os.environ.get('CHAT_READ_RECEIPTS_INTERVAL', 2)),
+    "MAX_USERS_LISTED": 20,
+}
+
+
+# --- SERIALIZED RESPONSE CACHE ---
+# Per-object GroupSerializer/UserSerializer output (see chat/response_cache.py):
+# a per-worker LRU, backed by the shared CACHES tier when SHARED is on.
+CHAT_RESPONSE_CACHE = {
+    "MAX_ENTRIES": int(os.environ.get('CHAT_RESPONSE_CACHE_ENTRIES', 5000)),
+    "SHARED": os.environ.get('CHAT_RESPONSE_CACHE_SHARED', '1') == '1',
+    "TIMEOUT": 60 * 60,
+}
+
+
+# --- BACKGROUND SIDE EFFECTS ---
+# Post-commit work taken off the request path (see chat/tasks.py). Set
+# CHAT_TASK_BACKEND=redis to share one queue between all worker processes.
+CHAT_TASK_QUEUE = {
+    "BACKEND": "chat.tasks.RedisTaskQueue" if os.environ.get('CHAT_TASK_BACKEND') == 'redis' else "chat.tasks.InProcessTaskQueue",
+    "CONFIG": {
+        "url": REDIS_URL,
+        "workers": int(os.environ.get('CHAT_TASK_WORKERS', 2)),
+        "maxsize": int(os.environ.get('CHAT_TASK_MAXSIZE', 1000)),
+        "max_retries": 3,
+    },
+}
+
+
+# --- DELTA SYNC ---
+# Change-log entries older than this are deleted by `manage.py purge_messages`;
+# clients whose cursor is older get 410 {"reset": true} from /api/sync/.
+CHAT_SYNC_RETENTION_DAYS = int(os.environ.get('CHAT_SYNC_RETENTION_DAYS', 30))
+
+
+# --- MESSAGE RETENTION ---
+# Days to keep messages before `manage.py purge_messages` deletes them; groups
+# can override it with Group.retention_days. Unset keeps history forever.
+CHAT_MESSAGE_RETENTION_DAYS = int(os.environ['CHAT_MESSAGE_RETENTION_DAYS']) if os.environ.get('CHAT_MESSAGE_RETENTION_DAYS') else None
+
+# Messages older than this move to the archive tables (`manage.py
+# archive_messages`); history endpoints keep paging into them.
+CHAT_ARCHIVE_AFTER_DAYS = int(os.environ.get('CHAT_ARCHIVE_AFTER_DAYS', 180))
+
+
+# --- METRICS ---
+# Prometheus text format at /api/internal/metrics/ (see chat/metrics.py),
+# readable by staff or by a scraper sending `X-Metrics-Token`. Requests
+# slower than CHAT_SLOW_REQUEST_MS are logged with their slowest queries.
+CHAT_METRICS_TOKEN = os.environ.get('CHAT_METRICS_TOKEN')
+CHAT_SLOW_REQUEST_MS = int(os.environ['CHAT_SLOW_REQUEST_MS']) if os.environ.get('CHAT_SLOW_REQUEST_MS') else None
+
+
+# --- STARTUP WARM-UP ---
+# Done while talkative/asgi.py is imported (see chat/warmup.py), so a freshly
+# woken instance does not make its first request pay for it. On by default on
+# Render. `manage.py bench_startup` shows where startup time goes.
+CHAT_WARMUP = {
+    "ENABLED": os.environ.get('CHAT_WARMUP', '1' if 'RENDER' in os.environ else '0') == '1',
+    # Most recently active DM chats and groups preloaded into the history cache
+    "HISTORY_ROOMS": int(os.environ.get('CHAT_WARMUP_HISTORY_ROOMS', 50)),
+}
+
+
+# --- PROFILING ---
+# Staff-only, on demand: `X-Profile: cprofile|sample` on a request, or a
+# {"msg_type": "profile"} frame on a socket. Artifacts go to the "profiles"
+# storage and are listed at /api/internal/profiles/.
+CHAT_PROFILING = {
+    "MAX_SOCKET_SECONDS": 120,
+    "SAMPLE_INTERVAL": 0.005,
+    "MAX_QUERIES": 1000,
+}
+
+
+# --- LOGGING ---
+# JSON lines on stderr, written by a background thread (see chat/log.py).
+# CHAT_LOG_LEVELS sets per-logger levels and CHAT_LOG_SAMPLE keeps only a
+# fraction of a logger's sub-WARNING records, both as "logger=value,...":
+#   CHAT_LOG_LEVELS="chat.consumers=DEBUG,django.db.backends=DEBUG"
+#   CHAT_LOG_SAMPLE="chat.consumers=0.1"
+def _env_pairs(name):
+    pairs = (item.split('=', 1) for item in os.environ.get(name, '').split(',') if '=' in item)
+    return {logger.strip(): value.strip() for logger, value in pairs}
+
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "filters": {
+        "correlation": {"()": "chat.log.CorrelationFilter"},
+        "sampling": {
+            "()": "chat.log.SamplingFilter",
+            "rates": {logger: float(rate) for logger, rate in _env_pairs('CHAT_LOG_SAMPLE').items()},
+        },
+    },
+    "formatters": {
+        "json": {"()": "chat.log.JsonFormatter"},
+    },
+    "handlers": {
+        "queue": {
+            "()": "chat.log.NonBlockingHandler",
+            "maxsize": 10000,
+            "formatter": "json",
+            "filters": ["correlation", "sampling"],
+        },
+        # Counts group_send capacity drops; see chat/metrics.py
+        "channel_capacity": {"()": "chat.metrics.CapacityDropHandler"},
+    },
+    "root": {
+        "handlers": ["queue"],
+        "level": os.environ.get('CHAT_LOG_LEVEL', 'INFO'),
+    },
+    "loggers": {
+        # Replaces Django's own console/mail_admins handlers
+        "django": {"handlers": ["queue"], "level": "INFO", "propagate": False},
+        # Its only INFO record is the capacity drop warning
+        "channels_redis.core": {"handlers": ["channel_capacity"], "level": "INFO"},
+        **{logger: {"level": level.upper()} for logger, level in _env_pairs('CHAT_LOG_LEVELS').items()},
+    },
+}
+
+
 # --- PASSWORD VALIDATION ---
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -143,11 +349,46 @@ if not DEBUG:
     STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
 
+# --- MEDIA UPLOADS ---
+# Uploaded chat media is stored once per content hash in the "media" storage.
+# Set MEDIA_STORAGE_BACKEND to another Django storage class (e.g. an S3
+# backend) to move it off local disk. Partial uploads always live on local disk.
+MEDIA_ROOT = BASE_DIR / 'media'
+MEDIA_UPLOAD_TEMP_DIR = BASE_DIR / 'media_uploads'
+MEDIA_UPLOAD_MAX_SIZE = 100 * 1024 * 1024
+MEDIA_UPLOAD_MAX_CHUNK = 8 * 1024 * 1024
+# Only these types are served as themselves; anything else (HTML, SVG, ...)
+# is stored and served as application/octet-stream
+MEDIA_CONTENT_TYPES = [
+    'image/jpeg', 'image/png', 'image/gif', 'image/webp',
+    'audio/mpeg', 'audio/ogg', 'audio/webm', 'audio/mp4', 'audio/wav',
+    'video/mp4', 'video/webm',
+    'application/pdf', 'application/zip', 'text/plain',
+]
+# Lifetime of the signed ?token= in media URLs; requests carrying a JWT need none
+MEDIA_URL_MAX_AGE = int(os.environ.get('MEDIA_URL_MAX_AGE', 60 * 60))
+
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+    "media": {"BACKEND": os.environ.get('MEDIA_STORAGE_BACKEND', 'django.core.files.storage.FileSystemStorage')},
+    # Profiling artifacts (see chat/profiling.py)
+    "profiles": (
+        {"BACKEND": os.environ['PROFILE_STORAGE_BACKEND']} if os.environ.get('PROFILE_STORAGE_BACKEND')
+        else {"BACKEND": "django.core.files.storage.FileSystemStorage", "OPTIONS": {"location": BASE_DIR / 'profiles'}}
+    ),
+}
+
+
 # --- DRF SETTINGS ---
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework_simplejwt.authentication.JWTAuthentication',
     ),
+    # Per user; only views that set a matching throttle_scope are throttled
+    'DEFAULT_THROTTLE_RATES': {
+        'contact_match': os.environ.get('CHAT_CONTACT_MATCH_RATE', '20/hour'),
+    },
 }
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
@@ -0,0 +1,42 @@
+# talkative/test_settings.py
+#
+#   python manage.py test --settings=talkative.test_settings
+#
+# The project settings with everything that would need Redis or write into
+# the checkout swapped for in-process or temporary stand-ins.
+
+import atexit
+import os
+import shutil
+import tempfile
+from .settings import *
+
+CHANNEL_LAYERS = {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}
+CHAT_EVENT_BUFFER = {'BACKEND': 'chat.replay.InMemoryEventBuffer', 'CONFIG': {'maxlen': 100}}
+CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+CHAT_RESPONSE_CACHE = {**CHAT_RESPONSE_CACHE, 'SHARED': False}
+# Per-process block lists would outlive the rolled-back rows they were read from
+CHAT_BLOCKS_LOCAL_TTL = 0
+# A queue that is always full runs every task inline, on the caller's thread
+CHAT_TASK_QUEUE = {'BACKEND': 'chat.tasks.InProcessTaskQueue', 'CONFIG': {'workers': 0, 'maxsize': 0, 'max_retries': 0}}
+CHAT_WARMUP = {**CHAT_WARMUP, 'ENABLED': False}
+
+_tmp = tempfile.mkdtemp(prefix='talkative-tests-')
+atexit.register(shutil.rmtree, _tmp, ignore_errors=True)
+STATIC_ROOT = f'{_tmp}/static'
+os.makedirs(STATIC_ROOT)
+MEDIA_ROOT = f'{_tmp}/media'
+MEDIA_UPLOAD_TEMP_DIR = f'{_tmp}/media_uploads'
+STORAGES = {
+    **STORAGES,
+    'media': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'profiles': {'BACKEND': 'django.core.files.storage.FileSystemStorage', 'OPTIONS': {'location': f'{_tmp}/profiles'}},
+}
+
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+# Expected 4xx responses would otherwise log a line each
+LOGGING = {
+    **LOGGING,
+    'root': {**LOGGING['root'], 'level': 'ERROR'},
+    'loggers': {**LOGGING['loggers'], 'django': {**LOGGING['loggers']['django'], 'level': 'ERROR'}},
+}